@@ -1,3 +1,23 @@
+from .errors import BackendUnavailableError, Code2PromptError, ConfigurationError, GenerationError
 from .main import main
 
-__all__ = ['main']
+__all__ = [
+    'main',
+    'PromptGenerator',
+    'RunSummary',
+    'Code2PromptError',
+    'ConfigurationError',
+    'GenerationError',
+    'BackendUnavailableError',
+]
+
+
+def __getattr__(name):
+    # The pipeline is imported on first use, so the command line starts without it.
+    if name == 'PromptGenerator':
+        from .generator import PromptGenerator
+        return PromptGenerator
+    if name == 'RunSummary':
+        from .pipeline import RunSummary
+        return RunSummary
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
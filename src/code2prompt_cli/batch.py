@@ -0,0 +1,221 @@
+"""
+Batch mode: many prompts from one manifest in a single process.
+
+A manifest (JSON or TOML) lists jobs, each naming a codebase path, prompt
+text, patterns and an output file. All jobs run through the built-in
+pipeline with one shared PipelineState, so a directory tree walked for one
+job is reused by every other job with the same root and walk options,
+directory listings are shared between overlapping roots, and file blocks
+and the tokenizer are loaded once.
+
+Example (TOML)::
+
+    [defaults]
+    line_numbers = true
+
+    [[jobs]]
+    path = "services/auth"
+    prompt = "Review the auth service"
+    include = ["*.py"]
+    output_file = "prompts/auth.md"
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .defaults import OUTPUT_FORMATS, RANK_ORDERS, SORT_ORDERS, parse_size
+from .errors import ConfigurationError
+from .pipeline import PipelineState, RunSummary, generate_prompt
+from .sinks import open_output
+from .timings import Timings
+
+# Manifest keys and the option each one sets; names follow the CLI flags.
+_OPTION_KEYS: Dict[str, str] = {
+    'include': 'include_patterns',
+    'exclude': 'exclude_patterns',
+    'include_priority': 'include_priority',
+    'full_directory_tree': 'full_directory_tree',
+    'line_numbers': 'line_numbers',
+    'absolute_paths': 'absolute_paths',
+    'follow_symlinks': 'follow_symlinks',
+    'hidden': 'hidden',
+    'no_codeblock': 'no_codeblock',
+    'output_format': 'output_format',
+    'no_ignore': 'no_ignore',
+    'from_git': 'from_git',
+    'encoding': 'encoding',
+    'max_tokens': 'max_tokens',
+    'rank': 'rank',
+    'sort': 'sort_order',
+    'max_file_size': 'max_file_size',
+    'max_total_bytes': 'max_total_bytes',
+    'template': 'template_path',
+    'top_k': 'top_k',
+    'dedup': 'dedup',
+    'near_dup': 'near_dup',
+}
+# Keys holding byte counts, given as integers or strings such as "10M".
+_SIZE_KEYS = ('max_file_size', 'max_total_bytes')
+_JOB_KEYS = {'name', 'path', 'prompt', 'output_file'} | set(_OPTION_KEYS)
+
+
+class ManifestError(ConfigurationError):
+    """Raised when a batch manifest cannot be read or is invalid."""
+
+
+@dataclass
+class BatchJob:
+    """One prompt to generate."""
+
+    name: str
+    codebase_path: Path
+    prompt_text: Optional[str]
+    output_file: Path
+    options: dict
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one batch job."""
+
+    job: BatchJob
+    summary: RunSummary = field(default_factory=RunSummary)
+    error: Optional[str] = None
+
+
+def _read_manifest(path: Path) -> dict:
+    try:
+        if path.suffix == '.toml':
+            import tomllib
+            with open(path, 'rb') as f:
+                return tomllib.load(f)
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except OSError as e:
+        raise ManifestError(f"cannot read {path}: {e}") from e
+    except ValueError as e:
+        raise ManifestError(f"cannot parse {path}: {e}") from e
+
+
+def load_manifest(path: Path, base_options: dict, default_path: Path) -> List[BatchJob]:
+    """
+    Read the jobs of a batch manifest.
+
+    Relative paths in the manifest are resolved against the manifest's
+    directory. Each job's options start from the CLI options, then the
+    manifest's ``defaults`` table, then the job's own keys.
+
+    Args:
+        path: Manifest file (``.toml``, otherwise JSON)
+        base_options: Options from CLI arguments, shared by every job
+        default_path: Codebase path for jobs that do not set one
+
+    Returns:
+        The jobs, in manifest order
+
+    Raises:
+        ManifestError: If the manifest cannot be read or a job is invalid
+    """
+    path = Path(path)
+    manifest = _read_manifest(path)
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise ManifestError(f"{path}: expected a 'jobs' list")
+    defaults = manifest.get('defaults', {})
+    base_dir = path.resolve().parent
+
+    jobs = []
+    for number, raw in enumerate(manifest['jobs'], 1):
+        if not isinstance(raw, dict):
+            raise ManifestError(f"{path}: job {number} is not a table")
+        spec = {**defaults, **raw}
+        unknown = sorted(set(spec) - _JOB_KEYS)
+        if unknown:
+            raise ManifestError(f"{path}: job {number} has unknown keys: {', '.join(unknown)}")
+        if not spec.get('output_file'):
+            raise ManifestError(f"{path}: job {number} has no output_file")
+        if not spec.get('prompt') and not spec.get('include') and not spec.get('exclude'):
+            raise ManifestError(f"{path}: job {number} needs a prompt or include/exclude patterns")
+        if not spec.get('prompt') and (spec.get('top_k') or base_options.get('top_k')):
+            raise ManifestError(f"{path}: job {number} needs a prompt to select its top_k files")
+
+        codebase_path = (base_dir / spec['path']).resolve() if 'path' in spec else default_path
+        if not codebase_path.is_dir():
+            raise ManifestError(f"{path}: job {number} path '{codebase_path}' is not a directory")
+        output_file = (base_dir / spec['output_file']).resolve()
+
+        options = dict(base_options)
+        for key, option in _OPTION_KEYS.items():
+            if key in spec:
+                options[option] = list(spec[key]) if key in ('include', 'exclude') else spec[key]
+        if options.get('output_format', 'markdown') not in OUTPUT_FORMATS:
+            raise ManifestError(f"{path}: job {number} output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+        if options.get('sort_order', 'name_asc') not in SORT_ORDERS:
+            raise ManifestError(f"{path}: job {number} sort must be one of {', '.join(SORT_ORDERS)}")
+        if options.get('rank', 'relevance') not in RANK_ORDERS:
+            raise ManifestError(f"{path}: job {number} rank must be one of {', '.join(RANK_ORDERS)}")
+        if 'near_dup' in spec:
+            threshold = spec['near_dup']
+            if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or not 0 < threshold <= 1:
+                raise ManifestError(f"{path}: job {number} near_dup must be a number in (0, 1]")
+            options['dedup'] = True
+        if 'template' in spec:
+            options['template_path'] = str((base_dir / spec['template']).resolve())
+        for key in _SIZE_KEYS:
+            if key in spec:
+                try:
+                    options[key] = parse_size(spec[key])
+                except ValueError as e:
+                    raise ManifestError(f"{path}: job {number} {key}: {e}") from e
+        options['output_file'] = str(output_file)
+        jobs.append(BatchJob(
+            name=str(spec.get('name') or spec['output_file']),
+            codebase_path=codebase_path,
+            prompt_text=spec.get('prompt'),
+            output_file=output_file,
+            options=options,
+        ))
+
+    outputs = [str(job.output_file) for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ManifestError(f"{path}: several jobs write the same output_file")
+    for job in jobs:
+        job.options['skip_paths'] = outputs
+    return jobs
+
+
+def run_batch(
+    jobs: List[BatchJob],
+    state: PipelineState,
+    workers: int,
+    timings: Optional[Timings] = None,
+) -> List[BatchResult]:
+    """
+    Generate and write every job's prompt, running jobs concurrently.
+
+    A failing job does not stop the others; its error is recorded in its result.
+
+    Args:
+        jobs: Jobs to run
+        state: Resources shared by all jobs
+        workers: Number of jobs run at the same time
+        timings: Optional recorder shared by all jobs
+
+    Returns:
+        One result per job, in job order
+    """
+    def run(job: BatchJob) -> BatchResult:
+        result = BatchResult(job)
+        try:
+            prompt = generate_prompt(job.codebase_path, job.prompt_text, job.options, result.summary, state, timings)
+            job.output_file.parent.mkdir(parents=True, exist_ok=True)
+            with open_output(job.output_file) as f:
+                f.write(prompt)
+        except Exception as e:
+            result.error = str(e)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(run, jobs))
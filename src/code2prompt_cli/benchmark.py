@@ -0,0 +1,471 @@
+"""
+Performance benchmarks for code2prompt-cli.
+
+Run with ``python -m code2prompt_cli.benchmark <command>``. Every command
+prints a human-readable table, or JSON with ``--json`` for regression
+tracking.
+
+``startup`` measures how long the CLI takes to start and exit on paths that
+should never load the prompt pipeline (``--help``, ``--version`` and the
+missing-prompt validation error), and lists any heavy module those paths
+imported.
+
+``generate`` writes a synthetic repository of a configurable shape, and
+``run`` times each phase of prompt generation (walk, selection, rendering,
+token counting, whole prompts with and without a warm cache) on such a
+repository or on an existing codebase. Each phase is reported with its wall
+time, peak Python memory (measured in a separate traced run, so tracing
+does not distort the timings) and throughput in files/s and MB/s.
+"""
+
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import click
+
+# Command lines whose startup cost is measured.
+STARTUP_COMMANDS: Dict[str, List[str]] = {
+    "help": ["--help"],
+    "version": ["--version"],
+    "validation-error": [],
+}
+
+# Modules the startup paths must not import.
+HEAVY_MODULES = (
+    "code2prompt_rs",
+    "pyperclip",
+    "git",
+    "jinja2",
+    "tiktoken",
+    "sqlite3",
+    "concurrent.futures",
+    "code2prompt_cli.pipeline",
+)
+
+# Runs the CLI in-process, then reports which heavy modules ended up loaded.
+_STARTUP_SCRIPT = """
+import json, sys
+from code2prompt_cli.main import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+except RuntimeError:
+    pass  # --version without installed package metadata
+heavy = [name for name in {heavy!r} if name in sys.modules]
+sys.stderr.write("\\n" + json.dumps(heavy) + "\\n")
+"""
+
+
+@dataclass
+class StartupResult:
+    """Startup timings of one command line, in milliseconds."""
+
+    name: str
+    args: List[str]
+    runs: int
+    min_ms: float
+    median_ms: float
+    max_ms: float
+    heavy_imports: List[str] = field(default_factory=list)
+
+
+def _run_cli(args: Sequence[str]) -> List[str]:
+    """Run the CLI once in a fresh interpreter and return the heavy modules it imported."""
+    script = _STARTUP_SCRIPT.format(heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-c", script, *args],
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+    last_line = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "[]"
+    try:
+        return json.loads(last_line)
+    except ValueError:
+        raise RuntimeError(f"benchmark subprocess failed: {completed.stderr}")
+
+
+def measure_startup(name: str, args: Sequence[str], runs: int = 10) -> StartupResult:
+    """
+    Measure the wall time of starting the CLI with the given arguments.
+
+    Each run starts a fresh interpreter, so the timings include interpreter
+    startup and every import the command line triggers.
+
+    Args:
+        name: Label for the command line
+        args: CLI arguments
+        runs: Number of timed runs
+
+    Returns:
+        Timing statistics and the heavy modules imported by the command
+    """
+    timings = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        heavy = _run_cli(args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return StartupResult(
+        name=name,
+        args=list(args),
+        runs=runs,
+        min_ms=min(timings),
+        median_ms=statistics.median(timings),
+        max_ms=max(timings),
+        heavy_imports=heavy,
+    )
+
+
+@dataclass
+class RepoShape:
+    """
+    Shape of a synthetic repository.
+
+    File sizes follow a log-normal distribution around ``mean_size``;
+    ``size_sigma`` controls its spread (0 makes every file the same size).
+    ``ignore_density`` is both the share of files that .gitignore rules
+    exclude and the share of directories carrying their own .gitignore.
+    """
+
+    files: int = 1000
+    depth: int = 4
+    files_per_dir: int = 20
+    mean_size: int = 4096
+    size_sigma: float = 1.0
+    binary_ratio: float = 0.02
+    ignore_density: float = 0.1
+    seed: int = 0
+
+
+@dataclass
+class RepoStats:
+    """What generate_repo() actually wrote."""
+
+    files: int = 0
+    directories: int = 0
+    bytes: int = 0
+    binary_files: int = 0
+    ignored_files: int = 0
+    ignore_files: int = 0
+
+
+@dataclass
+class PhaseResult:
+    """Timing, memory and throughput of one pipeline phase."""
+
+    name: str
+    runs: int
+    median_s: float
+    min_s: float
+    peak_mb: float
+    files: int
+    megabytes: float
+    files_per_s: float
+    mb_per_s: float
+
+
+_TEXT_EXTENSIONS = ("py", "js", "ts", "rs", "md", "txt", "json", "toml")
+_NESTED_IGNORE_RULES = "*.tmp\ngenerated/\n!keep.tmp\n"
+_SYNTHETIC_AGE_NS = 3600 * 1_000_000_000
+
+
+def _text_lines(rng: random.Random) -> List[str]:
+    """A pool of source-like lines to assemble file contents from."""
+    words = ["value", "result", "config", "handler", "request", "index", "buffer", "token", "path", "cache"]
+    lines = []
+    for number in range(256):
+        a, b, c = rng.sample(words, 3)
+        indent = "    " * rng.randint(0, 3)
+        lines.append(f"{indent}{a}_{number} = {b}({c}, {rng.randint(0, 9999)})  # {a} {c}")
+    return lines
+
+
+def generate_repo(root: Path, shape: RepoShape) -> RepoStats:
+    """
+    Write a synthetic repository.
+
+    Output is deterministic for a given shape (including its seed).
+
+    Args:
+        root: Directory to create the repository in; created if missing
+        shape: Repository shape
+
+    Returns:
+        Counts of what was written
+    """
+    rng = random.Random(shape.seed)
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    stats = RepoStats()
+    lines = _text_lines(rng)
+
+    directories = [(root, 0)]
+    for number in range(max(0, shape.files // max(1, shape.files_per_dir) - 1)):
+        candidates = [item for item in directories if item[1] < shape.depth] or directories[:1]
+        parent, depth = rng.choice(candidates)
+        path = parent / f"pkg_{number}"
+        path.mkdir()
+        directories.append((path, depth + 1))
+    stats.directories = len(directories)
+
+    if shape.ignore_density > 0:
+        (root / ".gitignore").write_text("*.log\nbuild/\n")
+        stats.ignore_files += 1
+        for path, _ in directories[1:]:
+            if rng.random() < shape.ignore_density:
+                (path / ".gitignore").write_text(_NESTED_IGNORE_RULES)
+                stats.ignore_files += 1
+
+    # Median that gives the log-normal distribution the requested mean.
+    mu = math.log(shape.mean_size) - shape.size_sigma ** 2 / 2
+    for number in range(shape.files):
+        directory, _ = rng.choice(directories)
+        size = max(1, int(rng.lognormvariate(mu, shape.size_sigma)))
+        if rng.random() < shape.binary_ratio:
+            data = bytes(rng.getrandbits(8) for _ in range(min(size, 64))) + b"\0" * max(0, size - 64)
+            name = f"blob_{number}.bin"
+            stats.binary_files += 1
+        else:
+            start = rng.randrange(len(lines))
+            text = []
+            length = 0
+            while length < size:
+                line = lines[(start + len(text)) % len(lines)]
+                text.append(line)
+                length += len(line) + 1
+            data = "\n".join(text).encode("utf-8")[:size]
+            if rng.random() < shape.ignore_density:
+                name = f"debug_{number}.log"
+                stats.ignored_files += 1
+            else:
+                name = f"mod_{number}.{rng.choice(_TEXT_EXTENSIONS)}"
+        (directory / name).write_bytes(data)
+        stats.files += 1
+        stats.bytes += len(data)
+
+    # Real checkouts are not modified seconds before a run; without this,
+    # every file would fall in the caches' racy-mtime window.
+    mtime_ns = time.time_ns() - _SYNTHETIC_AGE_NS
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames + ["."]:
+            os.utime(os.path.join(dirpath, name), ns=(mtime_ns, mtime_ns))
+    return stats
+
+
+def _measure(name: str, fn: Callable[[], object], files: int, nbytes: int, repeat: int) -> PhaseResult:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    median = statistics.median(timings)
+    megabytes = nbytes / (1024 * 1024)
+    return PhaseResult(
+        name=name,
+        runs=repeat,
+        median_s=median,
+        min_s=min(timings),
+        peak_mb=peak / (1024 * 1024),
+        files=files,
+        megabytes=megabytes,
+        files_per_s=files / median if median else 0.0,
+        mb_per_s=megabytes / median if median else 0.0,
+    )
+
+
+def run_suite(codebase_path: Path, repeat: int = 3, jobs: Optional[int] = None) -> List[PhaseResult]:
+    """
+    Time every phase of prompt generation on a codebase.
+
+    Each phase gets its inputs precomputed, so it is measured on its own.
+
+    Args:
+        codebase_path: Codebase to generate prompts for
+        repeat: Timed runs per phase; the median is reported
+        jobs: Worker threads for the parallel phases (default: one per CPU)
+
+    Returns:
+        One result per phase
+    """
+    from .pipeline import _Renderer, generate_prompt, ordered_map, select_files
+    from .tokens import TokenCounter
+    from .walker import walk_files
+
+    codebase_path = Path(codebase_path).resolve()
+    jobs = jobs or os.cpu_count() or 1
+    options: dict = {}
+    entries = list(walk_files(codebase_path))
+    files = select_files(entries, options)
+    selected_bytes = sum(entry.size for entry in files)
+    walked_bytes = sum(entry.size for entry in entries)
+    renderer = _Renderer(options, None)
+    blocks = [block for block in map(renderer.block, files) if block is not None]
+    block_bytes = sum(len(block.encode("utf-8")) for block in blocks)
+    counter = TokenCounter()
+
+    phases = [
+        ("walk", lambda: list(walk_files(codebase_path)), len(entries), walked_bytes),
+        ("select", lambda: select_files(entries, options), len(entries), walked_bytes),
+        ("render", lambda: list(map(renderer.block, files)), len(files), selected_bytes),
+        (f"render-jobs{jobs}", lambda: list(ordered_map(renderer.block, files, jobs)), len(files), selected_bytes),
+        (f"tokens-{counter.name}", lambda: [counter.count(block) for block in blocks], len(blocks), block_bytes),
+        ("prompt", lambda: generate_prompt(codebase_path, "Benchmark", {}), len(files), selected_bytes),
+    ]
+
+    cache_dir = Path(tempfile.mkdtemp(prefix="code2prompt-bench-cache-"))
+    cached_options = {'cache_dir': str(cache_dir), 'cache_max_bytes': 1 << 40}
+    phases.append((
+        "prompt-warm-cache",
+        lambda: generate_prompt(codebase_path, "Benchmark", dict(cached_options)),
+        len(files),
+        selected_bytes,
+    ))
+
+    from .main import _code2prompt_available
+    if _code2prompt_available():
+        from .main import _generate_real_prompt
+        phases.append((
+            "code2prompt-rs",
+            lambda: _generate_real_prompt(codebase_path, "Benchmark", {}),
+            len(files),
+            selected_bytes,
+        ))
+
+    try:
+        # Prime the cache so the warm-cache phase only measures hits.
+        generate_prompt(codebase_path, "Benchmark", dict(cached_options))
+        return [_measure(name, fn, count, nbytes, repeat) for name, fn, count, nbytes in phases]
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _shape_options(fn):
+    """Attach the RepoShape options to a click command."""
+    defaults = RepoShape()
+    options = [
+        click.option('--files', type=click.IntRange(min=1), default=defaults.files, show_default=True, help='Number of files'),
+        click.option('--depth', type=click.IntRange(min=0), default=defaults.depth, show_default=True, help='Maximum directory depth'),
+        click.option('--files-per-dir', type=click.IntRange(min=1), default=defaults.files_per_dir, show_default=True, help='Average files per directory'),
+        click.option('--mean-size', type=click.IntRange(min=1), default=defaults.mean_size, show_default=True, help='Mean file size in bytes'),
+        click.option('--size-sigma', type=click.FloatRange(min=0), default=defaults.size_sigma, show_default=True, help='Spread of the log-normal file size distribution'),
+        click.option('--binary-ratio', type=click.FloatRange(0, 1), default=defaults.binary_ratio, show_default=True, help='Share of binary files'),
+        click.option('--ignore-density', type=click.FloatRange(0, 1), default=defaults.ignore_density, show_default=True, help='Share of ignored files and of directories with a .gitignore'),
+        click.option('--seed', type=int, default=defaults.seed, show_default=True, help='Random seed'),
+    ]
+    for option in reversed(options):
+        fn = option(fn)
+    return fn
+
+
+def _echo_json(data: dict, output: Optional[str]) -> None:
+    text = json.dumps(data, indent=2)
+    if output:
+        Path(output).write_text(text + "\n", encoding="utf-8")
+        click.echo(f"Results written to: {output}")
+    else:
+        click.echo(text)
+
+
+@click.group()
+def cli() -> None:
+    """Benchmarks for code2prompt-cli."""
+
+
+@cli.command()
+@click.option('--runs', type=click.IntRange(min=1), default=10, show_default=True, help='Timed runs per command line')
+@click.option('--json', 'as_json', is_flag=True, help='Print results as JSON')
+def startup(runs: int, as_json: bool) -> None:
+    """Measure CLI startup time for --help, --version and validation errors."""
+    results = [measure_startup(name, args, runs) for name, args in STARTUP_COMMANDS.items()]
+    if as_json:
+        click.echo(json.dumps({"startup": [asdict(result) for result in results]}, indent=2))
+        return
+    click.echo(f"{'command':<18} {'min ms':>8} {'median ms':>10} {'max ms':>8}  heavy imports")
+    for result in results:
+        heavy = ", ".join(result.heavy_imports) or "-"
+        click.echo(
+            f"{result.name:<18} {result.min_ms:>8.1f} {result.median_ms:>10.1f} {result.max_ms:>8.1f}  {heavy}"
+        )
+
+
+@cli.command()
+@click.argument('path', type=click.Path(file_okay=False))
+@_shape_options
+def generate(path: str, **shape) -> None:
+    """Write a synthetic repository to PATH."""
+    stats = generate_repo(Path(path), RepoShape(**shape))
+    click.echo(
+        f"Wrote {stats.files} files ({stats.bytes / (1024 * 1024):.1f} MB) in {stats.directories} directories: "
+        f"{stats.binary_files} binary, {stats.ignored_files} ignored, {stats.ignore_files} .gitignore files"
+    )
+
+
+@cli.command()
+@click.option('--path', type=click.Path(exists=True, file_okay=False), help='Benchmark an existing codebase instead of a synthetic one')
+@_shape_options
+@click.option('--repeat', type=click.IntRange(min=1), default=3, show_default=True, help='Timed runs per phase')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), help='Worker threads for parallel phases (default: one per CPU)')
+@click.option('--json', 'as_json', is_flag=True, help='Print results as JSON')
+@click.option('-O', '--output', type=click.Path(dir_okay=False), help='Write JSON results to a file')
+def run(path: Optional[str], repeat: int, jobs: Optional[int], as_json: bool, output: Optional[str], **shape) -> None:
+    """Time each phase of prompt generation."""
+    repo_shape = None
+    stats = None
+    workdir = None
+    if path:
+        codebase_path = Path(path)
+    else:
+        repo_shape = RepoShape(**shape)
+        workdir = Path(tempfile.mkdtemp(prefix="code2prompt-bench-"))
+        codebase_path = workdir / "repo"
+        stats = generate_repo(codebase_path, repo_shape)
+    try:
+        results = run_suite(codebase_path, repeat, jobs)
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if as_json or output:
+        _echo_json({
+            "benchmark": "pipeline",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "shape": asdict(repo_shape) if repo_shape else None,
+            "repo": asdict(stats) if stats else {"path": str(Path(path).resolve())},
+            "phases": [asdict(result) for result in results],
+        }, output)
+        return
+    if stats is not None:
+        click.echo(f"Synthetic repository: {stats.files} files, {stats.bytes / (1024 * 1024):.1f} MB")
+    click.echo(f"{'phase':<20} {'median s':>9} {'min s':>9} {'peak MB':>8} {'files/s':>10} {'MB/s':>8}")
+    for result in results:
+        click.echo(
+            f"{result.name:<20} {result.median_s:>9.4f} {result.min_s:>9.4f} {result.peak_mb:>8.1f} "
+            f"{result.files_per_s:>10.0f} {result.mb_per_s:>8.1f}"
+        )
+
+
+if __name__ == '__main__':
+    cli()
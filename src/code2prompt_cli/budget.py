@@ -0,0 +1,108 @@
+"""
+Token budget packing for the built-in prompt pipeline.
+
+Candidate files are ranked, then packed greedily into the budget left after
+the prompt header and footer. A file that does not fit whole is truncated
+when enough budget remains to make a partial file useful, and dropped
+otherwise.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .ordering import recency_key
+from .walker import FileEntry
+
+# Below this many tokens a truncated file is not worth including.
+MIN_TRUNCATED_TOKENS = 64
+
+
+@dataclass
+class BudgetPlan:
+    """The outcome of packing files into a token budget."""
+
+    included: Set[str] = field(default_factory=set)
+    truncated: Dict[str, str] = field(default_factory=dict)
+    dropped: List[str] = field(default_factory=list)
+    used_tokens: int = 0
+
+
+def _terms(text: str) -> Set[str]:
+    return {word.lower() for word in re.findall(r"[A-Za-z0-9]+", text) if len(word) >= 3}
+
+
+def rank_files(
+    files: List[FileEntry],
+    prompt_text: Optional[str],
+    order: str,
+    commit_times: Optional[Dict[str, int]] = None,
+) -> List[FileEntry]:
+    """
+    Order candidate files by how much they deserve a place in the budget.
+
+    Args:
+        files: Candidate files
+        prompt_text: User prompt text, used for relevance ranking
+        order: One of defaults.RANK_ORDERS
+        commit_times: Last commit time by relative path, required for ``git_recent``
+
+    Returns:
+        Files, most deserving first
+    """
+    if order == 'recent':
+        return sorted(files, key=lambda entry: -entry.mtime_ns)
+    if order == 'git_recent':
+        return sorted(files, key=recency_key(commit_times or {}))
+    if order == 'size':
+        return sorted(files, key=lambda entry: entry.size)
+
+    terms = _terms(prompt_text or "")
+
+    def score(entry: FileEntry) -> Tuple[int, int]:
+        path = entry.rel_path.lower()
+        # More prompt terms in the path first; smaller files break ties so more of them fit.
+        return (-sum(1 for term in terms if term in path), entry.size)
+
+    return sorted(files, key=score)
+
+
+def pack_files(
+    ranked: List[FileEntry],
+    budget: int,
+    entry_tokens: Callable[[FileEntry], Optional[int]],
+    truncate: Callable[[FileEntry, int], Optional[Tuple[str, int]]],
+) -> BudgetPlan:
+    """
+    Greedily pack ranked files into a token budget.
+
+    Args:
+        ranked: Candidate files, most deserving first
+        budget: Tokens available for file sections
+        entry_tokens: Returns the token count of a file's section, or None to skip the file
+        truncate: Returns a truncated block and its token count fitting the given limit, or None
+
+    Returns:
+        BudgetPlan describing included, truncated and dropped files
+    """
+    plan = BudgetPlan()
+    remaining = budget
+    for entry in ranked:
+        tokens = entry_tokens(entry)
+        if tokens is None:
+            continue
+        if tokens <= remaining:
+            plan.included.add(entry.path)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            truncated = truncate(entry, remaining)
+            if truncated is not None:
+                block, truncated_tokens = truncated
+                plan.included.add(entry.path)
+                plan.truncated[entry.path] = block
+                remaining -= truncated_tokens
+                continue
+        plan.dropped.append(entry.rel_path)
+    plan.used_tokens = budget - remaining
+    return plan
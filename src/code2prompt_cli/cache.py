@@ -0,0 +1,378 @@
+"""
+Persistent, content-addressed cache of rendered file blocks.
+
+Rendered blocks are stored in a SQLite database keyed by the SHA-256 of the
+file contents plus a *variant* string describing the rendering options, so
+identical contents are rendered once no matter where they live. A second
+table remembers the path, size and mtime of every file seen, which lets
+unchanged files be served without even being read; files listed from git
+objects are looked up by their blob ID instead. Token counts of blocks
+are cached alongside them, per tokenizer. When the stored blocks exceed the
+size cap, the least recently used ones are evicted.
+
+The database is shared by concurrent runs: it uses write-ahead logging, so
+readers never wait for a writer, and every write commits on its own, so a
+run holds the write lock for one statement at a time. A run that still
+cannot get the lock within a short timeout stops writing to the cache and
+renders the rest of its files uncached; the cache only ever saves time.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from .defaults import DEFAULT_MAX_BYTES
+from .render import SNIFF_BYTES, looks_binary
+from .walker import FileEntry
+
+# Approximate per-row overhead, so skipped (binary) entries still count toward the cap.
+_ROW_OVERHEAD = 64
+
+# Files modified this recently may be rewritten within the same mtime tick
+# without changing size, so their stat data is never trusted on its own.
+_RACY_WINDOW_NS = 2_000_000_000
+
+# Seconds a write waits for another run holding the database lock.
+_BUSY_TIMEOUT = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blocks (
+    digest TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    block TEXT,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, variant)
+);
+CREATE INDEX IF NOT EXISTS blocks_last_used ON blocks (last_used);
+CREATE TABLE IF NOT EXISTS token_counts (
+    digest TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    counter TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    PRIMARY KEY (digest, variant, counter)
+);
+"""
+
+
+def _read_contents(path: str) -> Tuple[str, Optional[bytes]]:
+    """
+    Read a file for rendering, stopping after the first block if it looks binary.
+
+    Returns:
+        The content digest and the file bytes, or a digest of the first block and None for binary files
+    """
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_binary(head):
+            return "binary:" + hashlib.sha256(head).hexdigest(), None
+        data = head + f.read()
+    return hashlib.sha256(data).hexdigest(), data
+
+
+def _blob_digest(entry: FileEntry) -> str:
+    """Digest of a file listed from git objects; the blob ID already names its contents."""
+    return "git:" + entry.blob
+
+
+def _read_blob(entry: FileEntry) -> Optional[bytes]:
+    """Read the blob of a file listed from git objects, or return None if it looks binary."""
+    data = entry.tree.read(entry.blob)
+    return None if looks_binary(data[:SNIFF_BYTES]) else data
+
+
+@dataclass(frozen=True)
+class CachedBlock:
+    """A rendered file block; ``block`` is None for files that were skipped as binary."""
+
+    digest: str
+    block: Optional[str]
+
+
+class FileCache:
+    """
+    On-disk cache of rendered file blocks with LRU eviction.
+
+    Safe to share between worker threads: database access is serialized,
+    while file reading and rendering run outside the lock.
+
+    Args:
+        cache_dir: Directory holding the cache database
+        max_bytes: Size cap for stored blocks
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._touched = set()
+        self._lock = threading.Lock()
+        # Set when the database stays locked; nothing more is stored in this run.
+        self._read_only = False
+        self._db: Optional[sqlite3.Connection] = None
+        db = None
+        try:
+            # Autocommit mode: each write is its own transaction.
+            db = sqlite3.connect(
+                cache_dir / "files.sqlite3", timeout=_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+        except sqlite3.OperationalError:
+            if db is not None:
+                db.close()
+            return
+        self._db = db
+
+    def get_or_render(
+        self,
+        entry: FileEntry,
+        variant: str,
+        render: Callable[[bytes], Optional[str]],
+    ) -> CachedBlock:
+        """
+        Return the rendered block for a file, rendering and storing it on a miss.
+
+        Args:
+            entry: The file to render
+            variant: String identifying the rendering options
+            render: Function turning raw file bytes into a block (or None to skip);
+                not called for files whose first block looks binary
+
+        Returns:
+            The cached or freshly rendered block
+        """
+        if entry.blob is not None:
+            digest = _blob_digest(entry)
+            with self._lock:
+                cached = self._lookup(digest, variant)
+                if cached:
+                    self.hits += 1
+                    return cached
+                self.misses += 1
+            data = _read_blob(entry)
+        else:
+            racy = self._is_racy(entry)
+            with self._lock:
+                row = self._query("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (entry.path,))
+                if row and row[0] == entry.size and row[1] == entry.mtime_ns and not racy:
+                    cached = self._lookup(row[2], variant)
+                    if cached:
+                        self.hits += 1
+                        return cached
+
+            digest, data = _read_contents(entry.path)
+            with self._lock:
+                if not racy:
+                    # A racy file may change again within its mtime tick; its stat data is not remembered.
+                    self._write(
+                        "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest) VALUES (?, ?, ?, ?)",
+                        (entry.path, entry.size, entry.mtime_ns, digest),
+                    )
+                cached = self._lookup(digest, variant)
+                if cached:
+                    self.hits += 1
+                    return cached
+                self.misses += 1
+
+        block = render(data) if data is not None else None
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO blocks (digest, variant, block, nbytes, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (digest, variant, block, _ROW_OVERHEAD + len(block.encode("utf-8") if block else b""), time.time()),
+            )
+        return CachedBlock(digest, block)
+
+    def get_or_count(self, cached: CachedBlock, variant: str, counter: str, count: Callable[[str], int]) -> int:
+        """
+        Return the token count of a cached block, counting and storing it on a miss.
+
+        Args:
+            cached: Block returned by get_or_render
+            variant: String identifying the rendering options
+            counter: Name of the tokenizer the count belongs to
+            count: Function counting the tokens of a block
+
+        Returns:
+            Token count of the block (0 for skipped files)
+        """
+        if cached.block is None:
+            return 0
+        key = (cached.digest, variant, counter)
+        with self._lock:
+            row = self._query("SELECT tokens FROM token_counts WHERE digest = ? AND variant = ? AND counter = ?", key)
+        if row is not None:
+            return row[0]
+        tokens = count(cached.block)
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO token_counts (digest, variant, counter, tokens) VALUES (?, ?, ?, ?)",
+                key + (tokens,),
+            )
+        return tokens
+
+    def close(self) -> None:
+        """Record access times, evict blocks over the size cap and close the database."""
+        if self._db is None:
+            return
+        try:
+            if not self._read_only:
+                now = time.time()
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.executemany(
+                    "UPDATE blocks SET last_used = ? WHERE digest = ? AND variant = ?",
+                    [(now, digest, variant) for digest, variant in self._touched],
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # Another run kept the database locked; access times and eviction wait for the next run.
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+        finally:
+            self._db.close()
+            self._db = None
+
+    def _query(self, sql: str, params: tuple) -> Optional[tuple]:
+        """Run a query and return its first row, or None when the database is unavailable."""
+        if self._db is None:
+            return None
+        try:
+            return self._db.execute(sql, params).fetchone()
+        except sqlite3.OperationalError:
+            return None
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """Run and commit a write, giving up on writes for this run if the database stays locked."""
+        if self._db is None or self._read_only:
+            return
+        try:
+            self._db.execute(sql, params)
+        except sqlite3.OperationalError:
+            self._read_only = True
+
+    def _lookup(self, digest: str, variant: str) -> Optional[CachedBlock]:
+        row = self._query("SELECT block FROM blocks WHERE digest = ? AND variant = ?", (digest, variant))
+        if row is None:
+            return None
+        self._touched.add((digest, variant))
+        return CachedBlock(digest, row[0])
+
+    def _is_racy(self, entry: FileEntry) -> bool:
+        return time.time_ns() - entry.mtime_ns < _RACY_WINDOW_NS
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM blocks").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Evict down to 90% of the cap so the next run does not evict again immediately.
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        doomed = []
+        for digest, variant, nbytes in self._db.execute(
+            "SELECT digest, variant, nbytes FROM blocks ORDER BY last_used"
+        ):
+            if freed >= target:
+                break
+            doomed.append((digest, variant))
+            freed += nbytes
+        self._db.executemany("DELETE FROM blocks WHERE digest = ? AND variant = ?", doomed)
+        self._db.execute("DELETE FROM files WHERE digest NOT IN (SELECT digest FROM blocks)")
+        self._db.execute(
+            "DELETE FROM token_counts WHERE NOT EXISTS (SELECT 1 FROM blocks "
+            "WHERE blocks.digest = token_counts.digest AND blocks.variant = token_counts.variant)"
+        )
+
+
+class MemoryCache:
+    """
+    In-memory counterpart of FileCache for long-running processes.
+
+    Blocks are keyed by path, size, mtime and rendering variant, and evicted
+    least recently used first once they exceed the size cap. Token counts
+    are evicted the same way under the same cap. Same interface as FileCache.
+
+    Args:
+        max_bytes: Size cap for stored blocks, and separately for token counts
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._blocks: "OrderedDict[tuple, CachedBlock]" = OrderedDict()
+        self._tokens: "OrderedDict[tuple, int]" = OrderedDict()
+        self._nbytes = 0
+
+    def get_or_render(
+        self,
+        entry: FileEntry,
+        variant: str,
+        render: Callable[[bytes], Optional[str]],
+    ) -> CachedBlock:
+        """Return the rendered block for a file, rendering and storing it on a miss."""
+        if entry.blob is not None:
+            key = (_blob_digest(entry), variant)
+        else:
+            key = (entry.path, entry.size, entry.mtime_ns, variant)
+        with self._lock:
+            cached = self._blocks.get(key)
+            if cached is not None:
+                self._blocks.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        if entry.blob is not None:
+            digest, data = _blob_digest(entry), _read_blob(entry)
+        else:
+            digest, data = _read_contents(entry.path)
+        cached = CachedBlock(digest, render(data) if data is not None else None)
+        if entry.blob is None and time.time_ns() - entry.mtime_ns < _RACY_WINDOW_NS:
+            return cached
+        with self._lock:
+            # Another thread may have rendered the same file meanwhile.
+            replaced = self._blocks.pop(key, None)
+            if replaced is not None:
+                self._nbytes -= _ROW_OVERHEAD + len(replaced.block or "")
+            self._blocks[key] = cached
+            self._nbytes += _ROW_OVERHEAD + len(cached.block or "")
+            while self._nbytes > self.max_bytes and self._blocks:
+                _, evicted = self._blocks.popitem(last=False)
+                self._nbytes -= _ROW_OVERHEAD + len(evicted.block or "")
+        return cached
+
+    def get_or_count(self, cached: CachedBlock, variant: str, counter: str, count: Callable[[str], int]) -> int:
+        """Return the token count of a cached block, counting and storing it on a miss."""
+        if cached.block is None:
+            return 0
+        key = (cached.digest, variant, counter)
+        with self._lock:
+            tokens = self._tokens.get(key)
+            if tokens is not None:
+                self._tokens.move_to_end(key)
+                return tokens
+        tokens = count(cached.block)
+        with self._lock:
+            self._tokens[key] = tokens
+            while len(self._tokens) * _ROW_OVERHEAD > self.max_bytes:
+                self._tokens.popitem(last=False)
+        return tokens
+
+    def close(self) -> None:
+        """Nothing to persist; present for interface parity with FileCache."""
@@ -0,0 +1,153 @@
+"""
+Long-running prompt server for a single codebase.
+
+``code2prompt --serve`` keeps a PipelineState warm for one root: rendered
+blocks and token counts live in memory, directory listings are indexed, and
+(where inotify is available) whole walk results are reused until a watched
+change invalidates them. Clients connect over a Unix domain socket, send one
+JSON request line and read one JSON reply line.
+
+Requests are handled one at a time; the pipeline itself already renders on
+worker threads when ``jobs`` is set.
+"""
+
+import json
+import os
+import socket
+import socketserver
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .cache import MemoryCache
+from .dirindex import MemoryIndex
+from .errors import Code2PromptError
+from .pipeline import PipelineState, RunSummary, generate_prompt
+from .watch import start_watcher
+
+# How long a client waits for a reply before falling back to local generation.
+DEFAULT_TIMEOUT = 300.0
+
+
+class DaemonUnavailable(Code2PromptError):
+    """Raised by the client when no daemon could serve the request."""
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+            reply = self.server.generate(request)
+        except Exception as e:
+            reply = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class PromptServer(socketserver.UnixStreamServer):
+    """
+    Unix socket server generating prompts for one codebase from warm state.
+
+    Args:
+        socket_path: Path of the Unix domain socket to listen on
+        codebase_path: Codebase root served by this daemon
+    """
+
+    def __init__(self, socket_path: Path, codebase_path: Path):
+        self.codebase_path = Path(codebase_path).resolve()
+        self.state = PipelineState(cache=MemoryCache(), index=MemoryIndex())
+        self.watcher = start_watcher(str(self.codebase_path), lambda _: self.state.invalidate())
+        # Without change notification a cached walk could go stale unnoticed.
+        self.state.cache_walks = self.watcher is not None
+
+        socket_path = Path(socket_path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+        _remove_stale_socket(socket_path)
+        super().__init__(str(socket_path), _RequestHandler)
+
+    def generate(self, request: dict) -> dict:
+        """
+        Generate the prompt described by a client request.
+
+        Args:
+            request: Decoded request with codebase_path, prompt_text and options
+
+        Returns:
+            Reply with the prompt and run summary, or an error
+        """
+        codebase_path = Path(request["codebase_path"]).resolve()
+        if codebase_path != self.codebase_path:
+            return {"ok": False, "error": f"daemon serves {self.codebase_path}, not {codebase_path}"}
+        if self.watcher is not None:
+            # Changes made just before the request must invalidate cached walks before they are reused.
+            self.watcher.drain()
+        summary = RunSummary()
+        prompt = generate_prompt(
+            codebase_path, request.get("prompt_text"), request.get("options", {}), summary, self.state
+        )
+        return {"ok": True, "prompt": prompt, "summary": asdict(summary)}
+
+    def server_close(self) -> None:
+        super().server_close()
+        if self.watcher is not None:
+            self.watcher.close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove a socket file left behind by a daemon that is no longer running."""
+    if not socket_path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except OSError:
+        socket_path.unlink()
+    else:
+        raise OSError(f"a daemon is already listening on {socket_path}")
+    finally:
+        probe.close()
+
+
+def request_prompt(
+    socket_path: Path,
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    options: dict,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Tuple[str, RunSummary]:
+    """
+    Ask a running daemon to generate a prompt.
+
+    Args:
+        socket_path: Path of the daemon's Unix domain socket
+        codebase_path: Path to the codebase directory
+        prompt_text: Optional user prompt text
+        options: Dictionary of options from CLI arguments
+        timeout: Seconds to wait for the reply
+
+    Returns:
+        The generated prompt and the daemon's run summary
+
+    Raises:
+        DaemonUnavailable: If the daemon cannot be reached or could not generate the prompt
+    """
+    request = {"codebase_path": str(codebase_path), "prompt_text": prompt_text, "options": options}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(str(socket_path))
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            with client.makefile("rb") as reply_file:
+                line = reply_file.readline()
+    except OSError as e:
+        raise DaemonUnavailable(str(e)) from e
+    if not line:
+        raise DaemonUnavailable("daemon closed the connection without replying")
+
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise DaemonUnavailable(reply.get("error", "unknown daemon error"))
+    return reply["prompt"], RunSummary(**reply["summary"])
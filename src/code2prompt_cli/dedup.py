@@ -0,0 +1,240 @@
+"""
+Content deduplication for the built-in pipeline.
+
+Monorepos hold many copies of the same file (vendored packages, generated
+clients, license files). With ``--dedup``, a file whose contents are
+identical to an earlier file in the prompt is emitted as a reference to
+that file instead of in full. Only files sharing their size with another
+file can be identical, so the others are never hashed.
+
+With ``--near-dup THRESHOLD``, files whose lines are at least THRESHOLD
+similar (Jaccard similarity of their sets of lines) to an earlier file are
+emitted as a unified diff against it. Similar files are found with MinHash
+signatures (one-permutation hashing: one hash per line, 128 bins) and
+locality-sensitive hashing over bands of the signature, so each file is
+compared with a few candidates rather than with every earlier file.
+"""
+
+import difflib
+import hashlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import AbstractSet, Dict, List, Optional, Tuple
+
+from .ingest import read_entry
+from .render import SNIFF_BYTES, looks_binary
+from .walker import FileEntry
+
+# MinHash signature layout: 2 ** _BIN_BITS bins, grouped into bands of _ROWS bins for LSH.
+_BIN_BITS = 7
+_BINS = 1 << _BIN_BITS
+_ROWS = 4
+_VALUE_BITS = 64 - _BIN_BITS
+# Marks a bin no line hashed into; larger than every value.
+_EMPTY = 1 << _VALUE_BITS
+
+# Files with fewer distinct lines than this are not worth replacing with a diff.
+MIN_NEAR_DUP_LINES = 8
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class DuplicateRef:
+    """
+    Stands in for the block of a file that duplicates an earlier one.
+
+    Attributes:
+        original: Display path of the earlier file
+        similarity: 1.0 for identical contents, else the estimated similarity
+        diff: Unified diff from the earlier file, for near-duplicates
+    """
+
+    original: str
+    similarity: float = 1.0
+    diff: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """What deduplication needs to know about one file."""
+
+    digest: Optional[str] = None
+    signature: Optional[Tuple[int, ...]] = None
+
+
+@dataclass
+class DedupPlan:
+    """Files to replace, keyed by path."""
+
+    # path -> earlier file with identical contents
+    duplicates: Dict[str, FileEntry] = field(default_factory=dict)
+    # path -> (earlier similar file, estimated similarity)
+    near: Dict[str, Tuple[FileEntry, float]] = field(default_factory=dict)
+
+    def retain(self, included: AbstractSet[str], whole: AbstractSet[str]) -> None:
+        """
+        Forget replacements that no longer apply after budget packing.
+
+        Args:
+            included: Paths of the files in the prompt
+            whole: Paths of the files in the prompt that are not truncated
+        """
+        self.duplicates = {
+            path: original for path, original in self.duplicates.items()
+            if path in included and original.path in included
+        }
+        # A diff against a truncated base would describe lines the prompt does not show.
+        self.near = {
+            path: (base, similarity) for path, (base, similarity) in self.near.items()
+            if path in included and base.path in whole
+        }
+
+
+class Deduplicator:
+    """
+    Finds duplicate and near-duplicate files among the files of a prompt.
+
+    fingerprint() reads a file and may run on worker threads; add() must be
+    called for every file in prompt order, so each duplicate refers to the
+    first file with the same contents.
+
+    Args:
+        files: All candidate files, used to find which sizes occur more than once
+        near_threshold: Minimum similarity for near-duplicates; None disables them
+    """
+
+    def __init__(self, files: List[FileEntry], near_threshold: Optional[float] = None):
+        self.near_threshold = near_threshold
+        self.plan = DedupPlan()
+        self._sizes = Counter(entry.size for entry in files)
+        self._originals: Dict[str, FileEntry] = {}
+        self._bases: List[Tuple[FileEntry, Tuple[int, ...]]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    def fingerprint(self, entry: FileEntry) -> Fingerprint:
+        """Hash a file's contents and, for near-duplicate detection, compute its signature."""
+        may_be_identical = entry.size > 0 and self._sizes[entry.size] > 1
+        if self.near_threshold is None:
+            if not may_be_identical:
+                return Fingerprint()
+            return Fingerprint(digest=_file_digest(entry.path) if entry.blob is None else _blob_digest(entry))
+        text = read_entry(entry)
+        if text is None:
+            return Fingerprint()
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest() if may_be_identical else None
+        return Fingerprint(digest, minhash_signature(text))
+
+    def add(self, entry: FileEntry, fingerprint: Fingerprint) -> None:
+        """Record a file, noting it as a duplicate if it matches an earlier one."""
+        if fingerprint.digest is not None:
+            original = self._originals.setdefault(fingerprint.digest, entry)
+            if original is not entry:
+                self.plan.duplicates[entry.path] = original
+                return
+        signature = fingerprint.signature
+        if signature is None:
+            return
+        keys = [
+            (band, signature[band:band + _ROWS]) for band in range(0, _BINS, _ROWS)
+            if any(value != _EMPTY for value in signature[band:band + _ROWS])
+        ]
+        best, best_similarity = None, 0.0
+        for index in sorted({index for key in keys for index in self._buckets.get(key, ())}):
+            similarity = estimate_similarity(signature, self._bases[index][1])
+            if similarity > best_similarity:
+                best, best_similarity = index, similarity
+        if best is not None and best_similarity >= self.near_threshold:
+            self.plan.near[entry.path] = (self._bases[best][0], best_similarity)
+            return
+        # Only files emitted in full serve as bases, so diffs never chain.
+        index = len(self._bases)
+        self._bases.append((entry, signature))
+        for key in keys:
+            self._buckets.setdefault(key, []).append(index)
+
+
+def _blob_digest(entry: FileEntry) -> Optional[str]:
+    """Return the blob ID of a file listed from git objects, which names its contents, or None if it looks binary."""
+    return None if looks_binary(entry.tree.read(entry.blob)[:SNIFF_BYTES]) else entry.blob
+
+
+def _file_digest(path: str) -> Optional[str]:
+    """Return the SHA-256 of a file's contents, or None if it looks binary."""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_binary(head):
+            return None
+        digest = hashlib.sha256(head)
+        while True:
+            chunk = f.read(_HASH_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def minhash_signature(text: str) -> Optional[Tuple[int, ...]]:
+    """
+    Compute the MinHash signature of a text's set of lines.
+
+    Each distinct line (with surrounding whitespace removed) is hashed once;
+    the top bits of the hash pick a bin and each bin keeps its smallest value.
+    The hash is stable across processes, so the same files always produce the
+    same prompt.
+
+    Args:
+        text: File contents
+
+    Returns:
+        Signature of _BINS values, or None if the text has too few distinct lines
+    """
+    lines = {line.strip() for line in text.splitlines()}
+    lines.discard("")
+    if len(lines) < MIN_NEAR_DUP_LINES:
+        return None
+    bins = [_EMPTY] * _BINS
+    value_mask = _EMPTY - 1
+    for line in lines:
+        h = int.from_bytes(hashlib.blake2b(line.encode("utf-8"), digest_size=8).digest(), "big")
+        slot, value = h >> _VALUE_BITS, h & value_mask
+        if value < bins[slot]:
+            bins[slot] = value
+    return tuple(bins)
+
+
+def estimate_similarity(a: Tuple[int, ...], b: Tuple[int, ...]) -> float:
+    """Estimate the Jaccard similarity of two line sets from their signatures."""
+    matches = used = 0
+    for x, y in zip(a, b):
+        if x == _EMPTY and y == _EMPTY:
+            continue
+        used += 1
+        if x == y:
+            matches += 1
+    return matches / used if used else 0.0
+
+
+def near_duplicate_diff(base: FileEntry, entry: FileEntry, base_path: str, path: str) -> Optional[str]:
+    """
+    Diff a near-duplicate file against its base.
+
+    Args:
+        base: The earlier, similar file
+        entry: The near-duplicate
+        base_path: Display path of the base, for the diff header
+        path: Display path of the near-duplicate
+
+    Returns:
+        Unified diff text, or None if it would not be shorter than the file itself
+    """
+    text = read_entry(entry)
+    base_text = read_entry(base)
+    if text is None or base_text is None:
+        return None
+    diff = "\n".join(difflib.unified_diff(
+        base_text.splitlines(), text.splitlines(), base_path, path, n=1, lineterm=""
+    ))
+    if len(diff) >= len(text):
+        return None
+    return diff
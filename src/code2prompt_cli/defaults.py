@@ -0,0 +1,72 @@
+"""
+Default settings referenced by the command-line interface.
+
+Click needs these while the command is being defined, before it knows which
+code path will run, so this module must stay free of imports beyond the
+standard library basics; the modules implementing each feature import their
+defaults from here.
+"""
+
+import os
+from pathlib import Path
+
+# Size cap of the rendered-file cache.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Seconds to wait for the clipboard helper before giving up on the copy.
+DEFAULT_CLIPBOARD_TIMEOUT = 5.0
+
+# Size after which the diff of one file is cut, for --max-diff-size.
+DEFAULT_MAX_DIFF_BYTES = 64 * 1024
+
+# Commits listed by --git-log-branch, for --max-log-entries.
+DEFAULT_MAX_LOG_ENTRIES = 200
+
+# Ways of ranking files for --max-tokens; see budget.rank_files().
+RANK_ORDERS = ('relevance', 'recent', 'git_recent', 'size')
+
+# Values of --sort; see ordering.sort_files().
+SORT_ORDERS = ('name_asc', 'name_desc', 'date_asc', 'date_desc', 'size_asc', 'size_desc', 'git_recent')
+
+# Values of --output-format; see formats.get_format().
+OUTPUT_FORMATS = ('markdown', 'json', 'ndjson', 'xml')
+
+
+def default_cache_dir() -> Path:
+    """Return the platform cache directory used when ``--cache`` is given without ``--cache-dir``."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    return Path(base or Path.home() / ".cache") / "code2prompt-cli"
+
+
+# Suffixes accepted by parse_size(), as binary multiples.
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value) -> int:
+    """
+    Parse a byte count such as ``500000``, ``"512K"``, ``"10M"`` or ``"2GB"``.
+
+    Args:
+        value: Integer, or string with an optional K/M/G/T suffix (binary multiples)
+
+    Returns:
+        Number of bytes
+
+    Raises:
+        ValueError: If the value is not a positive size
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        number, unit = value, ''
+    else:
+        text = str(value).strip().upper()
+        if text.endswith('B'):
+            text = text[:-1]
+        unit = text[-1:] if text[-1:] in _SIZE_UNITS else ''
+        try:
+            number = float(text[:len(text) - len(unit)])
+        except ValueError:
+            raise ValueError(f"invalid size: {value!r}") from None
+    size = int(number * _SIZE_UNITS[unit])
+    if size < 1:
+        raise ValueError(f"size must be positive: {value!r}")
+    return size
@@ -0,0 +1,99 @@
+"""
+Persistent directory index for the walker.
+
+For every directory visited, the index remembers its mtime and the entries
+that survived hidden-file and ignore filtering. A directory whose mtime and
+rule signature are unchanged on the next run is not listed or re-filtered
+again; its remembered entries are used instead.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Directories modified this recently may change again within the same mtime
+# tick, so their listings are neither trusted nor stored.
+_RACY_WINDOW_NS = 2_000_000_000
+
+# (name, is_dir) pairs, sorted by name.
+Listing = List[Tuple[str, bool]]
+
+
+class DirectoryIndex:
+    """
+    SQLite-backed map from directory path to its filtered listing.
+
+    Args:
+        cache_dir: Directory holding the index database
+    """
+
+    def __init__(self, cache_dir: Path):
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(cache_dir / "walk_index.sqlite3")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, signature TEXT NOT NULL, "
+            "has_ignore_file INTEGER NOT NULL, entries TEXT NOT NULL)"
+        )
+        self._pending = []
+
+    def lookup(self, path: str, mtime_ns: int) -> Optional[Tuple[str, bool, Listing]]:
+        """
+        Find the remembered listing of a directory.
+
+        Args:
+            path: Directory path
+            mtime_ns: Current mtime of the directory
+
+        Returns:
+            (signature, has_ignore_file, listing) if the directory is unchanged, else None
+        """
+        if time.time_ns() - mtime_ns < _RACY_WINDOW_NS:
+            return None
+        row = self._db.execute(
+            "SELECT mtime_ns, signature, has_ignore_file, entries FROM dirs WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None or row[0] != mtime_ns:
+            return None
+        return row[1], bool(row[2]), [(name, is_dir) for name, is_dir in json.loads(row[3])]
+
+    def store(self, path: str, mtime_ns: int, signature: str, has_ignore_file: bool, listing: Listing) -> None:
+        """Remember a directory's filtered listing; written on close()."""
+        if time.time_ns() - mtime_ns < _RACY_WINDOW_NS:
+            return
+        self._pending.append((path, mtime_ns, signature, int(has_ignore_file), json.dumps(listing)))
+
+    def close(self) -> None:
+        """Write remembered listings and close the database."""
+        self._db.executemany("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)", self._pending)
+        self._db.commit()
+        self._db.close()
+
+
+class MemoryIndex:
+    """In-memory counterpart of DirectoryIndex for long-running processes; same interface."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._dirs = {}
+
+    def lookup(self, path: str, mtime_ns: int) -> Optional[Tuple[str, bool, Listing]]:
+        """Find the remembered listing of a directory, if its mtime is unchanged."""
+        row = self._dirs.get(path)
+        if row is None or row[0] != mtime_ns or time.time_ns() - mtime_ns < _RACY_WINDOW_NS:
+            return None
+        return row[1:]
+
+    def store(self, path: str, mtime_ns: int, signature: str, has_ignore_file: bool, listing: Listing) -> None:
+        """Remember a directory's filtered listing."""
+        if time.time_ns() - mtime_ns >= _RACY_WINDOW_NS:
+            self._dirs[path] = (mtime_ns, signature, has_ignore_file, listing)
+
+    def close(self) -> None:
+        """Nothing to persist; present for interface parity with DirectoryIndex."""
@@ -0,0 +1,26 @@
+"""
+Exceptions raised by code2prompt-cli.
+
+Every error the package raises deliberately derives from Code2PromptError,
+so callers of the Python API (see generator.py) can catch a single type. The
+command-line interface turns them into error messages and exit codes.
+
+Like defaults.py, this module is imported at startup and must stay free of
+imports.
+"""
+
+
+class Code2PromptError(Exception):
+    """Base class of all errors raised by code2prompt-cli."""
+
+
+class ConfigurationError(Code2PromptError, ValueError):
+    """Raised when options, the codebase path or another input is invalid."""
+
+
+class GenerationError(Code2PromptError):
+    """Raised when a prompt cannot be generated from valid options, for instance because a file cannot be read."""
+
+
+class BackendUnavailableError(Code2PromptError):
+    """Raised when a required optional dependency, such as code2prompt-rs, is not installed."""
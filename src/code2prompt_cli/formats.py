@@ -0,0 +1,266 @@
+"""
+Output formats of the built-in pipeline.
+
+A prompt is produced as a header (project path and source tree), one
+section per file and a footer (the user request). Each format serializes
+those parts independently, so structured output is streamed like the
+markdown prompt: every file record is encoded as soon as its file is
+rendered, and no document is ever built in memory. Files deduplicated with
+``--dedup`` become records naming the earlier file (and, for
+near-duplicates, the diff from it) instead of carrying contents. The git
+diffs and logs asked for with ``--diff``, ``--git-diff-branch`` and
+``--git-log-branch`` follow the files as records of their own, one per file
+diff (see gitcontext.py).
+
+- ``markdown``: the code2prompt layout (see render.py)
+- ``json``: one JSON document whose ``files`` array holds a record per file,
+  each on its own line, followed by a ``git`` array
+- ``ndjson``: newline-delimited JSON, one ``project`` record, one ``file``
+  record per file and a ``request`` record
+- ``xml``: a ``<prompt>`` document with one ``<file>`` element per file,
+  followed by ``<diff>`` and ``<log>`` elements in ``<git>``
+"""
+
+import json
+import re
+from typing import TYPE_CHECKING, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from .render import format_user_request, render_file_entry, render_header
+
+if TYPE_CHECKING:
+    from .dedup import DuplicateRef
+    from .gitcontext import GitRecord
+
+# Characters XML 1.0 does not allow, even escaped.
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+class PromptFormat:
+    """
+    Serializes the parts of a prompt.
+
+    Methods return text that is concatenated in order: header(), file() for
+    each file with ``between_files`` in between, then if there are git
+    records ``git_begin``, git() for each record (with git_heading() before
+    each group and ``between_files`` in between) and finally footer(). They
+    keep no state, so file records can be encoded (and their tokens counted)
+    on worker threads.
+
+    Attributes:
+        name: Format name, as given to --output-format
+        structured: File contents are data to escape, not markdown text
+        between_files: Text separating consecutive file (or git) records
+        git_begin: Text ending the file records and starting the git records
+    """
+
+    name = ''
+    structured = True
+    between_files = ''
+    git_begin = ''
+
+    def header(self, codebase_path: str, tree: str) -> str:
+        """Serialize the project path and source tree, opening the document."""
+        raise NotImplementedError
+
+    def file(self, display_path: str, extension: str, content: str) -> str:
+        """Serialize one file record."""
+        raise NotImplementedError
+
+    def duplicate(self, display_path: str, extension: str, ref: 'DuplicateRef', block: str) -> str:
+        """
+        Serialize the record of a file that duplicates an earlier one.
+
+        Args:
+            display_path: Path of the duplicate
+            extension: Its extension
+            ref: The earlier file and, for near-duplicates, the diff from it
+            block: The reference rendered as markdown text
+        """
+        raise NotImplementedError
+
+    def git_heading(self, title: str) -> str:
+        """Serialize the heading of consecutive git records with the same kind and source."""
+        return ''
+
+    def git(self, record: 'GitRecord', block: str) -> str:
+        """
+        Serialize one git record.
+
+        Args:
+            record: The diff of one file, or a commit log
+            block: The record rendered as markdown text
+        """
+        raise NotImplementedError
+
+    def footer(self, prompt_text: Optional[str], git: bool = False) -> str:
+        """Serialize the user request, if any, and close the document (after git records, if ``git``)."""
+        raise NotImplementedError
+
+
+class MarkdownFormat(PromptFormat):
+    """The code2prompt markdown layout."""
+
+    name = 'markdown'
+    structured = False
+
+    def header(self, codebase_path: str, tree: str) -> str:
+        return render_header(codebase_path, tree)
+
+    def file(self, display_path: str, extension: str, content: str) -> str:
+        return render_file_entry(display_path, content)
+
+    def duplicate(self, display_path: str, extension: str, ref: 'DuplicateRef', block: str) -> str:
+        return render_file_entry(display_path, block)
+
+    def git_heading(self, title: str) -> str:
+        return f"\n\n{title}:"
+
+    def git(self, record: 'GitRecord', block: str) -> str:
+        return f"\n\n{block}"
+
+    def footer(self, prompt_text: Optional[str], git: bool = False) -> str:
+        return format_user_request(prompt_text) if prompt_text else ""
+
+
+def _json(value: dict) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _duplicate_fields(ref: 'DuplicateRef') -> dict:
+    if ref.diff is None:
+        return {"duplicate_of": ref.original}
+    return {"near_duplicate_of": ref.original, "similarity": round(ref.similarity, 2), "diff": ref.diff}
+
+
+def _git_fields(record: 'GitRecord') -> dict:
+    if record.kind == "log":
+        fields = {"source": record.source, "log": record.text}
+        if record.omitted:
+            fields["omitted_commits"] = record.omitted
+        return fields
+    fields = {"source": record.source, "path": record.path}
+    if record.old_path is not None:
+        fields["old_path"] = record.old_path
+    fields["diff"] = record.text
+    if record.omitted:
+        fields["omitted_lines"] = record.omitted
+    return fields
+
+
+class JSONFormat(PromptFormat):
+    """A single JSON document with one line per file record."""
+
+    name = 'json'
+    between_files = ','
+    git_begin = '\n], "git": ['
+
+    def header(self, codebase_path: str, tree: str) -> str:
+        return '{"project_path": %s, "source_tree": %s, "files": [' % (
+            json.dumps(codebase_path, ensure_ascii=False), json.dumps(tree, ensure_ascii=False)
+        )
+
+    def file(self, display_path: str, extension: str, content: str) -> str:
+        return "\n" + _json({"path": display_path, "extension": extension, "content": content})
+
+    def duplicate(self, display_path: str, extension: str, ref: 'DuplicateRef', block: str) -> str:
+        return "\n" + _json({"path": display_path, "extension": extension, **_duplicate_fields(ref)})
+
+    def git(self, record: 'GitRecord', block: str) -> str:
+        return "\n" + _json({"kind": record.kind, **_git_fields(record)})
+
+    def footer(self, prompt_text: Optional[str], git: bool = False) -> str:
+        # Closes the files array, or the git array that replaced it.
+        return '\n], "user_request": %s}\n' % json.dumps(prompt_text, ensure_ascii=False)
+
+
+class NDJSONFormat(PromptFormat):
+    """Newline-delimited JSON records, for consumers that parse line by line."""
+
+    name = 'ndjson'
+
+    def header(self, codebase_path: str, tree: str) -> str:
+        return _json({"type": "project", "project_path": codebase_path, "source_tree": tree})
+
+    def file(self, display_path: str, extension: str, content: str) -> str:
+        return "\n" + _json({"type": "file", "path": display_path, "extension": extension, "content": content})
+
+    def duplicate(self, display_path: str, extension: str, ref: 'DuplicateRef', block: str) -> str:
+        return "\n" + _json({"type": "file", "path": display_path, "extension": extension, **_duplicate_fields(ref)})
+
+    def git(self, record: 'GitRecord', block: str) -> str:
+        return "\n" + _json({"type": "git_" + record.kind, **_git_fields(record)})
+
+    def footer(self, prompt_text: Optional[str], git: bool = False) -> str:
+        if not prompt_text:
+            return "\n"
+        return "\n" + _json({"type": "request", "user_request": prompt_text}) + "\n"
+
+
+def _xml_text(text: str) -> str:
+    """Escape text for XML, replacing characters XML cannot represent with U+FFFD."""
+    return escape(_XML_INVALID.sub("\ufffd", text))
+
+
+def _xml_attr(value: str) -> str:
+    """Quote an attribute value for XML."""
+    return quoteattr(_XML_INVALID.sub("\ufffd", value))
+
+
+class XMLFormat(PromptFormat):
+    """A ``<prompt>`` XML document with one ``<file>`` element per file."""
+
+    name = 'xml'
+    git_begin = '\n</files>\n<git>'
+
+    def header(self, codebase_path: str, tree: str) -> str:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<prompt>\n'
+            f"<project_path>{_xml_text(codebase_path)}</project_path>\n"
+            f"<source_tree>{_xml_text(tree)}</source_tree>\n<files>"
+        )
+
+    def file(self, display_path: str, extension: str, content: str) -> str:
+        return "\n<file path={} extension={}>{}</file>".format(
+            _xml_attr(display_path), _xml_attr(extension), _xml_text(content)
+        )
+
+    def duplicate(self, display_path: str, extension: str, ref: 'DuplicateRef', block: str) -> str:
+        start = "\n<file path={} extension={}".format(_xml_attr(display_path), _xml_attr(extension))
+        if ref.diff is None:
+            return f"{start} duplicate_of={_xml_attr(ref.original)}/>"
+        return "{} near_duplicate_of={} similarity=\"{:.2f}\">{}</file>".format(
+            start, _xml_attr(ref.original), ref.similarity, _xml_text(ref.diff)
+        )
+
+    def git(self, record: 'GitRecord', block: str) -> str:
+        fields = _git_fields(record)
+        text = fields.pop(record.kind)
+        attributes = "".join(f" {name}={_xml_attr(str(value))}" for name, value in fields.items())
+        return f"\n<{record.kind}{attributes}>{_xml_text(text)}</{record.kind}>"
+
+    def footer(self, prompt_text: Optional[str], git: bool = False) -> str:
+        request = f"<user_request>{_xml_text(prompt_text)}</user_request>\n" if prompt_text else ""
+        return f"\n</{'git' if git else 'files'}>\n{request}</prompt>\n"
+
+
+_FORMATS = {fmt.name: fmt for fmt in (MarkdownFormat(), JSONFormat(), NDJSONFormat(), XMLFormat())}
+
+
+def get_format(name: Optional[str]) -> PromptFormat:
+    """
+    Look up an output format.
+
+    Args:
+        name: One of OUTPUT_FORMATS; None means markdown
+
+    Returns:
+        The format's serializer
+
+    Raises:
+        ValueError: If the format is unknown
+    """
+    try:
+        return _FORMATS[name or 'markdown']
+    except KeyError:
+        raise ValueError(f"unknown output format: {name}") from None
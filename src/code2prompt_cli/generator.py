@@ -0,0 +1,304 @@
+"""
+Python API: long-lived prompt generators for one codebase.
+
+Services that build many prompts should not spawn the CLI for each one.
+A PromptGenerator is configured once and keeps everything the built-in
+pipeline can reuse between calls: the rendered-block cache, the directory
+index, tokenizers, compiled templates and (where the codebase can be
+watched for changes, see watch.py) whole walk results::
+
+    from code2prompt_cli import PromptGenerator
+
+    with PromptGenerator("services/auth", include=["*.py"], tokens="raw") as generator:
+        prompt = generator.generate("Review the token refresh logic")
+        for chunk in generator.iter_prompt("Where are sessions stored?"):
+            send(chunk)
+
+Invalid options raise ConfigurationError when the generator is created and
+failures while generating raise GenerationError; both derive from
+Code2PromptError, like every other error the package raises.
+"""
+
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Sequence, Union
+
+from .cache import FileCache, MemoryCache
+from .defaults import DEFAULT_MAX_BYTES, OUTPUT_FORMATS, RANK_ORDERS, SORT_ORDERS, parse_size
+from .dirindex import MemoryIndex
+from .errors import ConfigurationError, GenerationError
+from .pipeline import PipelineState, RunSummary
+from .pipeline import iter_prompt as _iter_prompt
+from .timings import Timings
+from .watch import start_watcher
+
+# Values of the tokens argument, as for --tokens.
+TOKEN_FORMATS = ('raw', 'format')
+
+
+class PromptGenerator:
+    """
+    Generates prompts for one codebase, keeping caches warm between calls.
+
+    Arguments mirror the CLI options of the same names. Prompts are always
+    produced by the built-in pipeline. A generator may be used from several
+    threads at once; call close() (or use it as a context manager) when done.
+
+    Args:
+        path: Path to the codebase directory
+        include: Patterns of files to include
+        exclude: Patterns of files to exclude
+        include_priority: Include files matching both include and exclude patterns
+        output_format: One of OUTPUT_FORMATS
+        template: Custom Handlebars or Jinja2 template (markdown output only)
+        full_directory_tree: List ignored files in the source tree
+        encoding: Tokenizer used for token counts
+        tokens: Count tokens ("raw" or "format", as for --tokens); see RunSummary
+        approx_tokens: Estimate token counts from byte lengths
+        line_numbers: Add line numbers to file contents
+        absolute_paths: Show absolute instead of relative paths
+        follow_symlinks: Follow symbolic links
+        hidden: Include hidden files and directories
+        no_codeblock: Do not wrap file contents in code fences
+        no_ignore: Do not apply .gitignore files
+        from_git: Read the files of this commit, branch, tag or tree (or "INDEX") from the git object database
+        diff: Add the uncommitted git diff
+        git_diff_branch: Add the git diff between two branches, as a (base, head) pair
+        git_log_branch: Add the git log between two branches, as a (base, head) pair
+        max_diff_size: Cut the git diff of each file after this many bytes (or a string such as "64K")
+        max_log_entries: Most commits listed by git_log_branch
+        sort: Order of the files in the prompt, one of SORT_ORDERS
+        jobs: Number of threads reading and rendering files
+        top_k: Keep only the K files most relevant to the prompt text
+        max_tokens: Token budget for the prompt
+        rank: How files are ranked for max_tokens, one of RANK_ORDERS
+        max_file_size: Skip larger files (bytes, or a string such as "512K")
+        max_total_bytes: Stop adding files after this many bytes (bytes, or a string such as "10M")
+        dedup: Replace files identical to an earlier one with a reference
+        near_dup: Replace files at least this similar to an earlier one with a diff (implies dedup)
+        cache_dir: Keep rendered blocks and indexes on disk here instead of in memory
+        cache_max_bytes: Size cap of the rendered-block cache
+        watch: Reuse walk results until a change is reported by filesystem notification
+
+    Raises:
+        ConfigurationError: If the path is not a directory or an option is invalid
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        *,
+        include: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        include_priority: bool = False,
+        output_format: str = 'markdown',
+        template: Optional[Union[str, Path]] = None,
+        full_directory_tree: bool = False,
+        encoding: Optional[str] = None,
+        tokens: Optional[str] = None,
+        approx_tokens: bool = False,
+        line_numbers: bool = False,
+        absolute_paths: bool = False,
+        follow_symlinks: bool = False,
+        hidden: bool = False,
+        no_codeblock: bool = False,
+        no_ignore: bool = False,
+        from_git: Optional[str] = None,
+        diff: bool = False,
+        git_diff_branch: Optional[Sequence[str]] = None,
+        git_log_branch: Optional[Sequence[str]] = None,
+        max_diff_size: Optional[Union[int, str]] = None,
+        max_log_entries: Optional[int] = None,
+        sort: Optional[str] = None,
+        jobs: Optional[int] = None,
+        top_k: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        rank: str = 'relevance',
+        max_file_size: Optional[Union[int, str]] = None,
+        max_total_bytes: Optional[Union[int, str]] = None,
+        dedup: bool = False,
+        near_dup: Optional[float] = None,
+        cache_dir: Optional[Union[str, Path]] = None,
+        cache_max_bytes: int = DEFAULT_MAX_BYTES,
+        watch: bool = True,
+    ):
+        self.codebase_path = Path(path).resolve()
+        if not self.codebase_path.is_dir():
+            raise ConfigurationError(f"path '{path}' is not a directory")
+        if output_format not in OUTPUT_FORMATS:
+            raise ConfigurationError(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}")
+        if template is not None and output_format != 'markdown':
+            raise ConfigurationError(f"template cannot be combined with output_format {output_format}")
+        if tokens is not None and tokens not in TOKEN_FORMATS:
+            raise ConfigurationError(f"tokens must be one of {', '.join(TOKEN_FORMATS)}")
+        if sort is not None and sort not in SORT_ORDERS:
+            raise ConfigurationError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+        if rank not in RANK_ORDERS:
+            raise ConfigurationError(f"rank must be one of {', '.join(RANK_ORDERS)}")
+        # jobs=0 means one worker per CPU; the others, like their CLI options, must be at least 1.
+        for name, value, minimum in (('jobs', jobs, 0), ('top_k', top_k, 1), ('max_tokens', max_tokens, 1),
+                                     ('max_log_entries', max_log_entries, 1)):
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < minimum):
+                raise ConfigurationError(f"{name} must be an integer of at least {minimum}")
+        if near_dup is not None and (
+            isinstance(near_dup, bool) or not isinstance(near_dup, (int, float)) or not 0 < near_dup <= 1
+        ):
+            raise ConfigurationError("near_dup must be a number in (0, 1]")
+
+        options = {
+            'include_patterns': list(include),
+            'exclude_patterns': list(exclude),
+            'include_priority': include_priority,
+            'output_format': output_format,
+            'full_directory_tree': full_directory_tree,
+            'line_numbers': line_numbers,
+            'absolute_paths': absolute_paths,
+            'follow_symlinks': follow_symlinks,
+            'hidden': hidden,
+            'no_codeblock': no_codeblock,
+            'no_ignore': no_ignore,
+            'approx_tokens': approx_tokens,
+        }
+        if template is not None:
+            options['template_path'] = str(Path(template).resolve())
+        if from_git:
+            options['from_git'] = from_git
+        if diff:
+            options['include_git_diff'] = True
+        for name, option, branches in (
+            ('git_diff_branch', 'git_diff_branches', git_diff_branch),
+            ('git_log_branch', 'git_log_branches', git_log_branch),
+        ):
+            if branches is not None:
+                if isinstance(branches, str) or len(branches) != 2:
+                    raise ConfigurationError(f"{name} must be a pair of branch names")
+                options[option] = list(branches)
+        if max_log_entries:
+            options['max_log_entries'] = max_log_entries
+        if sort:
+            options['sort_order'] = sort
+        if encoding:
+            options['encoding'] = encoding
+        if tokens:
+            options['token_count_format'] = tokens
+        if jobs is not None:
+            options['jobs'] = jobs or os.cpu_count() or 1
+        if top_k:
+            options['top_k'] = top_k
+        if max_tokens:
+            options['max_tokens'] = max_tokens
+            options['rank'] = rank
+        for name, option, value in (
+            ('max_file_size', 'max_file_size', max_file_size),
+            ('max_total_bytes', 'max_total_bytes', max_total_bytes),
+            ('max_diff_size', 'max_diff_bytes', max_diff_size),
+        ):
+            if value is not None:
+                try:
+                    options[option] = parse_size(value)
+                except ValueError as e:
+                    raise ConfigurationError(f"{name}: {e}") from e
+        if dedup or near_dup:
+            options['dedup'] = True
+            if near_dup:
+                options['near_dup'] = near_dup
+        if cache_dir is not None:
+            # The search and template caches live next to the block cache.
+            options['cache_dir'] = str(Path(cache_dir).resolve())
+            options['cache_max_bytes'] = cache_max_bytes
+        self.options = options
+
+        if cache_dir is not None:
+            cache = FileCache(Path(options['cache_dir']), cache_max_bytes)
+        else:
+            cache = MemoryCache(cache_max_bytes)
+        self.state = PipelineState(cache=cache, index=MemoryIndex())
+        self._watcher = start_watcher(str(self.codebase_path), self._changed) if watch else None
+        # Without change notification a cached walk could go stale unnoticed.
+        self.state.cache_walks = self._watcher is not None
+
+    def _changed(self, path: str) -> None:
+        self.state.invalidate()
+
+    def generate(
+        self,
+        prompt_text: Optional[str] = None,
+        summary: Optional[RunSummary] = None,
+        timings: Optional[Timings] = None,
+    ) -> str:
+        """
+        Generate a complete prompt.
+
+        Args:
+            prompt_text: Optional user prompt text
+            summary: Optional RunSummary filled in as the prompt is generated
+            timings: Optional recorder for per-phase timings
+
+        Returns:
+            Generated prompt string
+
+        Raises:
+            ConfigurationError: If the options need a prompt text and none is given, or the template is invalid
+            GenerationError: If the prompt cannot be generated
+        """
+        return "".join(self.iter_prompt(prompt_text, summary, timings))
+
+    def iter_prompt(
+        self,
+        prompt_text: Optional[str] = None,
+        summary: Optional[RunSummary] = None,
+        timings: Optional[Timings] = None,
+    ) -> Iterator[str]:
+        """
+        Generate a prompt one piece at a time (see pipeline.iter_prompt).
+
+        Files are read only as their section is requested, so memory use does
+        not grow with the codebase size. The summary is complete once the
+        iterator is exhausted.
+
+        Args:
+            prompt_text: Optional user prompt text
+            summary: Optional RunSummary filled in as the prompt is generated
+            timings: Optional recorder for per-phase timings
+
+        Yields:
+            Consecutive chunks of the prompt
+
+        Raises:
+            ConfigurationError: If the options need a prompt text and none is given, or the template is invalid
+            GenerationError: If the prompt cannot be generated
+        """
+        if self._closed:
+            raise GenerationError("the generator is closed")
+        if self.options.get('top_k') and not prompt_text:
+            raise ConfigurationError("top_k needs a prompt text to rank files against")
+        try:
+            yield from _iter_prompt(self.codebase_path, prompt_text, self.options, summary, self.state, timings)
+        except (ConfigurationError, GenerationError):
+            raise
+        except Exception as e:
+            # Filesystem, cache database, git and sink failures alike reach callers as GenerationError.
+            raise GenerationError(f"cannot generate prompt for {self.codebase_path}: {e}") from e
+
+    def invalidate(self) -> None:
+        """Forget cached walk results; only needed when the codebase cannot be watched and has changed."""
+        self.state.invalidate()
+
+    @property
+    def _closed(self) -> bool:
+        return self.state.cache is None
+
+    def close(self) -> None:
+        """Stop watching the codebase and release the caches."""
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        if self.state.cache is not None:
+            self.state.cache.close()
+            self.state.cache = None
+
+    def __enter__(self) -> 'PromptGenerator':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,354 @@
+"""
+Git diff and log context for ``--diff``, ``--git-diff-branch`` and ``--git-log-branch``.
+
+- ``--diff``: uncommitted changes, staged or not (``git diff HEAD``)
+- ``--git-diff-branch A B``: the changes on B since it diverged from A
+  (``git diff A...B``), as a pull request from B into A shows them
+- ``--git-log-branch A B``: the commits on B that are not on A (``git log A..B``)
+
+Diffs are read from a running ``git diff`` and split per file as they
+arrive, so a comparison touching thousands of files is never held in memory
+whole. Renames and copies are detected, so a moved file shows up as a
+rename plus its edits rather than as a deletion and an addition. Each
+file's diff is cut after ``max_diff_bytes``, and logs list at most
+``max_log_entries`` commits (newest first); the records say how much was
+left out. Only changes under the codebase directory are included.
+
+Branch comparisons depend only on the two commits, so their records are
+cached in the cache directory keyed by the resolved commit pair (and the
+limits); comparing the same branches again runs no git diff at all. The
+uncommitted changes of ``--diff`` are never cached.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .defaults import DEFAULT_MAX_DIFF_BYTES, DEFAULT_MAX_LOG_ENTRIES
+from .gitutils import GitError, head_commit, open_repo
+
+CACHE_VERSION = 1
+
+# Cached comparisons kept in the cache directory; the least recently used are removed.
+MAX_CACHED_COMPARISONS = 64
+
+# ID of the empty tree, to diff against in a repository without commits.
+_EMPTY_TREE = "4b825dc642cb6eb9a060e54bf8d69288fbee4904"
+
+_DIFF_HEADER = "diff --git "
+
+
+@dataclass(frozen=True)
+class GitRecord:
+    """
+    One part of the git context: the diff of one file, or a commit log.
+
+    Attributes:
+        kind: "diff" or "log"
+        source: What was compared, as given to git ("HEAD", "A...B" or "A..B")
+        text: Unified diff of the file, or one line per commit
+        path: Path of the file after the change, relative to the codebase (diffs only)
+        old_path: Path before a rename or copy (diffs only)
+        omitted: Lines of the diff, or commits of the log, left out by the limits
+    """
+
+    kind: str
+    source: str
+    text: str
+    path: Optional[str] = None
+    old_path: Optional[str] = None
+    omitted: int = 0
+
+    @property
+    def title(self) -> str:
+        """Heading of the records with this kind and source."""
+        return f"Git {'Diff' if self.kind == 'diff' else 'Log'} ({self.source})"
+
+    @property
+    def label(self) -> str:
+        """The file a diff record is about, with its former path for renames."""
+        if self.old_path is not None:
+            return f"{self.old_path} → {self.path}"
+        return self.path or ""
+
+    def full_text(self) -> str:
+        """The text followed by a note on what the limits left out."""
+        if not self.omitted:
+            return self.text
+        if self.kind == "diff":
+            return f"{self.text}\n[... {self.omitted} more lines of diff]"
+        return f"{self.text}\n[... {self.omitted} more commits]"
+
+
+def has_git_context(options: dict) -> bool:
+    """Whether the options ask for any git diff or log."""
+    return bool(
+        options.get('include_git_diff') or options.get('git_diff_branches') or options.get('git_log_branches')
+    )
+
+
+def iter_git_context(codebase_path: Path, options: dict, cache_dir: Path) -> Iterator[GitRecord]:
+    """
+    Produce the git records the options ask for, one file diff at a time.
+
+    The repository is opened and the branches are resolved when this is
+    called, so a bad branch name is reported before any part of the prompt
+    has been produced; the records themselves are read as they are consumed.
+
+    Args:
+        codebase_path: Codebase directory, anywhere inside a git working tree
+        options: Dictionary of options from CLI arguments
+        cache_dir: Cache directory holding the cached branch comparisons
+
+    Returns:
+        Iterator over the records of the uncommitted diff, then the branch diff, then the branch log
+
+    Raises:
+        GitError: If the codebase is not in a git repository or a branch does
+            not name a commit; iterating raises it if git fails
+    """
+    repo = open_repo(codebase_path)
+    try:
+        repo_root = Path(repo.working_tree_dir).resolve()
+        prefix = codebase_path.resolve().relative_to(repo_root).as_posix()
+        prefix = "" if prefix == "." else prefix + "/"
+        pairs = {
+            name: (_resolve_commit(repo, options[name][0]), _resolve_commit(repo, options[name][1]))
+            for name in ('git_diff_branches', 'git_log_branches')
+            if options.get(name)
+        }
+    except BaseException:
+        repo.close()
+        raise
+    return _iter_records(repo, options, Path(cache_dir), prefix, pairs)
+
+
+def _iter_records(
+    repo, options: dict, cache_dir: Path, prefix: str, pairs: Dict[str, Tuple[str, str]]
+) -> Iterator[GitRecord]:
+    """Yield the records for iter_git_context() from resolved branch commits, closing the repository."""
+    try:
+        max_bytes = options.get('max_diff_bytes') or DEFAULT_MAX_DIFF_BYTES
+        max_entries = options.get('max_log_entries') or DEFAULT_MAX_LOG_ENTRIES
+
+        if options.get('include_git_diff'):
+            base = "HEAD" if head_commit(repo) is not None else _EMPTY_TREE
+            yield from _stream_diff(repo, "HEAD", [base], prefix, max_bytes)
+
+        if 'git_diff_branches' in pairs:
+            base, head = options['git_diff_branches']
+            source = f"{base}...{head}"
+            pair = pairs['git_diff_branches']
+            key = _cache_key("diff", pair, prefix, max_bytes)
+            revisions = ["{}...{}".format(*pair)]
+            yield from _cached(cache_dir, key, lambda: _stream_diff(repo, source, revisions, prefix, max_bytes))
+
+        if 'git_log_branches' in pairs:
+            base, head = options['git_log_branches']
+            source = f"{base}..{head}"
+            pair = pairs['git_log_branches']
+            key = _cache_key("log", pair, prefix, max_entries)
+            yield from _cached(cache_dir, key, lambda: _read_log(repo, source, pair, prefix, max_entries))
+    finally:
+        repo.close()
+
+
+def template_variables(records: Iterable[GitRecord]) -> Dict[str, str]:
+    """
+    Join git records into the ``git_diff``, ``git_diff_branch`` and ``git_log_branch`` template variables.
+
+    Args:
+        records: Records produced by iter_git_context()
+
+    Returns:
+        The text of each variable; empty when its option is not set
+    """
+    parts: Dict[str, List[str]] = {"git_diff": [], "git_diff_branch": [], "git_log_branch": []}
+    for record in records:
+        if record.kind == "log":
+            name = "git_log_branch"
+        else:
+            name = "git_diff" if record.source == "HEAD" else "git_diff_branch"
+        parts[name].append(record.full_text())
+    return {name: "\n".join(texts) for name, texts in parts.items()}
+
+
+def _resolve_commit(repo, rev: str) -> str:
+    import git
+
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", rev + "^{commit}")
+    except git.GitCommandError:
+        raise GitError(f"'{rev}' does not name a commit.")
+
+
+def _stream_diff(repo, source: str, revisions: List[str], prefix: str, max_bytes: int) -> Iterator[GitRecord]:
+    """Run git diff and yield a record per file as soon as its diff has been read."""
+    import git
+
+    args = ["--no-color", "--no-ext-diff", "--find-renames", "--find-copies"]
+    if prefix:
+        args.append(f"--relative={prefix}")
+    # Unquoted paths, so names with non-ASCII characters are shown as they are.
+    process = repo.git(c="core.quotepath=off").diff(*args, *revisions, as_process=True)
+    finished = False
+    try:
+        lines: List[str] = []
+        size = omitted = 0
+        in_hunks = False
+        for raw_line in process.stdout:
+            line = raw_line.decode("utf-8", errors="replace")
+            if line.startswith(_DIFF_HEADER):
+                if lines:
+                    yield _diff_record(source, lines, omitted)
+                lines, size, omitted, in_hunks = [], 0, 0, False
+            in_hunks = in_hunks or line.startswith("@@")
+            size += len(raw_line)
+            # The header lines naming the file are always kept.
+            if in_hunks and size > max_bytes:
+                omitted += 1
+                continue
+            lines.append(line)
+        if lines:
+            yield _diff_record(source, lines, omitted)
+        try:
+            process.wait()
+        except git.GitCommandError as e:
+            raise GitError(f"Could not diff {source}: {e}")
+        finished = True
+    finally:
+        if not finished:
+            # The consumer stopped early or git failed; do not leave git running.
+            process.proc.kill()
+            process.proc.wait()
+
+
+def _diff_record(source: str, lines: List[str], omitted: int) -> GitRecord:
+    """Build the record of one file's diff from its kept lines."""
+    old_path, path = _diff_paths(lines)
+    return GitRecord(
+        "diff", source, "".join(lines).rstrip("\n"), path, old_path if old_path != path else None, omitted
+    )
+
+
+def _diff_paths(lines: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Read the old and new path of a file diff from its header lines."""
+    old_path = path = None
+    for line in lines[1:]:
+        line = line.rstrip("\n")
+        if line.startswith(("rename from ", "copy from ")):
+            old_path = line.split(" ", 2)[2]
+        elif line.startswith(("rename to ", "copy to ")):
+            path = line.split(" ", 2)[2]
+        elif line.startswith("--- "):
+            # Git ends the names it writes with a tab when they contain spaces.
+            old_path = old_path or _strip_side(line[4:].rstrip("\t"), "a/")
+        elif line.startswith("+++ "):
+            path = path or _strip_side(line[4:].rstrip("\t"), "b/")
+        elif line.startswith("@@"):
+            break
+    if old_path is None and path is None:
+        # No content lines (binary files, mode changes): "a/NAME b/NAME".
+        names = lines[0].rstrip("\n")[len(_DIFF_HEADER):]
+        old_path = path = names[2:(len(names) - 1) // 2]
+    return old_path, path or old_path
+
+
+def _strip_side(name: str, side: str) -> Optional[str]:
+    if name == "/dev/null":
+        return None
+    return name[len(side):] if name.startswith(side) else name
+
+
+def _read_log(
+    repo,
+    source: str,
+    pair: Tuple[str, str],
+    prefix: str,
+    max_entries: int,
+) -> Iterator[GitRecord]:
+    """Yield the log record of the commits between a pair, newest first."""
+    import git
+
+    revisions = "{}..{}".format(*pair)
+    paths = ["--", prefix] if prefix else []
+    try:
+        total = int(repo.git.rev_list("--count", revisions, *paths))
+        text = repo.git.log(
+            f"--max-count={max_entries}", "--date=short", "--format=%h %ad %an: %s", revisions, *paths
+        )
+    except git.GitCommandError as e:
+        raise GitError(f"Could not read the git log {source}: {e}")
+    shown = len(text.splitlines())
+    yield GitRecord("log", source, text, omitted=total - shown)
+
+
+def _cache_key(kind: str, pair: Tuple[str, str], prefix: str, limit: int) -> str:
+    text = f"{CACHE_VERSION}|{kind}|{pair[0]}|{pair[1]}|{prefix}|{limit}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _cached(cache_dir: Path, key: str, produce) -> Iterator[GitRecord]:
+    """
+    Replay cached records, or produce them while writing them to the cache.
+
+    Records are stored one JSON line each as they are produced, so the cache
+    is filled without holding the records in memory; a run that stops early
+    leaves no cache entry behind.
+    """
+    directory = cache_dir / "git_context"
+    path = directory / (key + ".jsonl")
+    try:
+        f = open(path, encoding="utf-8")
+    except OSError:
+        f = None
+    if f is not None:
+        with f:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            for line in f:
+                yield GitRecord(**json.loads(line))
+        return
+
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        # A unique name, so that concurrent runs (processes or threads) never share a temporary file.
+        out = tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=directory, prefix=path.name + ".", suffix=".tmp", delete=False
+        )
+        temp_path = Path(out.name)
+    except OSError:
+        # The cache only saves time; an unwritable cache must not fail the run.
+        yield from produce()
+        return
+    completed = False
+    try:
+        with out:
+            for record in produce():
+                out.write(json.dumps(asdict(record), ensure_ascii=False) + "\n")
+                yield record
+        temp_path.replace(path)
+        completed = True
+        _prune(directory)
+    finally:
+        if not completed:
+            try:
+                temp_path.unlink()
+            except OSError:
+                pass
+
+
+def _prune(directory: Path) -> None:
+    """Remove the least recently used comparisons over MAX_CACHED_COMPARISONS."""
+    try:
+        entries = sorted(directory.glob("*.jsonl"), key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in entries[MAX_CACHED_COMPARISONS:]:
+            path.unlink()
+    except OSError:
+        pass
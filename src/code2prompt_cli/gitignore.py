@@ -0,0 +1,185 @@
+"""
+Compiled gitignore rules.
+
+Each ignore file is translated once into regular expressions following
+git's wildmatch rules: ``*`` and ``?`` stop at ``/``, ``**`` spans
+directories, patterns without a slash match at any depth, a trailing slash
+restricts a pattern to directories and ``!`` re-includes. Files without
+negations compile into a single merged regex per kind.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+
+def translate(pattern: str) -> str:
+    """
+    Translate the body of a gitignore pattern into a regular expression.
+
+    Args:
+        pattern: Pattern without the leading ``!`` or trailing ``/``
+
+    Returns:
+        Regex source matching paths relative to the ignore file's directory
+    """
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out = [] if anchored else ["(?:.*/)?"]
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern.startswith("**", i):
+                at_start = i == 0 or pattern[i - 1] == "/"
+                if at_start and pattern.startswith("**/", i):
+                    out.append("(?:.*/)?")
+                    i += 3
+                    continue
+                if at_start and i + 2 == n:
+                    out.append(".*")
+                    i += 2
+                    continue
+            out.append("[^/]*")
+            while i < n and pattern[i] == "*":
+                i += 1
+            continue
+        if c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[^", i) else i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body[:1] in ("!", "^"):
+                    body = "^" + body[1:]
+                out.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        elif c == "\\" and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def _parse_line(line: str) -> Optional[Tuple[str, bool, bool]]:
+    """Parse one ignore file line into (regex, negated, dir_only), or None for blanks and comments."""
+    line = line.rstrip("\n")
+    if not line.endswith("\\ "):
+        line = line.rstrip(" ")
+    if not line or line.startswith("#"):
+        return None
+    negated = line.startswith("!")
+    if negated:
+        line = line[1:]
+    elif line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    return translate(line), negated, dir_only
+
+
+class GitIgnore:
+    """
+    The compiled rules of one ignore file.
+
+    Args:
+        lines: Lines of the ignore file
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self.rules: List[Tuple["re.Pattern[str]", bool, bool]] = []
+        parsed = [rule for rule in map(_parse_line, lines) if rule is not None]
+        self.has_negations = any(negated for _, negated, _ in parsed)
+        if self.has_negations:
+            self.rules = [(re.compile(f"^(?:{regex})$"), negated, dir_only) for regex, negated, dir_only in parsed]
+            self._any = self._dirs = None
+        else:
+            self._any = self._merge([regex for regex, _, dir_only in parsed if not dir_only])
+            self._dirs = self._merge([regex for regex, _, dir_only in parsed if dir_only])
+
+    @staticmethod
+    def _merge(regexes: List[str]) -> Optional["re.Pattern[str]"]:
+        if not regexes:
+            return None
+        return re.compile("^(?:" + "|".join(f"(?:{regex})" for regex in regexes) + ")$")
+
+    @classmethod
+    def from_file(cls, path: Path) -> Optional["GitIgnore"]:
+        """Compile an ignore file, returning None if it cannot be read."""
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """
+        Decide a path against these rules.
+
+        Args:
+            rel_path: POSIX-style path relative to the ignore file's directory
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if ignored, False if explicitly re-included, None if no rule matches
+        """
+        if not self.has_negations:
+            if self._any is not None and self._any.match(rel_path):
+                return True
+            if is_dir and self._dirs is not None and self._dirs.match(rel_path):
+                return True
+            return None
+        for regex, negated, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negated
+        return None
+
+
+class IgnoreStack:
+    """
+    The ignore files in effect for a directory, innermost first.
+
+    Args:
+        rules: Compiled rules of the innermost ignore file
+        base: Directory of that ignore file, relative to the walk root ("" for the root)
+        parent: Rules of the enclosing directories
+        prefix: For an ignore file above the walk root, the walk root's path relative
+            to the ignore file's directory, with a trailing slash
+    """
+
+    def __init__(
+        self,
+        rules: GitIgnore,
+        base: str = "",
+        parent: Optional["IgnoreStack"] = None,
+        prefix: str = "",
+    ):
+        self.rules = rules
+        self.base = base
+        self.parent = parent
+        self.prefix = prefix
+
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """
+        Check a path against every ignore file in effect; deeper files take precedence.
+
+        Args:
+            rel_path: POSIX-style path relative to the walk root
+            is_dir: Whether the path is a directory
+        """
+        node = self
+        while node is not None:
+            sub_path = node.prefix + (rel_path[len(node.base) + 1:] if node.base else rel_path)
+            decision = node.rules.match(sub_path, is_dir)
+            if decision is not None:
+                return decision
+            node = node.parent
+        return False
@@ -0,0 +1,128 @@
+"""
+Cached index of when each file was last committed, for ``--sort git_recent``.
+
+Walking the whole history with ``git log --name-only`` is the expensive
+part, so the result is kept in the cache directory, one JSON file per
+repository, together with the commit it was built from. When HEAD has
+moved forward since, only the new commits are read and merged in; when it
+is unchanged, git is not run at all beyond resolving HEAD.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Optional
+
+from .gitutils import GitError, head_commit, open_repo
+
+INDEX_VERSION = 1
+
+# Precedes the commit timestamp in the log output; paths follow it.
+_COMMIT_MARK = "\x01"
+
+
+def _read_log(repo, revisions: str) -> Dict[str, int]:
+    """Return the newest commit time of every path touched by the given revisions."""
+    import git
+
+    try:
+        output = repo.git.log("--format=%x01%ct", "--name-only", "--no-renames", "-z", revisions)
+    except git.GitCommandError as e:
+        raise GitError(f"Could not read the git log: {e}")
+    times: Dict[str, int] = {}
+    commit_time = 0
+    for field in output.split("\0"):
+        field = field.lstrip("\n")
+        if field.startswith(_COMMIT_MARK):
+            commit_time = int(field[1:])
+        elif field:
+            # The log lists newest commits first.
+            times.setdefault(field, commit_time)
+    return times
+
+
+def _is_ancestor(repo, base: str, head: str) -> bool:
+    import git
+
+    try:
+        return repo.is_ancestor(base, head)
+    except git.GitCommandError:
+        # The indexed commit is gone, e.g. after a history rewrite and gc.
+        return False
+
+
+def _resolve_commit(repo, rev: str) -> str:
+    import git
+
+    try:
+        return repo.git.rev_parse("--verify", "--quiet", rev + "^{commit}")
+    except git.GitCommandError:
+        raise GitError(f"'{rev}' does not name a commit.")
+
+
+def _load_index(path: Path) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+        return None
+    return data
+
+
+def _save_index(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    temp_path.replace(path)
+
+
+def commit_times(codebase_path: Path, cache_dir: Path, rev: Optional[str] = None) -> Dict[str, int]:
+    """
+    Return when each file under a codebase was last committed.
+
+    Args:
+        codebase_path: Codebase directory, anywhere inside a git working tree
+        cache_dir: Cache directory holding the per-repository indexes
+        rev: Commit whose history is read; HEAD by default
+
+    Returns:
+        Unix commit time keyed by path relative to the codebase; files never committed are absent
+
+    Raises:
+        GitError: If the codebase is not in a git repository or the log cannot be read
+    """
+    repo = open_repo(codebase_path)
+    repo_root = Path(repo.working_tree_dir).resolve()
+    head = head_commit(repo) if rev is None else _resolve_commit(repo, rev)
+    if head is None:
+        return {}
+
+    path = Path(cache_dir) / "git_log" / (hashlib.sha1(str(repo_root).encode("utf-8")).hexdigest() + ".json")
+    data = _load_index(path)
+    if data is None or data.get("head") != head:
+        base = data.get("head") if data is not None else None
+        if base is not None and _is_ancestor(repo, base, head):
+            times = data["times"]
+            # Paths touched again since the indexed commit get their newer time.
+            times.update(_read_log(repo, f"{base}..{head}"))
+        else:
+            times = _read_log(repo, head)
+        data = {"version": INDEX_VERSION, "head": head, "times": times}
+        try:
+            _save_index(path, data)
+        except OSError:
+            # The index only saves time; an unwritable cache must not fail the run.
+            pass
+
+    prefix = codebase_path.resolve().relative_to(repo_root).as_posix()
+    if prefix == ".":
+        return data["times"]
+    prefix += "/"
+    return {
+        repo_path[len(prefix):]: commit_time
+        for repo_path, commit_time in data["times"].items()
+        if repo_path.startswith(prefix)
+    }
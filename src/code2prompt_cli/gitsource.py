@@ -0,0 +1,148 @@
+"""
+Files listed and read from git objects, for ``--from-git``.
+
+With ``--from-git REF`` the prompt is built from a commit, branch, tag or
+tree, or with the special ref ``INDEX`` from the staging area, without
+touching the working tree: files are listed from the tree object (or the
+index) and their contents are read as blobs straight from the object
+database, loose or packed, through one long-running ``git cat-file``
+process. Only tracked files are listed, so ignore rules are never
+evaluated and untracked clutter never shows up. Symbolic links and
+submodules are skipped, since what they point to is not in the tree.
+
+A blob ID names the file contents, so rendered blocks are cached under the
+blob ID (see cache.py) and a file whose block is cached is not read at all.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+from .gitutils import GitError, open_repo
+from .walker import FileEntry, walk_order_key
+
+# --from-git value selecting the staging area instead of a tree object.
+INDEX_REF = "INDEX"
+
+_SYMLINK_MODE = 0o120000
+_SUBMODULE_MODE = 0o160000
+
+
+class GitTree:
+    """
+    A tree-ish (or the index) of the repository holding a codebase.
+
+    Blobs may be read from several threads; reads are serialized over the
+    repository's ``git cat-file`` process.
+
+    Args:
+        codebase_path: Codebase directory, anywhere inside a git working tree
+        ref: Anything git resolves to a tree (commit, branch, tag, tree ID), or INDEX_REF
+
+    Raises:
+        GitError: If the codebase is not in a git repository or the ref does not name a tree
+    """
+
+    def __init__(self, codebase_path: Path, ref: str):
+        import git
+
+        self.codebase_path = codebase_path
+        self.ref = ref
+        self.repo = open_repo(codebase_path)
+        self._lock = threading.Lock()
+        repo_root = Path(self.repo.working_tree_dir).resolve()
+        prefix = codebase_path.resolve().relative_to(repo_root).as_posix()
+        self._prefix = "" if prefix == "." else prefix + "/"
+        if ref == INDEX_REF:
+            self.tree = None
+            self.commit_time = None
+            return
+        try:
+            self.tree = self.repo.git.rev_parse("--verify", "--quiet", ref + "^{tree}")
+        except git.GitCommandError:
+            self.repo.close()
+            raise GitError(f"'{ref}' does not name a commit or tree in {repo_root}.")
+        try:
+            self.commit_time = int(self.repo.git.show("-s", "--format=%ct", ref + "^{commit}"))
+        except git.GitCommandError:
+            # A bare tree has no date.
+            self.commit_time = 0
+
+    def list_files(self, hidden: bool = False, reverse: bool = False) -> List[FileEntry]:
+        """
+        List the files under the codebase, in walk order.
+
+        Entries carry the blob to read instead of a working tree file. Their
+        mtime is the commit time of the ref (the same for every file), or for
+        the index the modification time recorded when the file was staged.
+
+        Args:
+            hidden: Include hidden files and directories
+            reverse: List each directory in descending name order, as the reversed walk does
+
+        Returns:
+            FileEntry for every regular file, with the path it would have in a checkout
+
+        Raises:
+            GitError: If the tree cannot be listed
+        """
+        import git
+
+        try:
+            records = self._list_index() if self.tree is None else self._list_tree()
+        except git.GitCommandError as e:
+            raise GitError(f"Could not list the files of '{self.ref}': {e}")
+        entries = [
+            FileEntry(os.path.join(str(self.codebase_path), rel_path), rel_path, size, mtime_ns, blob, self)
+            for rel_path, blob, size, mtime_ns in records
+            if hidden or not any(part.startswith(".") for part in rel_path.split("/"))
+        ]
+        if not reverse:
+            return sorted(entries, key=lambda entry: walk_order_key(entry.rel_path))
+
+        def descending_key(entry: FileEntry) -> tuple:
+            # Sorted in reverse, this still puts the files of a directory before its subdirectories.
+            parts = entry.rel_path.split("/")
+            return tuple((0, part) for part in parts[:-1]) + ((1, parts[-1]),)
+
+        return sorted(entries, key=descending_key, reverse=True)
+
+    def read(self, blob: str) -> bytes:
+        """Return the contents of a blob."""
+        with self._lock:
+            return self.repo.git.get_object_data(blob)[3]
+
+    def close(self) -> None:
+        """Stop the repository's git processes."""
+        self.repo.close()
+
+    def _list_tree(self) -> List[tuple]:
+        args = ["-r", "-l", "-z", "--full-tree", self.tree]
+        if self._prefix:
+            args += ["--", self._prefix]
+        mtime_ns = self.commit_time * 1_000_000_000
+        records = []
+        for record in self.repo.git.ls_tree(*args).split("\0"):
+            if not record:
+                continue
+            info, repo_path = record.split("\t", 1)
+            mode, kind, blob, size = info.split()
+            if kind != "blob" or int(mode, 8) == _SYMLINK_MODE:
+                continue
+            records.append((repo_path[len(self._prefix):], blob, int(size), mtime_ns))
+        return records
+
+    def _list_index(self) -> List[tuple]:
+        records = []
+        for (repo_path, stage), entry in self.repo.index.entries.items():
+            # Conflicted files have no single staged version.
+            if stage != 0 or entry.mode in (_SYMLINK_MODE, _SUBMODULE_MODE):
+                continue
+            if not repo_path.startswith(self._prefix):
+                continue
+            seconds, nanoseconds = entry.mtime
+            records.append((
+                repo_path[len(self._prefix):], entry.hexsha, entry.size, seconds * 1_000_000_000 + nanoseconds
+            ))
+        return records
@@ -0,0 +1,83 @@
+"""
+Git helpers built on GitPython.
+
+GitPython is imported lazily so that runs which never touch git do not pay
+for it.
+"""
+
+from pathlib import Path
+from typing import Optional, Set
+
+from .errors import Code2PromptError
+
+
+class GitError(Code2PromptError):
+    """Raised when a git operation needed by the CLI cannot be performed."""
+
+
+def open_repo(path: Path):
+    """
+    Open the git repository containing a path.
+
+    Args:
+        path: Any path inside the working tree
+
+    Returns:
+        git.Repo instance
+
+    Raises:
+        GitError: If GitPython is missing or the path is not inside a git working tree
+    """
+    try:
+        import git
+    except ImportError:
+        raise GitError("GitPython is not available. Install it to use git features.")
+    try:
+        return git.Repo(path, search_parent_directories=True)
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError):
+        raise GitError(f"'{path}' is not inside a git repository.")
+
+
+def head_commit(repo) -> Optional[str]:
+    """Return the hex SHA of HEAD, or None in a repository without commits."""
+    try:
+        return repo.head.commit.hexsha
+    except ValueError:
+        return None
+
+
+def _split_z(output: str) -> Set[str]:
+    return {path for path in output.split("\0") if path}
+
+
+def untracked_paths(repo) -> Set[str]:
+    """Return untracked, non-ignored files, relative to the repository root."""
+    return _split_z(repo.git.ls_files("--others", "--exclude-standard", "-z"))
+
+
+def changed_paths(repo, base: Optional[str]) -> Set[str]:
+    """
+    List files whose working tree contents may differ from a commit.
+
+    Renames are reported as a deletion plus an addition so that both paths
+    are refreshed. Untracked files are always included.
+
+    Args:
+        repo: git.Repo instance
+        base: Commit to compare the working tree against; None for "no commits yet"
+
+    Returns:
+        Paths relative to the repository root
+
+    Raises:
+        GitError: If git cannot compare against the base commit (e.g. it no longer exists)
+    """
+    import git
+
+    try:
+        paths = untracked_paths(repo)
+        if base is None:
+            return paths | _split_z(repo.git.ls_files("-z"))
+        return paths | _split_z(repo.git.diff("--name-only", "--no-renames", "-z", base))
+    except git.GitCommandError as e:
+        raise GitError(f"Could not list changed files: {e}")
@@ -0,0 +1,87 @@
+"""
+Saved prompt state for incremental regeneration.
+
+An incremental run stores the rendered block of every selected file next to
+the git commit it was generated from. The next run asks git which files
+changed since that commit, re-renders only those and splices them into the
+saved blocks.
+"""
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+STATE_VERSION = 1
+
+# Options that change which files are selected or how they are rendered;
+# state saved with different values cannot be reused.
+_STATE_OPTION_KEYS = (
+    'include_patterns',
+    'exclude_patterns',
+    'include_priority',
+    'line_numbers',
+    'absolute_paths',
+    'no_codeblock',
+    'output_format',
+    'follow_symlinks',
+    'hidden',
+    'max_file_size',
+    'no_ignore',
+    'full_directory_tree',
+)
+
+
+@dataclass
+class PromptState:
+    """Everything needed to splice changed files into a previously generated prompt."""
+
+    root: str
+    options_key: str
+    commit: Optional[str] = None
+    dirty: List[str] = field(default_factory=list)
+    tree_paths: List[str] = field(default_factory=list)
+    blocks: Dict[str, Optional[str]] = field(default_factory=dict)
+    # walker.ignore_rules_stamp() of the root when the state was saved.
+    ignore_stamp: str = ''
+    version: int = STATE_VERSION
+
+
+def options_key(options: dict) -> str:
+    """Serialize the options that affect saved blocks into a comparable string."""
+    return json.dumps({key: options.get(key) for key in _STATE_OPTION_KEYS}, sort_keys=True)
+
+
+def load_state(path: Path) -> Optional[PromptState]:
+    """
+    Load saved prompt state.
+
+    Args:
+        path: State file path
+
+    Returns:
+        The saved state, or None if the file is missing, unreadable or from another version
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != STATE_VERSION:
+            return None
+        return PromptState(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def save_state(path: Path, state: PromptState) -> None:
+    """
+    Save prompt state, replacing the previous file atomically.
+
+    Args:
+        path: State file path
+        state: State to save
+    """
+    path = Path(path)
+    temp_path = path.with_name(path.name + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(asdict(state), f)
+    temp_path.replace(path)
@@ -0,0 +1,161 @@
+"""
+File ingestion for the built-in prompt pipeline.
+
+Every file is first sniffed for binary content (known signatures, NUL
+bytes, invalid UTF-8) from its first block, and binary files are not read
+any further. Small text files are then read in one call. Large files are
+memory-mapped, and text is decoded straight from the mapping instead of from
+an intermediate bytes copy.
+
+When a file body needs no transformation (no line numbers, plain UTF-8),
+a streamed prompt can carry a FileBody placeholder instead of the text; the
+writer then copies the bytes from the file to the output descriptor with
+os.sendfile(), so the body never becomes a Python string at all.
+
+Files listed from git objects (``--from-git``) have no file to map or copy;
+their blob is read whole from the object database.
+"""
+
+import codecs
+import mmap
+import os
+from dataclasses import dataclass
+from typing import Optional, TextIO
+
+from .render import SNIFF_BYTES, decode_text, looks_binary
+from .walker import FileEntry
+
+# Files at least this large are memory-mapped and may be passed through.
+LARGE_FILE_BYTES = 1024 * 1024
+
+# Unit of work for validating and copying large files.
+_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileBody:
+    """A file whose bytes go to the output unchanged; yielded by streamed prompts."""
+
+    path: str
+    size: int
+
+
+def read_text(path: str, size: int) -> Optional[str]:
+    """
+    Read and decode a file, rejecting binary data.
+
+    Args:
+        path: File path
+        size: File size from the walk, used to pick the reading strategy
+
+    Returns:
+        Decoded text, or None if the file looks binary or is not valid UTF-8
+    """
+    if size >= LARGE_FILE_BYTES:
+        with open(path, 'rb') as f:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if looks_binary(mapped[:SNIFF_BYTES]):
+                        return None
+                    with memoryview(mapped) as view:
+                        try:
+                            return str(view, 'utf-8')
+                        except UnicodeDecodeError:
+                            return None
+            except ValueError:
+                # Emptied since it was walked; mmap cannot map zero bytes.
+                pass
+    with open(path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        if looks_binary(head):
+            return None
+        return decode_text(head + f.read())
+
+
+def read_entry(entry: FileEntry) -> Optional[str]:
+    """
+    Read and decode a walked file, or the blob of a file listed from git objects.
+
+    Args:
+        entry: The file
+
+    Returns:
+        Decoded text, or None if the file looks binary or is not valid UTF-8
+    """
+    if entry.blob is not None:
+        return decode_text(entry.tree.read(entry.blob))
+    return read_text(entry.path, entry.size)
+
+
+def is_text_file(path: str) -> bool:
+    """
+    Check that a file is valid UTF-8 text without holding its contents in memory.
+
+    The file is streamed through one reusable buffer, so neither a copy nor
+    a mapping of the whole file stays resident.
+
+    Args:
+        path: File path
+
+    Returns:
+        True if the first block does not look binary and the file decodes as UTF-8
+    """
+    buffer = bytearray(_CHUNK_BYTES)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f, memoryview(buffer) as view:
+        read = f.readinto(buffer)
+        if looks_binary(bytes(view[:min(read, SNIFF_BYTES)])):
+            return False
+        try:
+            while read:
+                decoder.decode(view[:read])
+                read = f.readinto(buffer)
+            decoder.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+
+def copy_body(body: FileBody, out: TextIO, sendfile: bool = True) -> None:
+    """
+    Write a file body to a text stream.
+
+    Uses os.sendfile() when the stream has a real file descriptor, and falls
+    back to chunked reads otherwise (or when the descriptor does not support
+    it, e.g. a terminal).
+
+    Args:
+        body: File to copy
+        out: Destination text stream; flushed before bytes are written behind its back
+        sendfile: Allow os.sendfile(); must be False when the stream's descriptor is not
+            where its text ends up (e.g. a compressing stream)
+    """
+    out.flush()
+    with open(body.path, 'rb') as f:
+        if sendfile and hasattr(os, 'sendfile'):
+            try:
+                out_fd = out.fileno()
+            except (AttributeError, OSError, ValueError):
+                out_fd = None
+            if out_fd is not None and _sendfile(out_fd, f.fileno(), body.size):
+                return
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        for chunk in iter(lambda: f.read(_CHUNK_BYTES), b''):
+            out.write(decoder.decode(chunk))
+        out.write(decoder.decode(b'', final=True))
+
+
+def _sendfile(out_fd: int, in_fd: int, size: int) -> bool:
+    """Copy ``size`` bytes with os.sendfile(); False if nothing could be sent this way."""
+    offset = 0
+    while offset < size:
+        try:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+        except OSError:
+            if offset == 0:
+                return False
+            raise
+        if sent == 0:
+            break
+        offset += sent
+    return True
@@ -10,38 +10,105 @@ import click
 import sys
 import os
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
-try:
-    from code2prompt_rs import Code2Prompt
-    CODE2PROMPT_AVAILABLE = True
-except ImportError:
-    CODE2PROMPT_AVAILABLE = False
-    print("Warning: code2prompt-rs not available. Install it to use core functionality.")
+from .defaults import (
+    DEFAULT_CLIPBOARD_TIMEOUT,
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_LOG_ENTRIES,
+    OUTPUT_FORMATS,
+    RANK_ORDERS,
+    SORT_ORDERS,
+    default_cache_dir,
+    parse_size,
+)
+
+if TYPE_CHECKING:
+    from .pipeline import RunSummary
+    from .sinks import Sink
+
+# Only the lightweight modules above are imported at startup, so --help,
+# --version and argument errors stay fast. The prompt pipeline,
+# code2prompt-rs, pyperclip and GitPython are imported by the code paths
+# that use them.
+
+# Options implemented only by the built-in pipeline; setting any of them routes
+# generation through code2prompt_cli.pipeline instead of code2prompt-rs.
+# (code2prompt-rs has no way to disable .gitignore handling, hence no_ignore,
+# reports no per-file token counts, hence token_count_format, and re-parses
+# custom templates on every call, hence template_path, and ignores the sort
+# order, hence sort_order, reads the working tree only, hence from_git, and
+# takes no git diff or log, hence include_git_diff, git_diff_branches and
+# git_log_branches.) Structured output formats are also produced by the
+# pipeline only.
+PIPELINE_OPTIONS = (
+    'cache_dir', 'stream', 'jobs', 'max_tokens', 'state_file', 'no_ignore', 'max_file_size', 'max_total_bytes',
+    'token_count_format', 'template_path', 'dedup', 'top_k', 'sort_order', 'roots', 'from_git',
+    'include_git_diff', 'git_diff_branches', 'git_log_branches',
+)
+
+# Longest list of individual files printed in the run summary.
+MAX_LISTED_FILES = 20
+
+class ByteSize(click.ParamType):
+    """Click parameter type for byte counts with an optional K/M/G suffix."""
+    
+    name = 'size'
+    
+    def convert(self, value, param, ctx):
+        try:
+            return parse_size(value)
+        except ValueError as e:
+            self.fail(str(e), param, ctx)
 
 @click.command()
 @click.argument('prompt_text', type=str, required=False)
 @click.option('-i', '--include', multiple=True, help='Patterns to include')
 @click.option('-e', '--exclude', multiple=True, help='Patterns to exclude')
 @click.option('--include-priority', is_flag=True, help='Include files in case of conflict between include and exclude patterns')
-@click.option('-O', '--output-file', type=click.Path(), help='Optional output file path')
-@click.option('-F', '--output-format', type=click.Choice(['markdown', 'json', 'xml']), default='markdown', help='Output format')
-@click.option('-t', '--template', type=click.Path(exists=True), help='Optional Path to a custom template')
+@click.option('-O', '--output-file', type=click.Path(), help='Optional output file path; .gz, .bz2, .xz and .zst files are compressed')
+@click.option('-F', '--output-format', type=click.Choice(OUTPUT_FORMATS), default='markdown', show_default=True, help='Output format; json, ndjson and xml have one record per file')
+@click.option('-t', '--template', type=click.Path(exists=True), help='Optional Path to a custom Handlebars template (Jinja2 for .j2/.jinja files)')
 @click.option('--full-directory-tree', is_flag=True, help='List the full directory tree')
 @click.option('-c', '--encoding', type=str, help='Optional tokenizer to use for token count')
-@click.option('--tokens', type=click.Choice(['raw', 'format']), help='Display the token count of the generated prompt')
+@click.option('--tokens', type=click.Choice(['raw', 'format']), help='Display the token count of the generated prompt (exact counts need the tokens extra)')
+@click.option('--approx-tokens', is_flag=True, help='Estimate token counts from the byte length instead of running the tokenizer (much faster)')
 @click.option('-d', '--diff', is_flag=True, help='Include git diff')
 @click.option('--git-diff-branch', nargs=2, type=str, help='Generate git diff between two branches')
 @click.option('--git-log-branch', nargs=2, type=str, help='Retrieve git log between two branches')
+@click.option('--max-diff-size', type=ByteSize(), help='Cut the git diff of each file after SIZE  [default: 64K]')
+@click.option('--max-log-entries', type=click.IntRange(min=1), default=DEFAULT_MAX_LOG_ENTRIES, show_default=True, help='Most commits listed by --git-log-branch')
+@click.option('--from-git', metavar='REF', help='Read the files of a commit, branch, tag or tree (INDEX: the staging area) from the git object database instead of the working tree')
 @click.option('-l', '--line-numbers', is_flag=True, help='Add line numbers to the source code')
 @click.option('--absolute-paths', is_flag=True, help='If true, paths in the output will be absolute instead of relative')
 @click.option('-L', '--follow-symlinks', is_flag=True, help='Follow symlinks')
 @click.option('--hidden', is_flag=True, help='Include hidden directories and files')
 @click.option('--no-codeblock', is_flag=True, help='Disable wrapping code inside markdown code blocks')
 @click.option('--no-clipboard', is_flag=True, help='Disable copying to clipboard')
+@click.option('--clipboard-timeout', type=click.FloatRange(min=0, min_open=True), default=DEFAULT_CLIPBOARD_TIMEOUT, show_default=True, help='Seconds to wait for the clipboard copy before giving up')
 @click.option('--no-ignore', is_flag=True, help='Skip .gitignore rules')
-@click.option('--sort', type=click.Choice(['name_asc', 'name_desc', 'date_asc', 'date_desc']), help='Sort order for files')
-@click.option('--path', type=click.Path(exists=True), default='.', help='Path to the codebase directory (default: current directory)')
+@click.option('--sort', type=click.Choice(SORT_ORDERS), help='Order of the files in the prompt; git_recent puts the most recently committed files first')
+@click.option('--path', type=click.Path(exists=True), multiple=True, default=['.'], help='Path to the codebase directory (default: current directory); repeat to merge several roots into one prompt, with ROOT:PATTERN includes/excludes applying to one root')
+@click.option('--cache', is_flag=True, help='Cache rendered files on disk and reuse them for unchanged files')
+@click.option('--cache-dir', type=click.Path(file_okay=False), help='Cache directory (implies --cache)')
+@click.option('--cache-max-size', type=click.IntRange(min=1), default=DEFAULT_MAX_BYTES // (1024 * 1024), show_default=True, help='Cache size limit in MB; least recently used entries are evicted')
+@click.option('--stream', is_flag=True, help='Write the prompt incrementally to stdout or the output file instead of building it in memory (disables clipboard copy)')
+@click.option('-j', '--jobs', type=click.IntRange(min=0), help='Read and render files on N worker threads (0: one per CPU)')
+@click.option('--top-k', type=click.IntRange(min=1), metavar='K', help='Include only the K files most relevant to the prompt text, ranked with a persistent full-text index of identifiers, symbols and paths')
+@click.option('--max-tokens', type=click.IntRange(min=1), help='Token budget: include the highest-ranked files that fit, truncating or dropping the rest')
+@click.option('--rank', type=click.Choice(RANK_ORDERS), default='relevance', show_default=True, help='How files are ranked for --max-tokens')
+@click.option('--max-file-size', type=ByteSize(), help='Skip files larger than SIZE (bytes, or with a K/M/G suffix) without reading them')
+@click.option('--max-total-bytes', type=ByteSize(), help='Skip files that would take the total size of included files over SIZE')
+@click.option('--dedup', is_flag=True, help='Emit files with identical contents once; later copies refer to the first')
+@click.option('--near-dup', type=click.FloatRange(min=0, max=1, min_open=True), metavar='THRESHOLD', help='Also replace files whose lines are at least THRESHOLD (0-1) similar to an earlier file with a diff against it (implies --dedup)')
+@click.option('--incremental', 'state_file', type=click.Path(dir_okay=False), help='State file for incremental regeneration: only files git reports as changed since the last run are re-rendered')
+@click.option('--timings', is_flag=True, help='Report per-phase durations, file and byte counts, cache hit rates and the slowest files')
+@click.option('--profile', 'profile_file', type=click.Path(dir_okay=False), help='Write the timing report to a file')
+@click.option('--profile-format', type=click.Choice(['json', 'chrome']), default='json', show_default=True, help='Format of the --profile file; chrome writes trace events for chrome://tracing or Perfetto')
+@click.option('--batch', type=click.Path(exists=True, dir_okay=False), help='Generate every prompt listed in a JSON or TOML manifest in one process, sharing walks and caches between jobs')
+@click.option('--serve', is_flag=True, help='Run a daemon for --path that keeps the index, rendered files and tokenizers warm between requests')
+@click.option('--daemon', is_flag=True, help='Ask the running daemon to generate the prompt, falling back to local generation when it is unavailable')
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False), help='Daemon socket path (default: daemon.sock in the cache directory)')
 @click.version_option()
 def main(
     prompt_text: Optional[str],
@@ -54,18 +121,43 @@ def main(
     full_directory_tree: bool,
     encoding: Optional[str],
     tokens: Optional[str],
+    approx_tokens: bool,
     diff: bool,
     git_diff_branch: Optional[tuple],
     git_log_branch: Optional[tuple],
+    max_diff_size: Optional[int],
+    max_log_entries: int,
+    from_git: Optional[str],
     line_numbers: bool,
     absolute_paths: bool,
     follow_symlinks: bool,
     hidden: bool,
     no_codeblock: bool,
     no_clipboard: bool,
+    clipboard_timeout: float,
     no_ignore: bool,
     sort: Optional[str],
-    path: str,
+    path: Tuple[str, ...],
+    cache: bool,
+    cache_dir: Optional[str],
+    cache_max_size: int,
+    stream: bool,
+    jobs: Optional[int],
+    top_k: Optional[int],
+    max_tokens: Optional[int],
+    rank: str,
+    max_file_size: Optional[int],
+    max_total_bytes: Optional[int],
+    dedup: bool,
+    near_dup: Optional[float],
+    state_file: Optional[str],
+    timings: bool,
+    profile_file: Optional[str],
+    profile_format: str,
+    batch: Optional[str],
+    serve: bool,
+    daemon: bool,
+    socket_path: Optional[str],
 ) -> None:
     """
     Generate an LLM prompt from codebase context.
@@ -74,25 +166,54 @@ def main(
     If not provided, only the codebase context will be generated.
     """
     
+    if not socket_path:
+        socket_path = str(default_cache_dir() / 'daemon.sock')
+    
+    if len(path) > 1 and (serve or daemon or batch or state_file or from_git):
+        click.echo(
+            "Error: several --path roots cannot be combined with --serve, --daemon, --batch, --incremental or --from-git."
+        )
+        sys.exit(1)
+    
+    if serve:
+        _serve(Path(path[0]).resolve(), Path(socket_path))
+        return
+    
     # Validate input
-    if not prompt_text and not include and not exclude:
+    if not batch and not prompt_text and not include and not exclude:
         click.echo("Error: Please provide a prompt text or include/exclude patterns.")
         click.echo("Use --help for more information.")
         sys.exit(1)
     
-    # Convert path to Path object
-    codebase_path = Path(path).resolve()
+    # Convert paths to Path objects
+    codebase_paths = [Path(root).resolve() for root in path]
     
-    if not codebase_path.exists():
-        click.echo(f"Error: Path '{path}' does not exist.")
-        sys.exit(1)
+    for root, codebase_path in zip(path, codebase_paths):
+        if not codebase_path.exists():
+            click.echo(f"Error: Path '{root}' does not exist.")
+            sys.exit(1)
+        
+        if not codebase_path.is_dir():
+            click.echo(f"Error: Path '{root}' is not a directory.")
+            sys.exit(1)
     
-    if not codebase_path.is_dir():
-        click.echo(f"Error: Path '{path}' is not a directory.")
-        sys.exit(1)
+    roots = None
+    if len(codebase_paths) > 1:
+        from .errors import ConfigurationError
+        from .roots import plan_roots
+        try:
+            codebase_path, roots, include, exclude = plan_roots(codebase_paths, include, exclude)
+        except ConfigurationError as e:
+            click.echo(f"Error: {e}.")
+            sys.exit(1)
+    else:
+        codebase_path = codebase_paths[0]
     
     # Display basic info
-    click.echo(f"Generating prompt for codebase: {codebase_path}")
+    if roots:
+        click.echo(f"Generating prompt for {len(roots)} codebases under: {codebase_path}")
+    elif not batch:
+        click.echo(f"Generating prompt for codebase: {codebase_path}")
     
     # Prepare options for code2prompt-rs
     options = {
@@ -109,8 +230,17 @@ def main(
         'no_ignore': no_ignore,
     }
     
+    if roots:
+        options['roots'] = roots
+    
+    if output_file:
+        options['output_file'] = str(Path(output_file).resolve())
+    
     if template:
-        options['template_path'] = template
+        if output_format != 'markdown':
+            click.echo(f"Error: --template cannot be combined with --output-format {output_format}.")
+            sys.exit(1)
+        options['template_path'] = str(Path(template).resolve())
     
     if sort:
         options['sort_order'] = sort
@@ -127,39 +257,328 @@ def main(
     
     if git_log_branch:
         options['git_log_branches'] = list(git_log_branch)
+        options['max_log_entries'] = max_log_entries
+    
+    if max_diff_size:
+        options['max_diff_bytes'] = max_diff_size
+    
+    if from_git:
+        options['from_git'] = from_git
     
     if tokens:
         options['token_count_format'] = tokens
     
+    if approx_tokens:
+        options['approx_tokens'] = True
+    
+    if cache or cache_dir:
+        options['cache_dir'] = cache_dir or str(default_cache_dir())
+        options['cache_max_bytes'] = cache_max_size * 1024 * 1024
+    
+    if stream:
+        options['stream'] = True
+    
+    if jobs is not None:
+        options['jobs'] = jobs or os.cpu_count() or 1
+    
+    if top_k:
+        if not prompt_text and not batch:
+            click.echo("Error: --top-k needs a prompt text to rank files against.")
+            sys.exit(1)
+        options['top_k'] = top_k
+    
+    if max_tokens:
+        options['max_tokens'] = max_tokens
+        options['rank'] = rank
+    
+    if max_file_size:
+        options['max_file_size'] = max_file_size
+    
+    if max_total_bytes:
+        options['max_total_bytes'] = max_total_bytes
+    
+    if dedup or near_dup:
+        options['dedup'] = True
+        if near_dup:
+            options['near_dup'] = near_dup
+    
+    if state_file:
+        # git does not report changes to ignored files, so --no-ignore output would go stale.
+        if max_tokens or max_total_bytes or options.get('dedup') or top_k or sort or from_git or no_ignore:
+            click.echo(
+                "Error: --incremental cannot be combined with --max-tokens, --max-total-bytes, --dedup, --top-k, "
+                "--sort, --from-git or --no-ignore."
+            )
+            sys.exit(1)
+        options['state_file'] = str(Path(state_file).resolve())
+    
+    from .timings import Timings
+    recorder = Timings(enabled=timings or bool(profile_file))
+    
+    if batch:
+        if stream or state_file or daemon:
+            click.echo("Error: --batch cannot be combined with --stream, --incremental or --daemon.")
+            sys.exit(1)
+        _run_batch(Path(batch), codebase_path, options, recorder)
+        _report_timings(recorder, timings, profile_file, profile_format)
+        return
+    
+    from .pipeline import RunSummary, generate_prompt, iter_prompt
+    from .sinks import ClipboardSink, write_to_sinks
+    
     # Generate prompt using code2prompt-rs
+    summary = RunSummary()
+    result = None
+    if daemon:
+        # Unix socket support is platform-dependent, so the daemon module is imported on demand.
+        from .daemon import DaemonUnavailable, request_prompt
+        try:
+            with recorder.phase('generate'):
+                result, summary = request_prompt(Path(socket_path), codebase_path, prompt_text, options)
+        except DaemonUnavailable as e:
+            click.echo(f"Warning: daemon unavailable ({e}); generating locally.")
+    
     try:
-        if CODE2PROMPT_AVAILABLE:
-            result = _generate_real_prompt(codebase_path, prompt_text, options)
+        if stream:
+            if result is not None:
+                chunks = [result]
+            else:
+                chunks = iter_prompt(codebase_path, prompt_text, options, summary, timings=recorder, passthrough=True)
+            # Generation happens while writing, so the output phase includes it.
+            error, = write_to_sinks(chunks, [_output_sink(output_file)], recorder)
+            if error is not None:
+                raise error
+            if output_file:
+                click.echo(f"Prompt written to: {output_file}")
+            _echo_summary(summary, tokens)
+            if not no_clipboard:
+                click.echo("Clipboard copy skipped in stream mode.")
+            _report_timings(recorder, timings, profile_file, profile_format)
+            return
+        
+        if result is not None:
+            pass
+        elif any(options.get(key) for key in PIPELINE_OPTIONS) or output_format != 'markdown':
+            result = generate_prompt(codebase_path, prompt_text, options, summary, timings=recorder)
+        elif _code2prompt_available():
+            # code2prompt-rs renders in one call, so it is timed as a single phase.
+            with recorder.phase('generate'):
+                result = _generate_real_prompt(codebase_path, prompt_text, options)
         else:
             click.echo("Error: code2prompt-rs is not available. Please install it to use this tool.")
             sys.exit(1)
         
-        # Handle output
+        # Write the output and copy to the clipboard concurrently
+        sinks = [_output_sink(output_file)]
+        if not no_clipboard:
+            sinks.append(ClipboardSink(clipboard_timeout))
+        errors = write_to_sinks([result], sinks, recorder)
+        if errors[0] is not None:
+            raise errors[0]
         if output_file:
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(result)
             click.echo(f"Prompt written to: {output_file}")
-        else:
-            click.echo(result)
         
-        # Handle clipboard (if available and not disabled)
+        _echo_summary(summary, tokens)
+        
         if not no_clipboard:
-            try:
-                import pyperclip
-                pyperclip.copy(result)
+            if errors[1] is None:
                 click.echo("Prompt copied to clipboard!")
-            except Exception as e:
-                click.echo(f"Warning: Could not copy to clipboard: {e}")
+            else:
+                click.echo(f"Warning: Could not copy to clipboard: {errors[1]}")
+        
+        _report_timings(recorder, timings, profile_file, profile_format)
     
     except Exception as e:
         click.echo(f"Error generating prompt: {e}")
         sys.exit(1)
 
+def _serve(codebase_path: Path, socket_path: Path) -> None:
+    """
+    Run the prompt daemon until interrupted.
+    
+    Args:
+        codebase_path: Codebase root served by the daemon
+        socket_path: Unix domain socket to listen on
+    """
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        click.echo("Error: --serve requires Unix domain socket support.")
+        sys.exit(1)
+    from .daemon import PromptServer
+    try:
+        server = PromptServer(socket_path, codebase_path)
+    except OSError as e:
+        click.echo(f"Error starting daemon: {e}")
+        sys.exit(1)
+    watching = "watching for changes" if server.watcher is not None else "file watching unavailable"
+    click.echo(f"Serving {codebase_path} on {socket_path} ({watching}); press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def _report_timings(recorder, show: bool, profile_file: Optional[str], profile_format: str) -> None:
+    """
+    Print and/or save the timing report of a run.
+    
+    Args:
+        recorder: Timings collected during the run
+        show: Print the report
+        profile_file: Optional file to write the report to
+        profile_format: 'json' for the report document, 'chrome' for trace events
+    """
+    if show:
+        for line in recorder.format_text():
+            click.echo(line)
+    if profile_file:
+        import json
+        document = recorder.chrome_trace() if profile_format == 'chrome' else recorder.report()
+        with open(profile_file, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=None if profile_format == 'chrome' else 2)
+        click.echo(f"Profile written to: {profile_file}")
+
+def _run_batch(manifest: Path, codebase_path: Path, options: dict, recorder=None) -> None:
+    """
+    Generate every prompt listed in a batch manifest.
+    
+    Args:
+        manifest: Path to the JSON or TOML manifest
+        codebase_path: Codebase for jobs that do not set a path
+        options: Dictionary of options from CLI arguments, shared by every job
+        recorder: Optional Timings shared by every job
+    """
+    from .batch import ManifestError, load_manifest, run_batch
+    from .cache import FileCache, MemoryCache
+    from .dirindex import MemoryIndex
+    from .pipeline import PipelineState
+    
+    # --jobs sets how many prompts are generated at once; each job renders its files inline.
+    workers = options.pop('jobs', None) or os.cpu_count() or 1
+    try:
+        jobs = load_manifest(manifest, options, codebase_path)
+    except ManifestError as e:
+        click.echo(f"Error reading batch manifest: {e}")
+        sys.exit(1)
+    
+    if options.get('cache_dir'):
+        cache = FileCache(Path(options['cache_dir']), options['cache_max_bytes'])
+    else:
+        cache = MemoryCache()
+    state = PipelineState(cache=cache, index=MemoryIndex(), cache_walks=True)
+    try:
+        results = run_batch(jobs, state, workers, recorder)
+    finally:
+        cache.close()
+    
+    failed = 0
+    for result in results:
+        if result.error is not None:
+            failed += 1
+            click.echo(f"Error generating prompt for {result.job.name}: {result.error}")
+            continue
+        click.echo(f"Prompt written to: {result.job.output_file}")
+        _echo_summary(result.summary, options.get('token_count_format'))
+    click.echo(f"Batch: {len(results) - failed} of {len(results)} prompts written.")
+    if failed:
+        sys.exit(1)
+
+def _code2prompt_available() -> bool:
+    """Check whether code2prompt-rs is installed without importing it."""
+    from importlib.util import find_spec
+    return find_spec('code2prompt_rs') is not None
+
+def _echo_summary(summary: 'RunSummary', token_format: Optional[str] = None) -> None:
+    """
+    Report facts about a built-in pipeline run that the prompt itself does not show.
+    
+    Args:
+        summary: Summary filled in by the pipeline
+        token_format: How token counts are printed: 'raw' or 'format' (thousands separators)
+    """
+    if summary.incremental_changed is not None:
+        base = (summary.incremental_base or "empty repository")[:12]
+        click.echo(f"Incremental: re-checked {summary.incremental_changed} files changed since {base}")
+    if summary.prompt_tokens is not None:
+        fmt = "{:,}" if token_format == 'format' else "{}"
+        approximate = " (approximate)" if summary.approximate_tokens else ""
+        click.echo(f"Token count: {fmt.format(summary.prompt_tokens)}{approximate}")
+        largest = sorted(summary.file_tokens, key=lambda item: item[1], reverse=True)
+        for rel_path, count in largest[:MAX_LISTED_FILES]:
+            click.echo(f"  {fmt.format(count):>10}  {rel_path}")
+        if len(largest) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(largest) - MAX_LISTED_FILES} more files")
+    if summary.relevance_candidates is not None:
+        click.echo(
+            f"Relevance: kept {len(summary.relevant_files)} of {summary.relevance_candidates} files "
+            f"matching the prompt"
+        )
+        for rel_path, score in summary.relevant_files[:MAX_LISTED_FILES]:
+            click.echo(f"  {score:8.2f}  {rel_path}")
+        if len(summary.relevant_files) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.relevant_files) - MAX_LISTED_FILES} more")
+    if summary.duplicate_files or summary.near_duplicate_files:
+        click.echo(
+            f"Deduplicated {len(summary.duplicate_files)} identical files "
+            f"and {len(summary.near_duplicate_files)} near-duplicates"
+        )
+        for rel_path, original in summary.duplicate_files[:MAX_LISTED_FILES]:
+            click.echo(f"  identical to {original}: {rel_path}")
+        if len(summary.duplicate_files) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.duplicate_files) - MAX_LISTED_FILES} more identical")
+        for rel_path, original, similarity in summary.near_duplicate_files[:MAX_LISTED_FILES]:
+            click.echo(f"  {similarity:.0%} similar to {original}: {rel_path}")
+        if len(summary.near_duplicate_files) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.near_duplicate_files) - MAX_LISTED_FILES} more near-duplicates")
+    if summary.diff_files:
+        click.echo(
+            f"Git diff: {len(summary.diff_files)} files, "
+            f"{len(summary.truncated_diffs)} cut at the --max-diff-size limit"
+        )
+        for rel_path in summary.truncated_diffs[:MAX_LISTED_FILES]:
+            click.echo(f"  cut: {rel_path}")
+        if len(summary.truncated_diffs) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.truncated_diffs) - MAX_LISTED_FILES} more cut")
+    if summary.omitted_commits:
+        click.echo(f"Git log: {summary.omitted_commits} more commits left out by --max-log-entries")
+    if summary.skipped_files:
+        reasons = {}
+        for _, reason in summary.skipped_files:
+            reasons[reason] = reasons.get(reason, 0) + 1
+        counts = ", ".join(f"{count} {reason}" for reason, count in reasons.items())
+        click.echo(f"Skipped {len(summary.skipped_files)} files: {counts}")
+        for rel_path, reason in summary.skipped_files[:MAX_LISTED_FILES]:
+            click.echo(f"  skipped ({reason}): {rel_path}")
+        if len(summary.skipped_files) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.skipped_files) - MAX_LISTED_FILES} more skipped")
+    if summary.token_budget is not None:
+        approximate = " (approximate)" if summary.approximate_tokens else ""
+        click.echo(
+            f"Token budget: {summary.used_tokens} of {summary.token_budget} tokens used{approximate}; "
+            f"{summary.included_files} files included, {len(summary.truncated_files)} truncated, "
+            f"{len(summary.dropped_files)} dropped"
+        )
+        for rel_path in summary.truncated_files:
+            click.echo(f"  truncated: {rel_path}")
+        for rel_path in summary.dropped_files[:MAX_LISTED_FILES]:
+            click.echo(f"  dropped: {rel_path}")
+        if len(summary.dropped_files) > MAX_LISTED_FILES:
+            click.echo(f"  ... and {len(summary.dropped_files) - MAX_LISTED_FILES} more dropped")
+
+def _output_sink(output_file: Optional[str]) -> 'Sink':
+    """
+    Open the destination of the prompt text.
+    
+    Args:
+        output_file: Optional output file path (compressed for .gz, .bz2, .xz and .zst); stdout when not given
+        
+    Returns:
+        Sink writing to the file or to stdout
+    """
+    from .sinks import FileSink, StdoutSink
+    return FileSink(output_file) if output_file else StdoutSink()
+
 def _generate_real_prompt(codebase_path: Path, prompt_text: Optional[str], options: dict) -> str:
     """
     Generate a real prompt using the code2prompt-rs library.
@@ -171,7 +590,18 @@ def _generate_real_prompt(codebase_path: Path, prompt_text: Optional[str], optio
         
     Returns:
         Generated prompt string
+    
+    Raises:
+        BackendUnavailableError: If code2prompt-rs is not installed
+        GenerationError: If code2prompt-rs fails to generate the prompt
     """
+    from .errors import BackendUnavailableError, GenerationError
+    from .render import format_user_request
+    try:
+        from code2prompt_rs import Code2Prompt
+    except ImportError as e:
+        raise BackendUnavailableError("code2prompt-rs is not installed") from e
+    
     try:
         # Map CLI options to code2prompt-rs parameters
         c2p_options = {
@@ -199,12 +629,12 @@ def _generate_real_prompt(codebase_path: Path, prompt_text: Optional[str], optio
         
         # Add user prompt text if provided
         if prompt_text:
-            result = f"{result}\n\n## User Request\n{prompt_text}\n\n## Instructions for LLM\nPlease analyze the codebase context above and respond to the user request.\nIf you need additional context or clarification, please ask the user."
+            result += format_user_request(prompt_text)
         
         return result
         
     except Exception as e:
-        raise Exception(f"Error generating prompt with code2prompt-rs: {str(e)}")
+        raise GenerationError(f"Error generating prompt with code2prompt-rs: {str(e)}") from e
 
 if __name__ == '__main__':
     main()
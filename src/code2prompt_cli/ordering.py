@@ -0,0 +1,54 @@
+"""
+File orders for ``--sort``.
+
+Name orders are produced by the walk itself, one directory at a time
+(``name_desc`` lists each directory in reverse), so they never sort the
+whole selection. Date and size orders sort the selected files on the stat
+data recorded by the walk, so no file is stat'ed twice. ``git_recent`` puts
+the most recently committed files first, using the cached index of
+gitlog.py; files that were never committed come before all others, as
+they are the newest work. Ties always keep walk order.
+"""
+
+from typing import Callable, Dict, List, Optional
+
+from .walker import FileEntry
+
+# Orders produced by the walk rather than by sorting.
+WALK_ORDERS = ('name_asc', 'name_desc')
+
+
+def recency_key(commit_times: Dict[str, int]) -> Callable[[FileEntry], float]:
+    """Return a sort key putting uncommitted files first, then the most recently committed."""
+    return lambda entry: -commit_times.get(entry.rel_path, float('inf'))
+
+
+def sort_files(
+    files: List[FileEntry],
+    order: Optional[str],
+    commit_times: Optional[Dict[str, int]] = None,
+) -> List[FileEntry]:
+    """
+    Order selected files for the prompt.
+
+    Args:
+        files: Selected files in walk order
+        order: One of defaults.SORT_ORDERS, or None for walk order
+        commit_times: Last commit time by relative path, required for ``git_recent``
+
+    Returns:
+        The files in prompt order
+    """
+    if order is None or order in WALK_ORDERS:
+        return files
+    if order == 'date_asc':
+        return sorted(files, key=lambda entry: entry.mtime_ns)
+    if order == 'date_desc':
+        return sorted(files, key=lambda entry: -entry.mtime_ns)
+    if order == 'size_asc':
+        return sorted(files, key=lambda entry: entry.size)
+    if order == 'size_desc':
+        return sorted(files, key=lambda entry: -entry.size)
+    if order == 'git_recent':
+        return sorted(files, key=recency_key(commit_times or {}))
+    raise ValueError(f"unknown sort order: {order!r}")
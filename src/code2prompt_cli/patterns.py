@@ -0,0 +1,179 @@
+"""
+Include/exclude glob matching for the built-in prompt pipeline.
+
+Semantics follow code2prompt-rs: patterns are matched against the path
+relative to the codebase root, ``*`` may cross directory separators, and a
+path matched by both an include and an exclude pattern is kept only when
+include priority is enabled.
+
+Each side's patterns are compiled once into a combined matcher: literal
+paths go into a set, ``*<suffix>`` patterns into a suffix tuple, literal
+directory patterns such as ``build/**`` into a prefix trie, and everything
+else into one merged regex. The matcher can also tell the walker when no
+file below a directory could be selected, so the directory is pruned.
+"""
+
+import re
+from fnmatch import translate
+from typing import Dict, List, Optional, Sequence
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+# Trailing parts that make a pattern match everything below a directory.
+_SUBTREE_SUFFIXES = ("/**", "/*")
+
+
+class _PrefixTrie:
+    """Trie of directory paths, one node per path component."""
+
+    def __init__(self):
+        self.root: Dict[str, dict] = {}
+
+    def add(self, path: str) -> None:
+        node = self.root
+        for part in path.split("/") if path else []:
+            node = node.setdefault(part, {})
+        node[""] = {}
+
+    def covers(self, path: str) -> bool:
+        """Whether some stored directory is ``path`` itself or one of its ancestors."""
+        node = self.root
+        if "" in node:
+            return True
+        for part in path.split("/"):
+            node = node.get(part)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return False
+
+    def overlaps(self, path: str) -> bool:
+        """Whether some stored directory is an ancestor of, equal to, or below ``path``."""
+        node = self.root
+        if "" in node:
+            return True
+        for part in path.split("/"):
+            node = node.get(part)
+            if node is None:
+                return False
+            if "" in node:
+                return True
+        return bool(node)
+
+
+class _CompiledPatterns:
+    """One side (include or exclude) of the pattern set, compiled for fast matching."""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.exact = set()
+        self.subtrees = _PrefixTrie()
+        self.literal_prefixes = _PrefixTrie()
+        suffixes: List[str] = []
+        regexes: List[str] = []
+        covers: List[str] = []
+
+        for pattern in patterns:
+            glob = _GLOB_CHARS.search(pattern)
+            if glob is None:
+                self.exact.add(pattern)
+                if "/" in pattern:
+                    self.literal_prefixes.add(pattern.rpartition("/")[0])
+                continue
+            for suffix in _SUBTREE_SUFFIXES:
+                base = pattern[:-len(suffix)]
+                if pattern.endswith(suffix) and base and not _GLOB_CHARS.search(base):
+                    self.subtrees.add(base)
+                    self.literal_prefixes.add(base)
+                    break
+            else:
+                if pattern.startswith("*") and not _GLOB_CHARS.search(pattern, 1):
+                    suffixes.append(pattern[1:])
+                else:
+                    regexes.append(translate(pattern))
+                    for suffix in _SUBTREE_SUFFIXES:
+                        if pattern.endswith(suffix):
+                            # Whatever directory the base matches, everything below it matches.
+                            covers.append(translate(pattern[:-len(suffix)]))
+                            break
+                # The directories this pattern can reach start with its literal leading components.
+                self.literal_prefixes.add(pattern[:glob.start()].rpartition("/")[0])
+
+        self.suffixes = tuple(suffixes)
+        self.regex = self._merge(regexes)
+        self.cover_regex = self._merge(covers)
+        self.empty = not patterns
+
+    @staticmethod
+    def _merge(regexes: List[str]) -> Optional["re.Pattern[str]"]:
+        if not regexes:
+            return None
+        return re.compile("|".join(f"(?:{regex})" for regex in regexes))
+
+    def matches(self, rel_path: str) -> bool:
+        if rel_path in self.exact:
+            return True
+        if self.suffixes and rel_path.endswith(self.suffixes):
+            return True
+        parent = rel_path.rpartition("/")[0]
+        if parent and self.subtrees.covers(parent):
+            return True
+        return self.regex is not None and self.regex.match(rel_path) is not None
+
+    def covers_dir(self, rel_dir: str) -> bool:
+        """Whether every path below the directory matches."""
+        if self.subtrees.covers(rel_dir):
+            return True
+        return self.cover_regex is not None and self.cover_regex.match(rel_dir) is not None
+
+    def could_match_below(self, rel_dir: str) -> bool:
+        """Whether any path below the directory could match (never a false negative)."""
+        if self.suffixes:
+            return True
+        return self.literal_prefixes.overlaps(rel_dir)
+
+
+class PatternMatcher:
+    """Decides whether a relative file path is selected by include/exclude patterns."""
+
+    def __init__(self, include: Sequence[str], exclude: Sequence[str], include_priority: bool = False):
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.include_priority = include_priority
+        self._include = _CompiledPatterns(self.include)
+        self._exclude = _CompiledPatterns(self.exclude)
+
+    def matches(self, rel_path: str) -> bool:
+        """
+        Check whether a file should be included.
+
+        Args:
+            rel_path: POSIX-style path relative to the codebase root
+
+        Returns:
+            True if the file is selected
+        """
+        included = not self._include.empty and self._include.matches(rel_path)
+        excluded = not self._exclude.empty and self._exclude.matches(rel_path)
+        if included and excluded:
+            return self.include_priority
+        if excluded:
+            return False
+        return included or self._include.empty
+
+    def prunes_dir(self, rel_dir: str) -> bool:
+        """
+        Check whether no file below a directory can be selected, so it need not be walked.
+
+        Args:
+            rel_dir: POSIX-style directory path relative to the codebase root
+
+        Returns:
+            True if the directory can be skipped
+        """
+        include_possible = self._include.empty or self._include.could_match_below(rel_dir)
+        if not include_possible:
+            return True
+        if not self._exclude.empty and self._exclude.covers_dir(rel_dir):
+            return not (self.include_priority and not self._include.empty)
+        return False
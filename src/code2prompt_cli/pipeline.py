@@ -0,0 +1,1193 @@
+"""
+Built-in prompt generation pipeline.
+
+code2prompt-rs renders a prompt in one opaque call. Features that need
+per-file control (caching, streaming, budgets, ...) go through this
+pipeline instead, which walks the codebase, renders each file block and
+assembles the prompt in the same layout as the library's default template.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+
+from .budget import pack_files, rank_files
+from .cache import CachedBlock, FileCache
+from .dedup import DedupPlan, Deduplicator, DuplicateRef, near_duplicate_diff
+from .defaults import default_cache_dir
+from .dirindex import DirectoryIndex
+from .errors import ConfigurationError
+from .formats import get_format
+from .gitcontext import GitRecord, has_git_context, iter_git_context, template_variables
+from .gitlog import commit_times
+from .gitsource import INDEX_REF, GitTree
+from .gitutils import GitError, changed_paths, head_commit, open_repo
+from .incremental import PromptState, load_state, options_key, save_state
+from .ingest import LARGE_FILE_BYTES, FileBody, is_text_file, read_entry
+from .ordering import sort_files
+from .patterns import PatternMatcher
+from .render import (
+    block_affixes,
+    decode_text,
+    format_user_request,
+    render_duplicate_block,
+    render_file_block,
+    render_file_entry,
+    render_tree,
+)
+from .roots import relabel, root_options
+from .search import SearchIndex, document_terms
+from .timings import Timings
+from .tokens import TokenCounter
+from .walker import FileEntry, IGNORE_FILE, ignore_rules_stamp, stat_entries, walk_files, walk_order_key
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# How many results each worker may run ahead of the consumer; bounds the
+# number of rendered blocks held in memory while preserving output order.
+_PREFETCH_PER_WORKER = 4
+
+# Reasons a selected file is left out of the prompt, as listed in RunSummary.skipped_files.
+SKIPPED_BINARY = "binary"
+SKIPPED_FILE_SIZE = "over --max-file-size"
+SKIPPED_TOTAL_SIZE = "over --max-total-bytes"
+
+
+@dataclass
+class RunSummary:
+    """Facts about a pipeline run that are reported after the prompt."""
+
+    token_budget: Optional[int] = None
+    used_tokens: int = 0
+    approximate_tokens: bool = False
+    included_files: int = 0
+    incremental_base: Optional[str] = None
+    incremental_changed: Optional[int] = None
+    truncated_files: List[str] = field(default_factory=list)
+    dropped_files: List[str] = field(default_factory=list)
+    # (rel_path, reason) for selected files left out of the prompt
+    skipped_files: List[Tuple[str, str]] = field(default_factory=list)
+    # Filled in when token counting is requested (the token_count_format option)
+    prompt_tokens: Optional[int] = None
+    file_tokens: List[Tuple[str, int]] = field(default_factory=list)
+    # Filled in with the dedup option: (rel_path, original rel_path[, similarity])
+    duplicate_files: List[Tuple[str, str]] = field(default_factory=list)
+    near_duplicate_files: List[Tuple[str, str, float]] = field(default_factory=list)
+    # Filled in with the top_k option: how many files were ranked, and the (rel_path, score) kept
+    relevance_candidates: Optional[int] = None
+    relevant_files: List[Tuple[str, float]] = field(default_factory=list)
+    # Filled in with the git diff and log options: files diffed, diffs cut by the size cap
+    # and commits left out of the log
+    diff_files: List[str] = field(default_factory=list)
+    truncated_diffs: List[str] = field(default_factory=list)
+    omitted_commits: int = 0
+
+
+class PipelineState:
+    """
+    Resources shared by consecutive pipeline runs in one long-lived process.
+
+    Holds a block cache, a directory index and token counters. When
+    ``cache_walks`` is enabled, walk results are reused too; the owner must
+    then call invalidate() whenever anything under a walked root changes.
+
+    Args:
+        cache: Block cache (FileCache or MemoryCache)
+        index: Directory index (DirectoryIndex or MemoryIndex)
+        cache_walks: Reuse walk results until invalidate() is called
+    """
+
+    def __init__(self, cache=None, index=None, cache_walks: bool = False):
+        self.cache = cache
+        self.index = index
+        self.cache_walks = cache_walks
+        self.counters: Dict[Tuple[Optional[str], bool], TokenCounter] = {}
+        self._walks: Dict[tuple, List[FileEntry]] = {}
+        self._walk_locks: Dict[tuple, threading.Lock] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Forget cached walk results; called when the filesystem changes."""
+        with self._lock:
+            self._generation += 1
+            self._walks.clear()
+
+    def counter(self, encoding: Optional[str], approximate: bool = False) -> TokenCounter:
+        """Return the shared token counter for an encoding."""
+        key = (encoding, approximate)
+        with self._lock:
+            if key not in self.counters:
+                self.counters[key] = TokenCounter(encoding, approximate)
+            return self.counters[key]
+
+    def walk(self, key: tuple, walk: Callable[[], List[FileEntry]]) -> List[FileEntry]:
+        """
+        Return a walk result, reusing the cached one for the same key when enabled.
+
+        Concurrent callers asking for the same key wait for a single walk.
+        """
+        if not self.cache_walks:
+            return walk()
+        with self._lock:
+            walk_lock = self._walk_locks.setdefault(key, threading.Lock())
+        with walk_lock:
+            with self._lock:
+                cached = self._walks.get(key)
+                generation = self._generation
+            if cached is not None:
+                return cached
+            entries = walk()
+            with self._lock:
+                # A change reported while walking may not be reflected; do not keep the result.
+                if generation == self._generation:
+                    self._walks[key] = entries
+            return entries
+
+
+class _Renderer:
+    """Renders file blocks for one pipeline run, going through the cache when enabled."""
+
+    def __init__(
+        self,
+        options: dict,
+        cache: Optional[FileCache],
+        state: Optional[PipelineState] = None,
+        timings: Optional[Timings] = None,
+    ):
+        self.options = options
+        self.cache = cache
+        self.state = state
+        self.timings = timings or Timings(enabled=False)
+        self.passthrough = False
+        # CompiledTemplate when a custom template replaces the default layout.
+        self.template = None
+        # GitTree the files are listed from with the from_git option.
+        self.tree = None
+        # Git diff and log records, when they are read before the files (see iter_prompt).
+        self.git_records: Optional[List[GitRecord]] = None
+        self.count_tokens = bool(options.get('token_count_format'))
+        self.format = get_format(options.get('output_format'))
+        self.line_numbers = options.get('line_numbers', False)
+        # Code fences are markdown; structured formats carry the plain contents.
+        self.code_blocks = not options.get('no_codeblock', False) and not self.format.structured
+        self._counter = None
+        # Section token counts computed for the budget, reused when the section is rendered.
+        self._section_tokens: Dict[str, int] = {}
+
+    @property
+    def counter(self) -> TokenCounter:
+        if self._counter is None:
+            encoding = self.options.get('encoding')
+            approximate = self.options.get('approx_tokens', False)
+            if self.state:
+                self._counter = self.state.counter(encoding, approximate)
+            else:
+                self._counter = TokenCounter(encoding, approximate)
+        return self._counter
+
+    def display_path(self, entry: FileEntry) -> str:
+        return entry.path if self.options.get('absolute_paths') else entry.rel_path
+
+    def variant(self, entry: FileEntry) -> str:
+        """Describe the options that affect a rendered block, for use as a cache key."""
+        return "ext={};ln={:d};cb={:d}".format(entry.extension, self.line_numbers, self.code_blocks)
+
+    def render_text(self, text: str, entry: FileEntry) -> str:
+        return render_file_block(text, entry.extension, self.line_numbers, self.code_blocks)
+
+    def render_bytes(self, data: bytes, entry: FileEntry) -> Optional[str]:
+        text = decode_text(data)
+        if text is None:
+            return None
+        return self.render_text(text, entry)
+
+    def passes_through(self, entry: FileEntry) -> bool:
+        """Whether a file's body can be copied to a streamed output unchanged."""
+        return (
+            self.passthrough
+            and self.cache is None
+            and not self.line_numbers
+            and entry.size >= LARGE_FILE_BYTES
+            and entry.blob is None
+        )
+
+    def block(self, entry: FileEntry) -> Optional[str]:
+        """Render a file's block, or return None if the file is skipped as binary."""
+        return self._render(entry)[0]
+
+    def counted_block(self, entry: FileEntry) -> Tuple[Optional[str], int]:
+        """Render a file's block and count the tokens of its section (0 for skipped files)."""
+        block, cached = self._render(entry)
+        if block is None:
+            return None, 0
+        tokens = self._section_tokens.get(entry.path)
+        if tokens is None:
+            tokens = self.section_tokens(entry, block, cached)
+        return block, tokens
+
+    def section_tokens(self, entry: FileEntry, block: str, cached: Optional[CachedBlock] = None) -> int:
+        """
+        Count the tokens of a file's whole section.
+
+        Args:
+            entry: The file
+            block: Its rendered block
+            cached: The block's cache entry; its count is then looked up by content digest
+
+        Returns:
+            Number of tokens in the section, header line included
+        """
+        with self.timings.phase('tokens'):
+            if self.format.structured:
+                # Escaping changes the text, so the serialized record itself is counted.
+                return self.counter.count(self.format.file(self.display_path(entry), entry.extension, block))
+            header_tokens = self.counter.count(render_file_entry(self.display_path(entry), ""))
+            if cached is not None:
+                return header_tokens + self.cache.get_or_count(
+                    cached, self.variant(entry), self.counter.name, self.counter.count
+                )
+            return header_tokens + self.counter.count(block)
+
+    def _render(self, entry: FileEntry) -> Tuple[Optional[str], Optional[CachedBlock]]:
+        start = time.perf_counter()
+        cached = None
+        if self.cache is not None:
+            cached = self._cached(entry)
+            block = cached.block
+            self.timings.add('cache', start, time.perf_counter() - start)
+        else:
+            text = read_entry(entry)
+            read_end = time.perf_counter()
+            block = None if text is None else self.render_text(text, entry)
+            self.timings.add('read', start, read_end - start)
+            self.timings.add('render', read_end, time.perf_counter() - read_end)
+        self.timings.add_file(entry.rel_path, entry.size, start, time.perf_counter() - start)
+        return block, cached
+
+    def body(self, entry: FileEntry) -> Optional[FileBody]:
+        """Check a pass-through file, returning its body placeholder or None if it is skipped."""
+        start = time.perf_counter()
+        body = FileBody(entry.path, entry.size) if is_text_file(entry.path) else None
+        self.timings.add('read', start, time.perf_counter() - start)
+        self.timings.add_file(entry.rel_path, entry.size, start, time.perf_counter() - start)
+        return body
+
+    def duplicate_ref(self, entry: FileEntry, plan: DedupPlan) -> Optional[DuplicateRef]:
+        """Return the reference replacing a deduplicated file's block, or None to render it in full."""
+        original = plan.duplicates.get(entry.path)
+        if original is not None:
+            return DuplicateRef(self.display_path(original))
+        if entry.path not in plan.near:
+            return None
+        base, similarity = plan.near[entry.path]
+        start = time.perf_counter()
+        diff = near_duplicate_diff(base, entry, self.display_path(base), self.display_path(entry))
+        self.timings.add('render', start, time.perf_counter() - start)
+        self.timings.add_file(entry.rel_path, entry.size, start, time.perf_counter() - start)
+        return DuplicateRef(self.display_path(base), similarity, diff) if diff is not None else None
+
+    def duplicate_block(self, ref: DuplicateRef) -> str:
+        """Render a duplicate reference as a markdown block."""
+        return render_duplicate_block(ref.original, ref.diff, ref.similarity, self.code_blocks)
+
+    def duplicate_section(self, entry: FileEntry, ref: DuplicateRef) -> str:
+        """Serialize the section of a deduplicated file in the output format."""
+        return self.format.duplicate(self.display_path(entry), entry.extension, ref, self.duplicate_block(ref))
+
+    def entry_tokens(self, entry: FileEntry) -> Optional[int]:
+        """Count the tokens of a file's whole section, or return None if the file is skipped."""
+        if self.cache is not None:
+            cached = self._cached(entry)
+            block = cached.block
+        else:
+            block, cached = self.block(entry), None
+        if block is None:
+            return None
+        tokens = self._section_tokens[entry.path] = self.section_tokens(entry, block, cached)
+        return tokens
+
+    def truncated_block(self, entry: FileEntry, limit: int) -> Optional[Tuple[str, int]]:
+        """
+        Render the longest leading part of a file whose section fits in a token limit.
+
+        Returns:
+            The truncated block and its section token count, or None if not even one line fits
+        """
+        text = read_entry(entry)
+        if text is None:
+            return None
+        lines = text.splitlines()
+
+        def attempt(kept: int) -> Tuple[str, int]:
+            block = self.render_text("\n".join(lines[:kept]), entry)
+            block += f"\n[... truncated {len(lines) - kept} of {len(lines)} lines]"
+            return block, self.section_tokens(entry, block)
+
+        best = None
+        low, high = 1, len(lines) - 1
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = attempt(middle)
+            if candidate[1] <= limit:
+                best = candidate
+                low = middle + 1
+            else:
+                high = middle - 1
+        return best
+
+    def git_block(self, record: GitRecord) -> str:
+        """Render a git diff or log record as a markdown block."""
+        extension = 'diff' if record.kind == 'diff' else 'txt'
+        return render_file_block(record.full_text(), extension, False, self.code_blocks)
+
+    def _cached(self, entry: FileEntry) -> CachedBlock:
+        return self.cache.get_or_render(entry, self.variant(entry), lambda data: self.render_bytes(data, entry))
+
+
+def ordered_map(fn: Callable[[T], R], items: Iterable[T], jobs: int) -> Iterator[R]:
+    """
+    Apply a function over a thread pool, yielding results in input order.
+
+    Only a bounded window of results is computed ahead of the consumer, so
+    this can feed a streamed prompt without buffering every file.
+
+    Args:
+        fn: Function to apply
+        items: Inputs, in the order results must be produced
+        jobs: Number of worker threads; 1 runs inline
+
+    Yields:
+        fn(item) for each item, in order
+    """
+    if jobs <= 1:
+        yield from map(fn, items)
+        return
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= jobs * _PREFETCH_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_matcher(options: dict) -> PatternMatcher:
+    """Compile the include/exclude patterns from the options."""
+    return PatternMatcher(
+        options.get('include_patterns', []),
+        options.get('exclude_patterns', []),
+        options.get('include_priority', False),
+    )
+
+
+def _walk(
+    codebase_path: Path,
+    options: dict,
+    matcher: PatternMatcher,
+    state: Optional[PipelineState] = None,
+    timings: Optional[Timings] = None,
+) -> List[FileEntry]:
+    timings = timings or Timings(enabled=False)
+    # The full tree lists unselected files too, so nothing can be pruned.
+    prune = not options.get('full_directory_tree')
+    reverse = options.get('sort_order') == 'name_desc'
+
+    def walk(index) -> List[FileEntry]:
+        hits, misses = (index.hits, index.misses) if index is not None else (0, 0)
+        with timings.phase('walk'):
+            entries = list(walk_files(
+                codebase_path,
+                hidden=options.get('hidden', False),
+                follow_symlinks=options.get('follow_symlinks', False),
+                no_ignore=options.get('no_ignore', False),
+                index=index,
+                prune_dir=matcher.prunes_dir if prune else None,
+                reverse=reverse,
+            ))
+        if index is not None:
+            timings.count('index_hits', index.hits - hits)
+            timings.count('index_misses', index.misses - misses)
+        return entries
+
+    if state is not None:
+        key = (
+            str(codebase_path),
+            options.get('hidden', False),
+            options.get('follow_symlinks', False),
+            options.get('no_ignore', False),
+            tuple(matcher.include) if prune else None,
+            tuple(matcher.exclude) if prune else None,
+            matcher.include_priority if prune else None,
+            reverse,
+        )
+        return state.walk(key, lambda: walk(state.index))
+
+    index = DirectoryIndex(Path(options['cache_dir'])) if options.get('cache_dir') else None
+    try:
+        return walk(index)
+    finally:
+        if index is not None:
+            index.close()
+
+
+def select_files(
+    entries: List[FileEntry],
+    options: dict,
+    matcher: Optional[PatternMatcher] = None,
+) -> List[FileEntry]:
+    """
+    Filter walked files by the include/exclude patterns.
+
+    Args:
+        entries: Files found by the walker
+        options: Dictionary of options from CLI arguments
+        matcher: Compiled patterns, built from the options when not given
+
+    Returns:
+        Selected files in traversal order
+    """
+    if matcher is None:
+        matcher = build_matcher(options)
+    # Files written by this run (or by other jobs of a batch) may exist while
+    # the codebase is walked; never include them.
+    own_files = {options.get('output_file'), options.get('state_file'), *options.get('skip_paths', ())}
+    return [
+        entry for entry in entries
+        if matcher.matches(entry.rel_path) and entry.path not in own_files
+    ]
+
+
+def collect_files(
+    codebase_path: Path,
+    options: dict,
+    state: Optional[PipelineState] = None,
+    timings: Optional[Timings] = None,
+    tree: Optional[GitTree] = None,
+) -> Tuple[List[FileEntry], List[FileEntry]]:
+    """
+    Walk the codebase and select files, or with the ``roots`` option walk every root concurrently.
+
+    Each root is walked and selected with its own patterns (see roots.py);
+    the results are merged in root order, with paths relative to the common
+    ancestor ``codebase_path``. Given a git tree, its files are listed
+    instead of walking the working tree.
+
+    Args:
+        codebase_path: Path to the codebase directory, or the common ancestor of the roots
+        options: Dictionary of options from CLI arguments
+        state: Optional resources shared with other runs
+        timings: Optional recorder for per-phase timings
+        tree: Optional git tree (see gitsource.py) to list the files from
+
+    Returns:
+        All walked files and the selected files, both in traversal order
+    """
+    timings = timings or Timings(enabled=False)
+    roots = options.get('roots')
+    if not roots:
+        with timings.phase('select'):
+            matcher = build_matcher(options)
+        if tree is not None:
+            with timings.phase('walk'):
+                entries = tree.list_files(options.get('hidden', False), options.get('sort_order') == 'name_desc')
+        else:
+            entries = _walk(codebase_path, options, matcher, state, timings)
+        with timings.phase('select'):
+            return entries, select_files(entries, options, matcher)
+
+    def walk_root(root: dict) -> Tuple[List[FileEntry], List[FileEntry]]:
+        walk_options = root_options(options, root)
+        matcher = build_matcher(walk_options)
+        entries = _walk(Path(root['path']), walk_options, matcher, state, timings)
+        with timings.phase('select'):
+            selected = select_files(entries, walk_options, matcher)
+        return relabel(entries, root['label']), relabel(selected, root['label'])
+
+    with ThreadPoolExecutor(max_workers=len(roots)) as executor:
+        walked = list(executor.map(walk_root, roots))
+    return [entry for entries, _ in walked for entry in entries], [entry for _, files in walked for entry in files]
+
+
+def limit_sizes(files: List[FileEntry], options: dict, summary: RunSummary) -> List[FileEntry]:
+    """
+    Drop files over --max-file-size, then files that would take the total over --max-total-bytes.
+
+    Sizes come from the walk, so skipped files are never opened. The total is
+    filled in prompt order (see --sort); a file that does not fit is skipped
+    and later, smaller files may still be included.
+
+    Args:
+        files: Selected files in prompt order
+        options: Dictionary of options from CLI arguments
+        summary: RunSummary the skipped files are recorded in
+
+    Returns:
+        The files within the limits, in their original order
+    """
+    max_file_size = options.get('max_file_size')
+    max_total_bytes = options.get('max_total_bytes')
+    if not max_file_size and not max_total_bytes:
+        return files
+    kept = []
+    total = 0
+    for entry in files:
+        if max_file_size and entry.size > max_file_size:
+            summary.skipped_files.append((entry.rel_path, SKIPPED_FILE_SIZE))
+            continue
+        if max_total_bytes:
+            if total + entry.size > max_total_bytes:
+                summary.skipped_files.append((entry.rel_path, SKIPPED_TOTAL_SIZE))
+                continue
+            total += entry.size
+        kept.append(entry)
+    return kept
+
+
+def load_commit_times(
+    codebase_path: Path,
+    options: dict,
+    timings: Optional[Timings] = None,
+) -> Optional[Dict[str, int]]:
+    """
+    Look up when each file was last committed, if the sort order or the budget rank needs it.
+
+    Args:
+        codebase_path: Path to the codebase directory
+        options: Dictionary of options from CLI arguments
+        timings: Optional recorder for per-phase timings
+
+    Returns:
+        Last commit time by relative path, or None when neither ``git_recent`` order is used
+
+    Raises:
+        GitError: If the codebase is not in a git repository
+    """
+    if options.get('sort_order') != 'git_recent' and not (
+        options.get('max_tokens') and options.get('rank') == 'git_recent'
+    ):
+        return None
+    timings = timings or Timings(enabled=False)
+    cache_dir = Path(options.get('cache_dir') or default_cache_dir())
+    with timings.phase('git'):
+        if not options.get('roots'):
+            # Files listed from a commit are dated by that commit's history.
+            ref = options.get('from_git')
+            return commit_times(codebase_path, cache_dir, ref if ref != INDEX_REF else None)
+        # Every root may be a repository of its own.
+        return {
+            f"{root['label']}/{rel_path}": commit_time
+            for root in options['roots']
+            for rel_path, commit_time in commit_times(Path(root['path']), cache_dir).items()
+        }
+
+
+def select_relevant(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    entries: List[FileEntry],
+    files: List[FileEntry],
+    options: dict,
+    jobs: int,
+    summary: RunSummary,
+    timings: Optional[Timings] = None,
+) -> List[FileEntry]:
+    """
+    Keep the ``top_k`` files most relevant to the prompt text.
+
+    The search index in the cache directory is brought up to date first:
+    new and changed files are tokenized on the worker threads, and files
+    that no longer exist are forgotten.
+
+    Args:
+        codebase_path: Path to the codebase directory
+        prompt_text: Prompt text the files are ranked against
+        entries: All walked files
+        files: Selected files in prompt order
+        options: Dictionary of options from CLI arguments
+        jobs: Number of worker threads tokenizing files
+        summary: RunSummary the ranking is recorded in
+        timings: Optional recorder for per-phase timings
+
+    Returns:
+        The most relevant files (only those matching the prompt), in prompt order
+    """
+    timings = timings or Timings(enabled=False)
+    with timings.phase('search'):
+        index = SearchIndex(Path(options.get('cache_dir') or default_cache_dir()))
+        try:
+            stale = index.stale(files)
+            for entry, terms in zip(stale, ordered_map(document_terms, stale, jobs)):
+                index.store(entry, terms)
+            walked = [entry.path for entry in entries]
+            for root in [root['path'] for root in options.get('roots', ())] or [codebase_path]:
+                index.prune(Path(root), walked)
+            ranked = index.rank(files, prompt_text or "")[:options['top_k']]
+        finally:
+            index.close()
+    timings.count('search_indexed', len(stale))
+    summary.relevance_candidates = len(files)
+    summary.relevant_files = [(entry.rel_path, score) for entry, score in ranked]
+    kept = {entry.path for entry, _ in ranked}
+    return [entry for entry in files if entry.path in kept]
+
+
+def find_duplicates(
+    files: List[FileEntry],
+    options: dict,
+    jobs: int,
+    timings: Optional[Timings] = None,
+) -> DedupPlan:
+    """
+    Find files that repeat (or, with the ``near_dup`` option, nearly repeat) an earlier file.
+
+    Args:
+        files: Selected files in prompt order
+        options: Dictionary of options from CLI arguments
+        jobs: Number of worker threads reading files
+        timings: Optional recorder for per-phase timings
+
+    Returns:
+        DedupPlan mapping each duplicate to the earlier file it refers to
+    """
+    timings = timings or Timings(enabled=False)
+    with timings.phase('dedup'):
+        deduplicator = Deduplicator(files, options.get('near_dup'))
+        for entry, fingerprint in zip(files, ordered_map(deduplicator.fingerprint, files, jobs)):
+            deduplicator.add(entry, fingerprint)
+    return deduplicator.plan
+
+
+def _apply_budget(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    entries: List[FileEntry],
+    files: List[FileEntry],
+    renderer: _Renderer,
+    jobs: int,
+    summary: RunSummary,
+    times: Optional[Dict[str, int]] = None,
+    dedup: Optional[DedupPlan] = None,
+) -> Tuple[List[FileEntry], Dict[str, str]]:
+    """
+    Pack the selected files into the --max-tokens budget.
+
+    Identical copies found by --dedup do not compete for the budget: once
+    the other files are packed, each copy whose original made it in is
+    added as a reference while the reference section still fits.
+
+    Returns:
+        The files to render, in their original order, and truncated blocks keyed by path
+
+    Raises:
+        ConfigurationError: If the header, footer and git sections alone exceed the budget
+    """
+    options = renderer.options
+    budget = options['max_tokens']
+    counter = renderer.counter
+    # The tree of every file that may be included is an upper bound on the tree of the packed files.
+    tree_entries = entries if options.get('full_directory_tree') else files
+    fmt = renderer.format
+    overhead = counter.count(fmt.header(
+        str(codebase_path), render_tree(codebase_path.name, [entry.rel_path for entry in tree_entries])
+    ))
+    overhead += counter.count(fmt.footer(prompt_text, bool(renderer.git_records)))
+    # The git diffs and logs are always included, so they come out of the budget first.
+    overhead += sum(counter.count(section) for section in _git_sections(renderer.git_records or (), renderer))
+    if overhead > budget:
+        raise ConfigurationError(
+            f"--max-tokens {budget} is too small: the prompt needs {overhead} tokens without any file "
+            f"(header, source tree, git context and user request)."
+        )
+
+    # Every section but the first is preceded by the format's separator.
+    separator = counter.count(fmt.between_files) if fmt.between_files else 0
+
+    duplicates = dedup.duplicates if dedup is not None else {}
+    candidates = [entry for entry in files if entry.path not in duplicates]
+    ranked = rank_files(candidates, prompt_text, options.get('rank') or 'relevance', times)
+    counts = dict(zip(
+        [entry.path for entry in ranked],
+        ordered_map(renderer.entry_tokens, ranked, jobs),
+    ))
+    summary.skipped_files.extend(
+        (entry.rel_path, SKIPPED_BINARY) for entry in candidates if counts[entry.path] is None
+    )
+
+    def truncate(entry: FileEntry, limit: int) -> Optional[Tuple[str, int]]:
+        truncated = renderer.truncated_block(entry, limit - separator)
+        return (truncated[0], truncated[1] + separator) if truncated is not None else None
+
+    plan = pack_files(
+        ranked,
+        budget - overhead,
+        lambda entry: counts[entry.path] + separator if counts[entry.path] is not None else None,
+        truncate,
+    )
+    used = overhead + plan.used_tokens
+    for entry in files:
+        original = duplicates.get(entry.path)
+        if original is None:
+            continue
+        if counts[original.path] is None:
+            summary.skipped_files.append((entry.rel_path, SKIPPED_BINARY))
+            continue
+        if original.path not in plan.included:
+            continue
+        ref = DuplicateRef(renderer.display_path(original))
+        tokens = counter.count(renderer.duplicate_section(entry, ref)) + separator
+        if used + tokens > budget:
+            plan.dropped.append(entry.rel_path)
+            continue
+        plan.included.add(entry.path)
+        used += tokens
+
+    summary.token_budget = budget
+    summary.used_tokens = used
+    summary.approximate_tokens = not counter.exact
+    summary.truncated_files = [entry.rel_path for entry in files if entry.path in plan.truncated]
+    summary.dropped_files = plan.dropped
+    return [entry for entry in files if entry.path in plan.included], plan.truncated
+
+
+def _incremental_sections(
+    codebase_path: Path,
+    renderer: _Renderer,
+    jobs: int,
+    summary: RunSummary,
+) -> Tuple[List[str], List[Tuple[str, Optional[str]]]]:
+    """
+    Render only the files git reports as changed since the saved state, and splice them in.
+
+    Falls back to rendering everything when there is no reusable state, or
+    when ignore rules changed: git does not report the files they newly
+    include or exclude.
+
+    Returns:
+        All walkable paths (for the full tree) and the (rel_path, block) sections in walk order
+    """
+    options = renderer.options
+    state_file = Path(options['state_file'])
+    repo = open_repo(codebase_path)
+    repo_root = Path(repo.working_tree_dir).resolve()
+    key = options_key(options)
+    ignore_stamp = ignore_rules_stamp(codebase_path)
+
+    state = load_state(state_file)
+    changed = None
+    if (
+        state is not None and state.root == str(codebase_path) and state.options_key == key
+        and state.ignore_stamp == ignore_stamp
+    ):
+        try:
+            with renderer.timings.phase('git'):
+                changed = changed_paths(repo, state.commit) | set(state.dirty)
+        except GitError:
+            changed = None
+    if changed is not None and any(Path(repo_path).name == IGNORE_FILE for repo_path in changed):
+        changed = None
+
+    if changed is None:
+        matcher = build_matcher(options)
+        entries = _walk(codebase_path, options, matcher, renderer.state, renderer.timings)
+        with renderer.timings.phase('select'):
+            files = limit_sizes(select_files(entries, options, matcher), options, summary)
+        tree_paths = {entry.rel_path for entry in entries}
+        blocks = dict(zip([entry.rel_path for entry in files], ordered_map(renderer.block, files, jobs)))
+    else:
+        summary.incremental_base = state.commit
+        summary.incremental_changed = len(changed)
+        # git reports paths relative to the repository root, which may be above the codebase.
+        changed_here = set()
+        for repo_path in changed:
+            try:
+                changed_here.add((repo_root / repo_path).relative_to(codebase_path).as_posix())
+            except ValueError:
+                continue
+        tree_paths = set(state.tree_paths) - changed_here
+        blocks = {rel_path: block for rel_path, block in state.blocks.items() if rel_path not in changed_here}
+        fresh = stat_entries(
+            codebase_path,
+            sorted(changed_here),
+            hidden=options.get('hidden', False),
+            no_ignore=options.get('no_ignore', False),
+        )
+        tree_paths.update(entry.rel_path for entry in fresh)
+        files = limit_sizes(select_files(fresh, options), options, summary)
+        blocks.update(zip([entry.rel_path for entry in files], ordered_map(renderer.block, files, jobs)))
+
+    commit = head_commit(repo)
+    save_state(state_file, PromptState(
+        root=str(codebase_path),
+        options_key=key,
+        commit=commit,
+        dirty=sorted(changed_paths(repo, commit)),
+        tree_paths=sorted(tree_paths, key=walk_order_key),
+        blocks=blocks,
+        ignore_stamp=ignore_stamp,
+    ))
+    sections = [(rel_path, blocks[rel_path]) for rel_path in sorted(blocks, key=walk_order_key)]
+    return sorted(tree_paths, key=walk_order_key), sections
+
+
+def _iter_files(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    renderer: _Renderer,
+    jobs: int,
+    summary: RunSummary,
+) -> Iterator[str]:
+    """Walk the codebase and yield the header and every selected file section."""
+    options = renderer.options
+    timings = renderer.timings
+    entries, files = collect_files(codebase_path, options, renderer.state, timings, renderer.tree)
+    times = load_commit_times(codebase_path, options, timings)
+    with timings.phase('select'):
+        files = limit_sizes(sort_files(files, options.get('sort_order'), times), options, summary)
+    if options.get('top_k'):
+        files = select_relevant(codebase_path, prompt_text, entries, files, options, jobs, summary, timings)
+    dedup = find_duplicates(files, options, jobs, timings) if options.get('dedup') else None
+    truncated = {}
+    if options.get('max_tokens'):
+        with timings.phase('budget'):
+            packed, truncated = _apply_budget(
+                codebase_path, prompt_text, entries, files, renderer, jobs, summary, times, dedup
+            )
+        included = {entry.path for entry in packed}
+        if dedup is not None:
+            dedup.retain(included, included - truncated.keys())
+        files = [entry for entry in files if entry.path in included]
+
+    tree_entries = entries if options.get('full_directory_tree') else files
+    tree = render_tree(codebase_path.name, [entry.rel_path for entry in tree_entries])
+
+    def block(entry: FileEntry) -> Tuple[Union[str, FileBody, DuplicateRef, None], int]:
+        # Token counting runs here, on the worker threads, rather than in the consumer.
+        if entry.path in truncated:
+            text = truncated[entry.path]
+            return text, renderer.section_tokens(entry, text) if renderer.count_tokens else 0
+        ref = renderer.duplicate_ref(entry, dedup) if dedup is not None else None
+        if ref is not None:
+            if not renderer.count_tokens:
+                return ref, 0
+            with timings.phase('tokens'):
+                return ref, renderer.counter.count(renderer.duplicate_section(entry, ref))
+        if renderer.passes_through(entry):
+            return renderer.body(entry), 0
+        if renderer.count_tokens:
+            return renderer.counted_block(entry)
+        return renderer.block(entry), 0
+
+    def sections() -> Iterator[Tuple[FileEntry, Union[str, FileBody, DuplicateRef]]]:
+        for entry, (rendered, tokens) in zip(files, ordered_map(block, files, jobs)):
+            if rendered is None:
+                summary.skipped_files.append((entry.rel_path, SKIPPED_BINARY))
+                continue
+            summary.included_files += 1
+            if isinstance(rendered, DuplicateRef):
+                if rendered.diff is None:
+                    summary.duplicate_files.append((entry.rel_path, dedup.duplicates[entry.path].rel_path))
+                else:
+                    base, _ = dedup.near[entry.path]
+                    summary.near_duplicate_files.append((entry.rel_path, base.rel_path, rendered.similarity))
+            if renderer.count_tokens:
+                summary.file_tokens.append((entry.rel_path, tokens))
+                if renderer.template is None:
+                    _add_tokens(summary, tokens)
+            yield entry, rendered
+
+    if renderer.template is not None:
+        yield from _iter_template(
+            codebase_path, tree, prompt_text,
+            (
+                (
+                    renderer.display_path(entry),
+                    entry.extension,
+                    renderer.duplicate_block(rendered) if isinstance(rendered, DuplicateRef) else rendered,
+                )
+                for entry, rendered in sections()
+            ),
+            renderer, summary,
+        )
+        return
+
+    fmt = renderer.format
+    header = fmt.header(str(codebase_path), tree)
+    if renderer.count_tokens:
+        _add_tokens(summary, renderer.counter.count(header))
+    yield header
+    for index, (entry, rendered) in enumerate(sections()):
+        if index and fmt.between_files:
+            if renderer.count_tokens:
+                _add_tokens(summary, renderer.counter.count(fmt.between_files))
+            yield fmt.between_files
+        if isinstance(rendered, FileBody):
+            prefix, suffix = block_affixes(entry.extension, renderer.code_blocks)
+            yield render_file_entry(renderer.display_path(entry), prefix)
+            yield rendered
+            yield suffix
+        elif isinstance(rendered, DuplicateRef):
+            yield renderer.duplicate_section(entry, rendered)
+        else:
+            yield fmt.file(renderer.display_path(entry), entry.extension, rendered)
+
+
+def _iter_incremental(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    renderer: _Renderer,
+    jobs: int,
+    summary: RunSummary,
+) -> Iterator[str]:
+    """Yield the header and file sections of an incrementally regenerated prompt."""
+    options = renderer.options
+    all_paths, sections = _incremental_sections(codebase_path, renderer, jobs, summary)
+    tree_paths = all_paths if options.get('full_directory_tree') else [rel_path for rel_path, _ in sections]
+    tree = render_tree(codebase_path.name, tree_paths)
+
+    def included() -> Iterator[Tuple[str, str, str]]:
+        for rel_path, rendered in sections:
+            if rendered is None:
+                summary.skipped_files.append((rel_path, SKIPPED_BINARY))
+                continue
+            summary.included_files += 1
+            display_path = str(codebase_path / rel_path) if options.get('absolute_paths') else rel_path
+            yield rel_path, display_path, rendered
+
+    if renderer.template is not None:
+        files = (
+            (display_path, Path(rel_path).suffix.lstrip('.'), rendered)
+            for rel_path, display_path, rendered in included()
+        )
+        yield from _iter_template(codebase_path, tree, prompt_text, files, renderer, summary)
+        return
+
+    fmt = renderer.format
+    header = fmt.header(str(codebase_path), tree)
+    if renderer.count_tokens:
+        _add_tokens(summary, renderer.counter.count(header))
+    yield header
+    for index, (rel_path, display_path, rendered) in enumerate(included()):
+        if index and fmt.between_files:
+            if renderer.count_tokens:
+                _add_tokens(summary, renderer.counter.count(fmt.between_files))
+            yield fmt.between_files
+        section = fmt.file(display_path, Path(rel_path).suffix.lstrip('.'), rendered)
+        if renderer.count_tokens:
+            tokens = renderer.counter.count(section)
+            summary.file_tokens.append((rel_path, tokens))
+            _add_tokens(summary, tokens)
+        yield section
+
+
+def _iter_template(
+    codebase_path: Path,
+    tree: str,
+    prompt_text: Optional[str],
+    files: Iterator[Tuple[str, str, str]],
+    renderer: _Renderer,
+    summary: RunSummary,
+) -> Iterator[str]:
+    """
+    Render the prompt through the custom template, pulling file blocks as the template reaches them.
+
+    Args:
+        codebase_path: Path to the codebase directory
+        tree: Rendered source tree
+        prompt_text: Optional user prompt text
+        files: (display path, extension, block) of each included file, in prompt order
+        renderer: Renderer holding the compiled template
+        summary: RunSummary that token counts are added to
+    """
+    from .templates import LazyFiles, TemplateFile, build_context
+
+    lazy_files = LazyFiles((TemplateFile(path, extension, code) for path, extension, code in files))
+    git = template_variables(renderer.git_records or ())
+    for chunk in renderer.template.generate(build_context(str(codebase_path), tree, prompt_text, lazy_files, git)):
+        if renderer.count_tokens:
+            _add_tokens(summary, renderer.counter.count(chunk))
+        yield chunk
+
+
+def _git_sections(
+    records: Iterable[GitRecord],
+    renderer: _Renderer,
+    summary: Optional[RunSummary] = None,
+) -> Iterator[str]:
+    """
+    Serialize git records in the output format, one file diff at a time.
+
+    Args:
+        records: Records produced by gitcontext.iter_git_context()
+        renderer: Renderer holding the output format
+        summary: Optional RunSummary the diffed files and left-out lines and commits are recorded in
+
+    Yields:
+        Each record with the separator or heading before it, starting with the format's ``git_begin``
+    """
+    fmt = renderer.format
+    title = None
+    for index, record in enumerate(records):
+        parts = [fmt.between_files if index else fmt.git_begin]
+        if record.title != title:
+            title = record.title
+            parts.append(fmt.git_heading(title))
+        parts.append(fmt.git(record, renderer.git_block(record)))
+        if summary is not None:
+            if record.kind == 'diff':
+                summary.diff_files.append(record.path)
+                if record.omitted:
+                    summary.truncated_diffs.append(record.path)
+            else:
+                summary.omitted_commits += record.omitted
+        yield "".join(parts)
+
+
+def _add_tokens(summary: RunSummary, tokens: int) -> None:
+    summary.prompt_tokens = (summary.prompt_tokens or 0) + tokens
+
+
+def iter_prompt(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    options: dict,
+    summary: Optional[RunSummary] = None,
+    state: Optional[PipelineState] = None,
+    timings: Optional[Timings] = None,
+    passthrough: bool = False,
+) -> Iterator[Union[str, FileBody]]:
+    """
+    Generate a prompt with the built-in pipeline, one piece at a time.
+
+    The header (project path and source tree), each file section and the user
+    request footer are yielded separately, and files are read only as their
+    section is requested, so memory use does not grow with the codebase size.
+    The ``output_format`` option selects how the parts are serialized (see
+    formats.py); structured formats stream one record per file the same way.
+    When the ``token_count_format`` option is set, the tokens of the header,
+    each file section and the footer are counted as they are produced (on the
+    worker threads for file sections) into ``summary``. The git diffs and logs
+    asked for by the options follow the files, streamed one file diff at a
+    time; they are read up front only when the token budget must account for
+    them or a custom template takes them as variables.
+
+    Args:
+        codebase_path: Path to the codebase directory
+        prompt_text: Optional user prompt text
+        options: Dictionary of options from CLI arguments
+        summary: Optional RunSummary filled in as the prompt is generated
+        state: Optional resources shared with other runs; its cache replaces the one from the options
+        timings: Optional recorder for per-phase timings
+        passthrough: Yield large files that need no transformation as FileBody
+            placeholders, to be copied to the output with ingest.copy_body()
+
+    Yields:
+        Consecutive chunks of the prompt (strings, plus FileBody objects with passthrough)
+    """
+    if summary is None:
+        summary = RunSummary()
+    cache = None
+    if state is not None:
+        cache = state.cache
+    elif options.get('cache_dir'):
+        cache = FileCache(Path(options['cache_dir']), options['cache_max_bytes'])
+
+    timings = timings or Timings(enabled=False)
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    renderer = None
+    git_records = None
+    try:
+        renderer = _Renderer(options, cache, state, timings)
+        if options.get('from_git'):
+            with timings.phase('git'):
+                renderer.tree = GitTree(codebase_path, options['from_git'])
+        if options.get('template_path'):
+            # Jinja2 is only imported when a custom template is used.
+            from .templates import load_template
+            cache_dir = Path(options.get('cache_dir') or default_cache_dir()) / 'templates'
+            renderer.template = load_template(options['template_path'], cache_dir)
+        if has_git_context(options):
+            git_records = iter_git_context(
+                codebase_path, options, Path(options.get('cache_dir') or default_cache_dir())
+            )
+            if options.get('max_tokens') or renderer.template is not None:
+                with timings.phase('git'):
+                    renderer.git_records = git_records = list(git_records)
+        # Counting a section's tokens needs its text, which pass-through never loads,
+        # templates receive file blocks as strings and structured formats escape them.
+        renderer.passthrough = (
+            passthrough and not renderer.count_tokens and renderer.template is None
+            and not renderer.format.structured
+        )
+        if renderer.count_tokens:
+            summary.approximate_tokens = not renderer.counter.exact
+        jobs = options.get('jobs') or 1
+
+        if options.get('state_file'):
+            yield from _iter_incremental(codebase_path, prompt_text, renderer, jobs, summary)
+        else:
+            yield from _iter_files(codebase_path, prompt_text, renderer, jobs, summary)
+    finally:
+        if renderer is not None and renderer.tree is not None:
+            renderer.tree.close()
+        if cache is not None:
+            timings.count('cache_hits', cache.hits - hits)
+            timings.count('cache_misses', cache.misses - misses)
+            if state is None:
+                cache.close()
+
+    has_git_sections = False
+    if git_records is not None and renderer.template is None:
+        sections = _git_sections(git_records, renderer, summary)
+        while True:
+            with timings.phase('git'):
+                section = next(sections, None)
+            if section is None:
+                break
+            has_git_sections = True
+            if renderer.count_tokens:
+                _add_tokens(summary, renderer.counter.count(section))
+            yield section
+
+    if renderer.template is None:
+        footer = renderer.format.footer(prompt_text, has_git_sections)
+    elif prompt_text and not renderer.template.uses_user_request:
+        # A template that places {{user_request}} itself replaces the default footer.
+        footer = format_user_request(prompt_text)
+    else:
+        footer = ""
+    if footer:
+        if renderer.count_tokens:
+            _add_tokens(summary, renderer.counter.count(footer))
+        yield footer
+
+
+def generate_prompt(
+    codebase_path: Path,
+    prompt_text: Optional[str],
+    options: dict,
+    summary: Optional[RunSummary] = None,
+    state: Optional[PipelineState] = None,
+    timings: Optional[Timings] = None,
+) -> str:
+    """
+    Generate a prompt with the built-in pipeline.
+
+    Args:
+        codebase_path: Path to the codebase directory
+        prompt_text: Optional user prompt text
+        options: Dictionary of options from CLI arguments
+        summary: Optional RunSummary filled in as the prompt is generated
+        state: Optional resources shared with other runs
+        timings: Optional recorder for per-phase timings
+
+    Returns:
+        Generated prompt string
+    """
+    return "".join(iter_prompt(codebase_path, prompt_text, options, summary, state, timings))
@@ -0,0 +1,172 @@
+"""
+Rendering helpers for the built-in prompt pipeline.
+
+These functions reproduce the default markdown layout produced by
+code2prompt-rs (project path, source tree, one block per file) so prompts
+generated by the CLI's own pipeline look the same as the library's.
+"""
+
+import codecs
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Leading bytes inspected to decide whether a file is binary.
+SNIFF_BYTES = 8192
+
+# Signatures of binary formats whose first block may contain no NUL byte and
+# still decode as UTF-8 (or that are cheaper to recognize than to decode).
+BINARY_SIGNATURES = (
+    b"%PDF-",
+    b"!<arch>\n",
+    b"\x89PNG",
+    b"GIF87a",
+    b"GIF89a",
+    b"\xff\xd8\xff",
+    b"PK\x03\x04",
+    b"\x1f\x8b",
+    b"\x7fELF",
+    b"\xfd7zXZ\x00",
+    b"\x28\xb5\x2f\xfd",
+    b"SQLite format 3\x00",
+    b"\x00asm",
+)
+
+
+def format_user_request(prompt_text: str) -> str:
+    """
+    Build the "User Request" footer appended after the codebase context.
+
+    Args:
+        prompt_text: The user prompt text
+
+    Returns:
+        Footer string, starting with the blank lines that separate it from the context
+    """
+    return (
+        f"\n\n## User Request\n{prompt_text}\n\n## Instructions for LLM\n"
+        "Please analyze the codebase context above and respond to the user request.\n"
+        "If you need additional context or clarification, please ask the user."
+    )
+
+
+def render_file_block(text: str, extension: str, line_numbers: bool, code_blocks: bool) -> str:
+    """
+    Render the body of a single file.
+
+    Args:
+        text: Decoded file contents
+        extension: File extension without the dot, used as code fence language
+        line_numbers: Whether to prefix each line with its number
+        code_blocks: Whether to wrap the body in a markdown code fence
+
+    Returns:
+        Rendered file body
+    """
+    if line_numbers:
+        text = "\n".join(f"{number:4} | {line}" for number, line in enumerate(text.splitlines(), 1))
+    prefix, suffix = block_affixes(extension, code_blocks)
+    return f"{prefix}{text}{suffix}"
+
+
+def block_affixes(extension: str, code_blocks: bool) -> Tuple[str, str]:
+    """Return the text placed before and after a file body (the code fence, if any)."""
+    if code_blocks:
+        return f"```{extension}\n", "\n```"
+    return "", ""
+
+
+def render_duplicate_block(original: str, diff: Optional[str], similarity: float, code_blocks: bool) -> str:
+    """
+    Render the body that replaces a duplicate file's contents.
+
+    Args:
+        original: Display path of the earlier file with the same (or similar) contents
+        diff: Unified diff from the earlier file, or None for identical contents
+        similarity: Estimated similarity to the earlier file
+        code_blocks: Whether to wrap the diff in a markdown code fence
+
+    Returns:
+        Rendered file body
+    """
+    if diff is None:
+        return f"Identical to `{original}`."
+    prefix, suffix = block_affixes("diff", code_blocks)
+    return f"Near-duplicate of `{original}` ({similarity:.0%} similar); differences:\n\n{prefix}{diff}{suffix}"
+
+
+def render_file_entry(display_path: str, block: str) -> str:
+    """Render one file section of the prompt, including the blank lines that separate it from the previous one."""
+    return f"\n\n`{display_path}`:\n\n{block}"
+
+
+def render_header(codebase_path: str, tree: str) -> str:
+    """Render the prompt header: project path and source tree."""
+    return f"Project Path: {codebase_path}\n\nSource Tree:\n\n```txt\n{tree}\n```"
+
+
+def render_tree(root_name: str, rel_paths: Iterable[str]) -> str:
+    """
+    Render a directory tree in the same box-drawing style as code2prompt.
+
+    Args:
+        root_name: Label of the tree root (usually the codebase directory name)
+        rel_paths: POSIX-style paths relative to the root
+
+    Returns:
+        Multi-line tree string
+    """
+    tree: Dict[str, dict] = {}
+    for rel_path in rel_paths:
+        node = tree
+        for part in rel_path.split("/"):
+            node = node.setdefault(part, {})
+
+    lines: List[str] = [root_name]
+
+    def walk(node: Dict[str, dict], prefix: str) -> None:
+        names = sorted(node)
+        for index, name in enumerate(names):
+            last = index == len(names) - 1
+            lines.append(f"{prefix}{'└── ' if last else '├── '}{name}")
+            if node[name]:
+                walk(node[name], prefix + ("    " if last else "│   "))
+
+    walk(tree, "")
+    return "\n".join(lines)
+
+
+def decode_text(data: bytes) -> Optional[str]:
+    """
+    Decode file contents, rejecting binary data.
+
+    Args:
+        data: Raw file bytes
+
+    Returns:
+        Decoded text, or None if the data looks binary or is not valid UTF-8
+    """
+    if looks_binary(data[:SNIFF_BYTES]):
+        return None
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def looks_binary(head: bytes) -> bool:
+    """
+    Decide from the first block of a file whether it is binary.
+
+    Args:
+        head: Leading bytes of the file, at most SNIFF_BYTES long
+
+    Returns:
+        True if the block starts with a known binary signature, contains a
+        NUL byte, or is not valid UTF-8 (a sequence cut off at the end is allowed)
+    """
+    if head.startswith(BINARY_SIGNATURES) or b"\0" in head:
+        return True
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+    except UnicodeDecodeError:
+        return True
+    return False
@@ -0,0 +1,92 @@
+"""
+Several codebase roots merged into one prompt.
+
+When ``--path`` is given more than once, the prompt covers every root as
+if they were subdirectories of their closest common ancestor: each root is
+labelled with its path relative to that ancestor (``services/auth``), and
+its files appear in the prompt and the source tree under that label. Each
+root is walked with its own ``.gitignore`` rules, so separate git
+repositories keep their own ignores.
+
+Include and exclude patterns apply to every root, except patterns written
+as ``LABEL:PATTERN``, which apply to the root with that label only and are
+matched against paths relative to it.
+"""
+
+import os
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from .errors import ConfigurationError
+from .walker import FileEntry
+
+# Separates a root label from a pattern that applies to that root only.
+ROOT_PATTERN_SEPARATOR = ":"
+
+
+def plan_roots(
+    paths: Sequence[Path],
+    include: Sequence[str],
+    exclude: Sequence[str],
+) -> Tuple[Path, List[dict], List[str], List[str]]:
+    """
+    Label the roots of a multi-root prompt and split out their own patterns.
+
+    Args:
+        paths: Resolved root directories, in prompt order
+        include: Include patterns, some possibly written as ``LABEL:PATTERN``
+        exclude: Exclude patterns, some possibly written as ``LABEL:PATTERN``
+
+    Returns:
+        The common ancestor of the roots, one ``roots`` option entry per root
+        (path, label, include_patterns, exclude_patterns), and the include and
+        exclude patterns that apply to every root
+
+    Raises:
+        ConfigurationError: If a root is given twice or lies inside another root
+    """
+    for index, path in enumerate(paths):
+        for other in paths[index + 1:]:
+            if path == other:
+                raise ConfigurationError(f"path '{path}' is given more than once")
+            if path in other.parents or other in path.parents:
+                raise ConfigurationError(f"paths '{path}' and '{other}' overlap; one lies inside the other")
+
+    common = Path(os.path.commonpath([str(path) for path in paths]))
+    roots = [
+        {
+            'path': str(path),
+            'label': path.relative_to(common).as_posix(),
+            'include_patterns': [],
+            'exclude_patterns': [],
+        }
+        for path in paths
+    ]
+    by_label = {root['label']: root for root in roots}
+
+    def split(patterns: Sequence[str], key: str) -> List[str]:
+        shared = []
+        for pattern in patterns:
+            label, separator, rest = pattern.partition(ROOT_PATTERN_SEPARATOR)
+            if separator and label in by_label:
+                by_label[label][key].append(rest)
+            else:
+                shared.append(pattern)
+        return shared
+
+    return common, roots, split(include, 'include_patterns'), split(exclude, 'exclude_patterns')
+
+
+def root_options(options: dict, root: dict) -> dict:
+    """Return the options one root is walked and selected with: the shared patterns plus its own."""
+    return {
+        **options,
+        'include_patterns': list(options.get('include_patterns', [])) + root['include_patterns'],
+        'exclude_patterns': list(options.get('exclude_patterns', [])) + root['exclude_patterns'],
+    }
+
+
+def relabel(entries: List[FileEntry], label: str) -> List[FileEntry]:
+    """Move a root's entries under its label, so their paths are relative to the common ancestor."""
+    prefix = label + "/"
+    return [FileEntry(entry.path, prefix + entry.rel_path, entry.size, entry.mtime_ns) for entry in entries]
@@ -0,0 +1,256 @@
+"""
+Persistent full-text index for relevance-ranked file selection (``--top-k``).
+
+Every candidate file is tokenized into terms: identifiers (also split at
+camelCase and snake_case boundaries), with extra weight for names that
+follow definition keywords (``def``, ``class``, ``func``, ...) and for the
+components of the file's path. Term frequencies are stored in a SQLite
+inverted index next to each file's size and mtime, so later runs only
+re-read files that changed. The prompt text is tokenized the same way and
+files are scored with BM25 against the current candidates.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ingest import read_entry
+from .render import SNIFF_BYTES, looks_binary
+from .walker import FileEntry
+
+# Only the beginning of very large files is indexed.
+INDEX_BYTES = 1024 * 1024
+
+# Extra term frequency for a path component and for a defined symbol name.
+PATH_WEIGHT = 3.0
+SYMBOL_WEIGHT = 2.0
+
+# BM25 parameters.
+_K1 = 1.2
+_B = 0.75
+
+# Files modified this recently may change again within the same mtime tick.
+_RACY_WINDOW_NS = 2_000_000_000
+
+# Paths per query when looking up many files.
+_BATCH = 500
+
+# Files stored per write transaction.
+_COMMIT_BATCH = 200
+
+_IDENTIFIER = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+_SUBWORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+_DEFINITION = re.compile(
+    r"\b(?:def|class|function|func|fn|struct|interface|trait|enum|type|module|macro|const|let|var)\s+"
+    r"([A-Za-z_][A-Za-z0-9_]*)"
+)
+
+# Words too common in prompts and code to say anything about relevance.
+_STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from has have how i if in into is it its me my no not
+of on or our please so that the their then there these this to use was we what when where which who
+why will with you your explain code file files function show tell about all any also should would
+""".split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    length REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    path TEXT NOT NULL,
+    tf REAL NOT NULL,
+    PRIMARY KEY (term, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_path ON postings (path);
+"""
+
+
+def split_terms(text: str) -> Iterable[str]:
+    """
+    Yield the lowercase terms of a text: each identifier, plus its camelCase/snake_case parts.
+
+    Args:
+        text: Source code, a path or a prompt
+
+    Yields:
+        Terms of at least two characters, stopwords excluded
+    """
+    for identifier in _IDENTIFIER.findall(text):
+        whole = identifier.lower()
+        if len(whole) >= 2 and whole not in _STOPWORDS:
+            yield whole
+        parts = _SUBWORD.findall(identifier)
+        if len(parts) > 1:
+            for part in parts:
+                part = part.lower()
+                if len(part) >= 2 and part != whole and part not in _STOPWORDS:
+                    yield part
+
+
+def document_terms(entry: FileEntry) -> Counter:
+    """
+    Compute the weighted term frequencies of a file; runs on worker threads.
+
+    Args:
+        entry: The file
+
+    Returns:
+        Term frequencies (path terms only for binary files)
+    """
+    terms: Counter = Counter()
+    for term in split_terms(entry.rel_path):
+        terms[term] += PATH_WEIGHT
+    if entry.size <= INDEX_BYTES:
+        text = read_entry(entry)
+    elif entry.blob is not None:
+        text = _decode_head(entry.tree.read(entry.blob)[:INDEX_BYTES])
+    else:
+        text = _read_head(entry.path)
+    if text:
+        terms.update(split_terms(text))
+        for name in _DEFINITION.findall(text):
+            for term in split_terms(name):
+                terms[term] += SYMBOL_WEIGHT
+    return terms
+
+
+def _read_head(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        return _decode_head(f.read(INDEX_BYTES))
+
+
+def _decode_head(data: bytes) -> Optional[str]:
+    if looks_binary(data[:SNIFF_BYTES]):
+        return None
+    # The cut may split a character; the index does not need it.
+    return data.decode("utf-8", errors="ignore")
+
+
+class SearchIndex:
+    """
+    SQLite-backed inverted index of file terms.
+
+    Args:
+        cache_dir: Directory holding the index database
+    """
+
+    def __init__(self, cache_dir: Path):
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(cache_dir / "search_index.sqlite3", timeout=30)
+        self._db.executescript(_SCHEMA)
+        # Files stored since the last commit. Committing every _COMMIT_BATCH files keeps
+        # the write lock short, so concurrent runs sharing the index do not time out.
+        self._pending = 0
+
+    def stale(self, files: List[FileEntry]) -> List[FileEntry]:
+        """Return the files that are not indexed or changed since they were indexed."""
+        indexed = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self._select_docs("path, size, mtime_ns", [entry.path for entry in files])
+        }
+        now = time.time_ns()
+        return [
+            entry for entry in files
+            if indexed.get(entry.path) != (entry.size, entry.mtime_ns) or now - entry.mtime_ns < _RACY_WINDOW_NS
+        ]
+
+    def store(self, entry: FileEntry, terms: Counter) -> None:
+        """Replace the indexed terms of a file; committed with the rest of its batch."""
+        self._db.execute("DELETE FROM postings WHERE path = ?", (entry.path,))
+        self._db.executemany(
+            "INSERT INTO postings (term, path, tf) VALUES (?, ?, ?)",
+            [(term, entry.path, tf) for term, tf in terms.items()],
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO docs (path, size, mtime_ns, length) VALUES (?, ?, ?, ?)",
+            (entry.path, entry.size, entry.mtime_ns, sum(terms.values())),
+        )
+        self._pending += 1
+        if self._pending >= _COMMIT_BATCH:
+            self.commit()
+
+    def prune(self, root: Path, walked: Iterable[str]) -> None:
+        """
+        Forget files under a root that no longer exist.
+
+        Args:
+            root: Codebase root
+            walked: Paths found by the walk; only other indexed paths are checked on disk
+        """
+        prefix = os.path.join(str(root), "")
+        walked = set(walked)
+        gone = [
+            (path,) for path, in self._db.execute(
+                "SELECT path FROM docs WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+            ).fetchall()
+            if path not in walked and not os.path.exists(path)
+        ]
+        self._db.executemany("DELETE FROM postings WHERE path = ?", gone)
+        self._db.executemany("DELETE FROM docs WHERE path = ?", gone)
+        self.commit()
+
+    def rank(self, files: List[FileEntry], query: str) -> List[Tuple[FileEntry, float]]:
+        """
+        Score files against a query with BM25.
+
+        Document frequencies and lengths are taken over ``files`` only, so
+        scores reflect the current selection rather than everything indexed.
+
+        Args:
+            files: Candidate files, all indexed
+            query: Prompt text
+
+        Returns:
+            (file, score) for files matching at least one query term, best first
+        """
+        terms = sorted(set(split_terms(query)))
+        if not files or not terms:
+            return []
+        by_path = {entry.path: entry for entry in files}
+        lengths: Dict[str, float] = dict(self._select_docs("path, length", list(by_path)))
+        average = (sum(lengths.values()) / len(lengths)) if lengths else 0.0
+
+        postings: Dict[str, List[Tuple[str, float]]] = {}
+        for term, path, tf in self._db.execute(
+            f"SELECT term, path, tf FROM postings WHERE term IN ({','.join('?' * len(terms))})", terms
+        ):
+            if path in by_path:
+                postings.setdefault(term, []).append((path, tf))
+
+        count = len(files)
+        scores: Dict[str, float] = {}
+        for term, matches in postings.items():
+            idf = math.log(1 + (count - len(matches) + 0.5) / (len(matches) + 0.5))
+            for path, tf in matches:
+                norm = 1 - _B + _B * (lengths.get(path, 0.0) / average if average else 0.0)
+                scores[path] = scores.get(path, 0.0) + idf * tf * (_K1 + 1) / (tf + _K1 * norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], by_path[item[0]].rel_path))
+        return [(by_path[path], score) for path, score in ranked]
+
+    def _select_docs(self, columns: str, paths: List[str]) -> Iterator[tuple]:
+        """Select columns of the docs rows of the given paths, in batches that fit SQLite's parameter limit."""
+        for start in range(0, len(paths), _BATCH):
+            batch = paths[start:start + _BATCH]
+            yield from self._db.execute(
+                f"SELECT {columns} FROM docs WHERE path IN ({','.join('?' * len(batch))})", batch
+            )
+
+    def commit(self) -> None:
+        """Commit the index updates made so far, releasing the write lock."""
+        self._db.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        """Commit index updates and close the database."""
+        self.commit()
+        self._db.close()
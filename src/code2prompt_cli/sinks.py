@@ -0,0 +1,271 @@
+"""
+Output sinks: the destinations a prompt is written to.
+
+A prompt goes to an output file or to stdout, and optionally to the
+clipboard. write_to_sinks() feeds each sink from its own thread through a
+bounded queue, so a slow destination (a terminal receiving a 100 MB prompt,
+a clipboard helper that hangs) does not hold up the others. The clipboard
+copy is also abandoned after a timeout.
+
+Output files are written through a large buffer and compressed according to
+their suffix: ``.gz``, ``.bz2`` and ``.xz`` with the standard library, and
+``.zst`` when the ``zstandard`` package is installed.
+"""
+
+import queue
+import sys
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, TextIO, Union
+
+from .errors import Code2PromptError
+from .ingest import FileBody, copy_body
+from .timings import Timings
+
+# Buffer size for uncompressed output files.
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+# Chunks each sink's queue may hold before the producer waits for it.
+_QUEUE_CHUNKS = 16
+
+# Suffixes of output files that are written compressed.
+COMPRESSION_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+# Queue sentinels: the prompt is complete, or producing it failed.
+_END = object()
+_ABORT = object()
+
+
+class SinkError(Code2PromptError):
+    """Raised when an output destination cannot be opened or written."""
+
+
+def open_output(path: Union[str, Path]) -> TextIO:
+    """
+    Open an output file for writing UTF-8 text, compressing it according to its suffix.
+
+    Args:
+        path: Output file path
+
+    Returns:
+        Writable text stream; closing it finishes the compressed stream
+
+    Raises:
+        SinkError: If the suffix asks for zstandard compression and it is not installed
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == '.gz':
+        import gzip
+        return gzip.open(path, 'wt', encoding='utf-8')
+    if suffix == '.bz2':
+        import bz2
+        return bz2.open(path, 'wt', encoding='utf-8')
+    if suffix == '.xz':
+        import lzma
+        return lzma.open(path, 'wt', encoding='utf-8')
+    if suffix == '.zst':
+        try:
+            import zstandard
+        except ImportError:
+            raise SinkError(f"cannot write {path}: .zst output requires the zstandard package") from None
+        return zstandard.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES)
+
+
+class Sink:
+    """
+    A destination for prompt text.
+
+    Attributes:
+        phase: Timing phase the sink's work is recorded under
+        failed: Set when writing failed or the prompt was not produced completely
+    """
+
+    phase = 'output'
+    failed = False
+
+    def write(self, chunk: str) -> None:
+        """Write a piece of the prompt."""
+        raise NotImplementedError
+
+    def write_body(self, body: FileBody) -> None:
+        """Write a file body yielded by a pass-through prompt."""
+        with open(body.path, encoding='utf-8') as f:
+            self.write(f.read())
+
+    def close(self) -> None:
+        """Finish writing; called once after the last chunk, even when writing failed."""
+
+
+class FileSink(Sink):
+    """
+    Writes to a file, compressed according to its suffix.
+
+    Args:
+        path: Output file path
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self.compressed = Path(path).suffix.lower() in COMPRESSION_SUFFIXES
+        self._out = open_output(path)
+
+    def write(self, chunk: str) -> None:
+        self._out.write(chunk)
+
+    def write_body(self, body: FileBody) -> None:
+        # A compressed stream's fileno() is the underlying file's, so sendfile() would bypass compression.
+        copy_body(body, self._out, sendfile=not self.compressed)
+
+    def close(self) -> None:
+        self._out.close()
+
+
+class StdoutSink(Sink):
+    """
+    Writes to a text stream (stdout by default), ending the prompt with a newline.
+
+    Args:
+        stream: Stream to write to
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self._out = stream if stream is not None else sys.stdout
+
+    def write(self, chunk: str) -> None:
+        self._out.write(chunk)
+
+    def write_body(self, body: FileBody) -> None:
+        copy_body(body, self._out)
+
+    def close(self) -> None:
+        self._out.write('\n')
+        self._out.flush()
+
+
+class ClipboardSink(Sink):
+    """
+    Collects the prompt and copies it to the clipboard when closed.
+
+    Args:
+        timeout: Seconds to wait for the clipboard helper before giving up
+    """
+
+    phase = 'clipboard'
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self._chunks: List[str] = []
+
+    def write(self, chunk: str) -> None:
+        self._chunks.append(chunk)
+
+    def close(self) -> None:
+        """
+        Copy the collected text, unless the prompt is incomplete.
+
+        Raises:
+            SinkError: If the copy fails or does not finish within the timeout
+        """
+        if self.failed:
+            return
+        text = "".join(self._chunks)
+        self._chunks = []
+        errors: List[Exception] = []
+
+        def copy() -> None:
+            try:
+                import pyperclip
+                pyperclip.copy(text)
+            except Exception as e:
+                errors.append(e)
+
+        # pyperclip runs external tools (xclip, wl-copy, ...) that can hang; a
+        # daemon thread lets the process exit even if one never returns.
+        worker = threading.Thread(target=copy, name='clipboard', daemon=True)
+        worker.start()
+        worker.join(self.timeout)
+        if worker.is_alive():
+            raise SinkError(f"clipboard copy timed out after {self.timeout:g} s")
+        if errors:
+            raise SinkError(str(errors[0])) from errors[0]
+
+
+def write_to_sinks(
+    chunks: Iterable[Union[str, FileBody]],
+    sinks: List[Sink],
+    timings: Optional[Timings] = None,
+) -> List[Optional[Exception]]:
+    """
+    Write a prompt to several destinations at once.
+
+    Each sink consumes the chunks on its own thread, so destinations proceed
+    concurrently and independently; a single sink is written inline. A sink
+    that fails stops receiving chunks without affecting the others.
+
+    Args:
+        chunks: Prompt pieces (strings, plus FileBody objects from pass-through prompts)
+        sinks: Destinations
+        timings: Optional recorder; each sink's work is timed under its phase
+
+    Returns:
+        The error of each sink, or None where writing succeeded, in sink order
+
+    Raises:
+        Exception: Whatever producing the chunks raised, after every sink is closed
+    """
+    timings = timings or Timings(enabled=False)
+    errors: List[Optional[Exception]] = [None] * len(sinks)
+
+    def feed(index: int, items: Iterable) -> None:
+        sink = sinks[index]
+        with timings.phase(sink.phase):
+            try:
+                for chunk in items:
+                    if chunk is _ABORT:
+                        sink.failed = True
+                        break
+                    if sink.failed:
+                        continue
+                    try:
+                        if isinstance(chunk, FileBody):
+                            sink.write_body(chunk)
+                        else:
+                            sink.write(chunk)
+                    except Exception as e:
+                        errors[index] = e
+                        sink.failed = True
+            except BaseException:
+                sink.failed = True
+                raise
+            finally:
+                try:
+                    sink.close()
+                except Exception as e:
+                    if errors[index] is None:
+                        errors[index] = e
+
+    if len(sinks) == 1:
+        feed(0, chunks)
+        return errors
+
+    queues = [queue.Queue(maxsize=_QUEUE_CHUNKS) for _ in sinks]
+
+    def drain(index: int) -> None:
+        feed(index, iter(queues[index].get, _END))
+
+    threads = [threading.Thread(target=drain, args=(index,), name=f'sink-{index}') for index in range(len(sinks))]
+    for thread in threads:
+        thread.start()
+    last = _ABORT
+    try:
+        for chunk in chunks:
+            for q in queues:
+                q.put(chunk)
+        last = _END
+    finally:
+        for q in queues:
+            q.put(last)
+        for thread in threads:
+            thread.join()
+    return errors
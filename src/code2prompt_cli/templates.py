@@ -0,0 +1,323 @@
+"""
+Custom prompt templates for the built-in pipeline.
+
+Templates written for code2prompt use Handlebars. They are translated to
+Jinja2 (the subset code2prompt templates need: variables, ``#each``,
+``#if``/``#unless``/``else``, comments and ``~`` whitespace control) and
+compiled once per process. The compiled bytecode is also cached on disk,
+keyed by the hash of the translated source, so later processes skip parsing
+and code generation. Templates ending in ``.j2``, ``.jinja`` or ``.jinja2``
+are used as Jinja2 directly.
+
+Rendering goes through Template.generate() over a lazy ``files`` sequence:
+each file block is rendered when the template first reaches it (and kept for
+templates that loop over the files again), and the prompt is produced piece
+by piece instead of from a fully built context.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import jinja2
+
+from .errors import ConfigurationError
+
+# Suffixes of templates written in Jinja2 rather than Handlebars.
+JINJA_SUFFIXES = ('.j2', '.jinja', '.jinja2')
+
+_COMMENT = re.compile(r"\{\{!--.*?--\}\}|\{\{![^}]*\}\}", re.DOTALL)
+_TAG = re.compile(r"\{\{(~?)(\{?)\s*(.*?)\s*\}?(~?)\}\}", re.DOTALL)
+_PATH = re.compile(r"^(?:@root\.|(?:\.\./)*)?(?:this|@index|@first|@last|@key|[A-Za-z_][\w.]*)$")
+_USER_REQUEST = re.compile(r"\buser_request\b")
+
+_lock = threading.Lock()
+_environments: Dict[Optional[str], jinja2.Environment] = {}
+# (path, size, mtime_ns) -> compiled template, so a template file is read once per process.
+_compiled: Dict[Tuple[str, int, int], "CompiledTemplate"] = {}
+
+
+class TemplateError(ConfigurationError):
+    """Raised when a template cannot be read, translated or compiled."""
+
+
+@dataclass(frozen=True)
+class TemplateFile:
+    """One file as seen by templates: ``{{path}}``, ``{{extension}}`` and ``{{code}}`` (the rendered block)."""
+
+    path: str
+    extension: str
+    code: str
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A compiled template and whether it places the user request itself."""
+
+    template: jinja2.Template
+    uses_user_request: bool
+
+    def generate(self, context: dict) -> Iterator[str]:
+        """Render the template piece by piece."""
+        return self.template.generate(context)
+
+
+class LazyFiles:
+    """
+    Sequence of TemplateFile objects, produced on demand and replayed on later passes.
+
+    ``{{#if files}}`` produces at most one file; the number of files
+    (``files|length``) produces all of them, since files skipped as binary
+    are only known once read.
+
+    Args:
+        files: Iterable producing the included files in prompt order
+    """
+
+    def __init__(self, files: Iterable[TemplateFile]):
+        self._source = iter(files)
+        self._files: List[TemplateFile] = []
+        self._exhausted = False
+
+    def __len__(self) -> int:
+        self._fill(None)
+        return len(self._files)
+
+    def __bool__(self) -> bool:
+        self._fill(1)
+        return bool(self._files)
+
+    def __iter__(self) -> Iterator[TemplateFile]:
+        index = 0
+        while True:
+            self._fill(index + 1)
+            if index >= len(self._files):
+                return
+            yield self._files[index]
+            index += 1
+
+    def _fill(self, count: Optional[int]) -> None:
+        """Produce files until ``count`` are kept, or all of them for None."""
+        while not self._exhausted and (count is None or len(self._files) < count):
+            try:
+                self._files.append(next(self._source))
+            except StopIteration:
+                self._exhausted = True
+
+
+def translate_handlebars(source: str) -> str:
+    """
+    Translate a Handlebars template to Jinja2.
+
+    As in Handlebars, a block tag standing alone on its line removes that
+    whole line from the output.
+
+    Args:
+        source: Handlebars template text
+
+    Returns:
+        Equivalent Jinja2 template text
+
+    Raises:
+        TemplateError: If the template uses helpers or syntax outside the supported subset
+    """
+    source = _COMMENT.sub("", source)
+    # Alternating literal text and (translated tag, is_block) pairs.
+    texts: List[str] = []
+    tags: List[Tuple[str, bool]] = []
+    blocks: List[str] = []
+    position = 0
+    for match in _TAG.finditer(source):
+        texts.append(source[position:match.start()])
+        position = match.end()
+        strip_left, _, body, strip_right = match.groups()
+        left, right = ("-" if strip_left else ""), ("-" if strip_right else "")
+        depth = blocks.count("each")
+        if body.startswith("#"):
+            helper, _, argument = body[1:].partition(" ")
+            argument = argument.strip()
+            if helper not in ("each", "if", "unless") or not argument:
+                raise TemplateError(f"unsupported Handlebars block: {{{{{body}}}}}")
+            expression = _expression(argument, depth)
+            if helper == "each":
+                tag = f"for _item{depth + 1} in {expression}"
+            elif helper == "if":
+                tag = f"if {expression}"
+            else:
+                tag = f"if not {expression}"
+            blocks.append(helper)
+        elif body.startswith("/"):
+            if not blocks or blocks[-1] != body[1:].strip():
+                raise TemplateError(f"unexpected {{{{{body}}}}}")
+            tag = "endfor" if blocks.pop() == "each" else "endif"
+        elif body == "else":
+            if not blocks:
+                raise TemplateError("{{else}} outside a block")
+            tag = "else"
+        else:
+            tags.append((f"{{{{{left} {_expression(body, depth)} {right}}}}}", False))
+            continue
+        tags.append((f"{{%{left} {tag} {right}%}}", True))
+    if blocks:
+        raise TemplateError(f"unclosed {{{{#{blocks[-1]}}}}} block")
+    texts.append(source[position:])
+
+    for index, (_, is_block) in enumerate(tags):
+        before, after = texts[index], texts[index + 1]
+        line_start = before.rfind("\n") + 1
+        line_end = after.find("\n")
+        standalone = (
+            is_block
+            and (line_start > 0 or index == 0) and not before[line_start:].strip()
+            and (line_end >= 0 or index == len(tags) - 1) and not after[:line_end if line_end >= 0 else None].strip()
+        )
+        if standalone:
+            texts[index] = before[:line_start]
+            texts[index + 1] = after[line_end + 1:] if line_end >= 0 else ""
+
+    output = [_escape_text(texts[0])]
+    for (tag, _), text in zip(tags, texts[1:]):
+        output.append(tag)
+        output.append(_escape_text(text))
+    return "".join(output)
+
+
+def _escape_text(text: str) -> str:
+    """Protect literal text that Jinja2 would otherwise read as syntax."""
+    if "{%" in text or "{#" in text or "{{" in text:
+        return "{% raw %}" + text + "{% endraw %}"
+    return text
+
+
+def _expression(path: str, depth: int) -> str:
+    """Translate a Handlebars path to a Jinja2 expression inside ``depth`` nested #each blocks."""
+    if not _PATH.match(path):
+        raise TemplateError(f"unsupported Handlebars expression: {path}")
+    if path.startswith("@root."):
+        return path[len("@root."):]
+    if path in ("@index", "@key"):
+        return "loop.index0"
+    if path in ("@first", "@last"):
+        return "loop." + path[1:]
+    while path.startswith("../"):
+        path = path[3:]
+        depth -= 1
+    if depth <= 0:
+        return path
+    if path == "this":
+        return f"_item{depth}"
+    if path.startswith("this."):
+        path = path[len("this."):]
+    return f"_item{depth}.{path}"
+
+
+class _SourceLoader(jinja2.BaseLoader):
+    """Loads templates registered under the hash of their source."""
+
+    def __init__(self):
+        self.sources: Dict[str, str] = {}
+
+    def get_source(self, environment, template):
+        if template not in self.sources:
+            raise jinja2.TemplateNotFound(template)
+        return self.sources[template], None, lambda: True
+
+
+def _environment(cache_dir: Optional[Path]) -> jinja2.Environment:
+    key = str(cache_dir) if cache_dir else None
+    environment = _environments.get(key)
+    if environment is None:
+        bytecode_cache = None
+        if cache_dir is not None:
+            try:
+                Path(cache_dir).mkdir(parents=True, exist_ok=True)
+                bytecode_cache = jinja2.FileSystemBytecodeCache(str(cache_dir))
+            except OSError:
+                bytecode_cache = None
+        environment = _environments[key] = jinja2.Environment(
+            loader=_SourceLoader(),
+            bytecode_cache=bytecode_cache,
+            autoescape=False,
+            keep_trailing_newline=True,
+        )
+    return environment
+
+
+def load_template(path: str, cache_dir: Optional[Path] = None) -> CompiledTemplate:
+    """
+    Compile a template file, reusing the compiled form while the file is unchanged.
+
+    Args:
+        path: Template file (Handlebars, or Jinja2 for JINJA_SUFFIXES)
+        cache_dir: Directory for the on-disk bytecode cache; None disables it
+
+    Returns:
+        The compiled template
+
+    Raises:
+        TemplateError: If the file cannot be read or compiled
+    """
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise TemplateError(f"cannot read template {path}: {e}") from e
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            return compiled
+        try:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            raise TemplateError(f"cannot read template {path}: {e}") from e
+        if not path.endswith(JINJA_SUFFIXES):
+            source = translate_handlebars(source)
+        environment = _environment(cache_dir)
+        # Named by content, so the bytecode cache entry is keyed by the template's hash.
+        name = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        environment.loader.sources[name] = source
+        try:
+            template = environment.get_template(name)
+        except jinja2.TemplateError as e:
+            raise TemplateError(f"cannot compile template {path}: {e}") from e
+        compiled = _compiled[key] = CompiledTemplate(template, bool(_USER_REQUEST.search(source)))
+        return compiled
+
+
+def build_context(
+    codebase_path: str,
+    source_tree: str,
+    prompt_text: Optional[str],
+    files: LazyFiles,
+    git: Optional[Dict[str, str]] = None,
+) -> dict:
+    """
+    Build the variables available to templates, named as in code2prompt.
+
+    Args:
+        codebase_path: Value of ``absolute_code_path``
+        source_tree: Value of ``source_tree``
+        prompt_text: Value of ``user_request`` (empty when not given)
+        files: Value of ``files``
+        git: Values of ``git_diff``, ``git_diff_branch`` and ``git_log_branch``
+            (see gitcontext.template_variables); empty when not given
+
+    Returns:
+        Template context
+    """
+    git = git or {}
+    return {
+        "absolute_code_path": codebase_path,
+        "source_tree": source_tree,
+        "files": files,
+        "user_request": prompt_text or "",
+        "git_diff": git.get("git_diff", ""),
+        "git_diff_branch": git.get("git_diff_branch", ""),
+        "git_log_branch": git.get("git_log_branch", ""),
+    }
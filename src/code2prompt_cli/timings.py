@@ -0,0 +1,187 @@
+"""
+Per-phase timing instrumentation for ``--timings`` and ``--profile``.
+
+A Timings recorder collects wall-clock spans for the phases of a run (walk,
+selection, file reads, rendering, token counting, output, clipboard),
+per-file costs, and counters such as cache hits. Spans recorded on worker
+threads are kept per thread, so phase totals for per-file work are summed
+over workers and can exceed the run's wall time.
+
+The recorder can be reported as text, as a JSON document, or as a Chrome
+trace-event file (open it in chrome://tracing or Perfetto).
+"""
+
+import heapq
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Number of slowest files listed in reports.
+SLOWEST_FILES = 10
+
+# Phases in the order they are reported; others follow in first-seen order.
+_PHASE_ORDER = (
+    "walk", "select", "search", "dedup", "git", "budget", "read", "render", "cache", "tokens", "generate", "output",
+    "clipboard",
+)
+
+
+class Timings:
+    """
+    Records phase spans, per-file costs and counters for one run.
+
+    Args:
+        enabled: When False, every method is a cheap no-op
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        # (name, category, start seconds, duration seconds, thread id)
+        self.spans: List[Tuple[str, str, float, float, int]] = []
+        # (seconds, rel_path, size)
+        self.files: List[Tuple[float, str, int]] = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def phase(self, name: str):
+        """Context manager timing one occurrence of a phase."""
+        if not self.enabled:
+            return nullcontext()
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter() - start)
+
+    def add(self, name: str, start: float, seconds: float, category: str = "phase") -> None:
+        """Record a span measured by the caller with time.perf_counter()."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.spans.append((name, category, start - self._origin, seconds, threading.get_ident()))
+
+    def add_file(self, rel_path: str, size: int, start: float, seconds: float) -> None:
+        """Record the cost of reading and rendering one file."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.files.append((seconds, rel_path, size))
+            self.counters["files"] = self.counters.get("files", 0) + 1
+            self.counters["bytes"] = self.counters.get("bytes", 0) + size
+            self.spans.append((rel_path, "file", start - self._origin, seconds, threading.get_ident()))
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def wall_time(self) -> float:
+        """Seconds since the recorder was created."""
+        return time.perf_counter() - self._origin
+
+    def slowest_files(self, limit: int = SLOWEST_FILES) -> List[Tuple[float, str, int]]:
+        """The most expensive files as (seconds, rel_path, size), slowest first."""
+        return heapq.nlargest(limit, self.files)
+
+    def phases(self) -> List[str]:
+        """Recorded phase names in report order."""
+        ordered = [name for name in _PHASE_ORDER if name in self.totals]
+        return ordered + [name for name in self.totals if name not in ordered]
+
+    def report(self, limit: int = SLOWEST_FILES) -> dict:
+        """
+        Summarize the run as a JSON-serializable document.
+
+        Args:
+            limit: Number of slowest files to include
+
+        Returns:
+            Wall time, per-phase totals, counters, hit rates and slowest files
+        """
+        return {
+            "wall_seconds": self.wall_time(),
+            "phases": {
+                name: {"seconds": self.totals[name], "calls": self.calls[name]} for name in self.phases()
+            },
+            "counters": dict(self.counters),
+            "hit_rates": {
+                name: rate for name, rate in (
+                    ("cache", _hit_rate(self.counters, "cache")),
+                    ("directory_index", _hit_rate(self.counters, "index")),
+                ) if rate is not None
+            },
+            "slowest_files": [
+                {"path": rel_path, "seconds": seconds, "bytes": size}
+                for seconds, rel_path, size in self.slowest_files(limit)
+            ],
+        }
+
+    def chrome_trace(self) -> dict:
+        """
+        Export the spans in the Chrome trace-event format.
+
+        Returns:
+            A document with complete ("X") events in microseconds
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": seconds * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, category, start, seconds, tid in self.spans
+        ]
+        events.append({"name": "counters", "ph": "C", "ts": 0, "pid": pid, "args": dict(self.counters)})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def format_text(self, limit: int = SLOWEST_FILES) -> List[str]:
+        """
+        Render the report as lines of text.
+
+        Args:
+            limit: Number of slowest files to list
+
+        Returns:
+            Report lines
+        """
+        lines = [f"Timings: {self.wall_time() * 1000:.1f} ms total (per-file phases are summed over workers)"]
+        for name in self.phases():
+            lines.append(f"  {name:<10} {self.totals[name] * 1000:>10.1f} ms  ({self.calls[name]} calls)")
+        files = self.counters.get("files", 0)
+        if files:
+            lines.append(f"  files: {files} rendered, {self.counters.get('bytes', 0) / (1024 * 1024):.2f} MB read")
+        for label, prefix in (("cache", "cache"), ("directory index", "index")):
+            rate = _hit_rate(self.counters, prefix)
+            if rate is not None:
+                hits, misses = self.counters.get(f"{prefix}_hits", 0), self.counters.get(f"{prefix}_misses", 0)
+                lines.append(f"  {label}: {hits} hits, {misses} misses ({rate:.0%} hit rate)")
+        slowest = self.slowest_files(limit)
+        if slowest:
+            lines.append("  slowest files:")
+            for seconds, rel_path, size in slowest:
+                lines.append(f"    {seconds * 1000:>8.2f} ms  {rel_path} ({size} bytes)")
+        return lines
+
+
+def _hit_rate(counters: Dict[str, int], prefix: str) -> Optional[float]:
+    hits = counters.get(f"{prefix}_hits", 0)
+    total = hits + counters.get(f"{prefix}_misses", 0)
+    return hits / total if total else None
@@ -0,0 +1,101 @@
+"""
+Token counting for the built-in prompt pipeline.
+
+Exact counts use tiktoken, installed with the ``tokens`` extra
+(``pip install code2prompt-cli[tokens]``). When an estimate is asked for,
+counts are derived from the UTF-8 byte length, which is close enough for
+budgeting typical source code and costs next to nothing. Without tiktoken
+the estimate is used too, with a warning (once per process).
+"""
+
+import math
+import threading
+import warnings
+from typing import Optional
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Typical BPE tokenizers average roughly four bytes of source code per token.
+APPROX_BYTES_PER_TOKEN = 4
+
+# Short names accepted by code2prompt-rs for --encoding.
+_ENCODING_ALIASES = {
+    "cl100k": "cl100k_base",
+    "o200k": "o200k_base",
+    "p50k": "p50k_base",
+    "p50k_edit": "p50k_edit",
+    "r50k": "r50k_base",
+    "gpt2": "gpt2",
+}
+
+_warn_lock = threading.Lock()
+_warned_missing = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a string from its UTF-8 byte length."""
+    # ASCII text (most source code) has as many bytes as characters; skip the encode.
+    nbytes = len(text) if text.isascii() else len(text.encode("utf-8"))
+    return math.ceil(nbytes / APPROX_BYTES_PER_TOKEN)
+
+
+class TokenCounter:
+    """
+    Counts tokens with tiktoken, falling back to a byte-length estimate.
+
+    Args:
+        encoding: Tokenizer name (code2prompt short names such as ``cl100k`` are accepted)
+        approximate: Always estimate, without loading the tokenizer
+    """
+
+    def __init__(self, encoding: Optional[str] = None, approximate: bool = False):
+        self.encoding = _ENCODING_ALIASES.get(encoding or "", encoding or DEFAULT_ENCODING)
+        if approximate:
+            self._encoder = None
+            return
+        try:
+            import tiktoken
+        except ImportError:
+            self._encoder = None
+            _warn_missing_tiktoken()
+        else:
+            self._encoder = tiktoken.get_encoding(self.encoding)
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from the real tokenizer rather than an estimate."""
+        return self._encoder is not None
+
+    @property
+    def name(self) -> str:
+        """Identifier for the counting method, used to key cached counts."""
+        return self.encoding if self.exact else "approx"
+
+    def count(self, text: str) -> int:
+        """
+        Count the tokens in a string.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens (estimated when tiktoken is unavailable)
+        """
+        if self._encoder is None:
+            return estimate_tokens(text)
+        return len(self._encoder.encode(text, disallowed_special=()))
+
+
+def _warn_missing_tiktoken() -> None:
+    """Warn, once per process, that exact counts were asked for but tiktoken is missing."""
+    global _warned_missing
+    with _warn_lock:
+        if _warned_missing:
+            return
+        _warned_missing = True
+    warnings.warn(
+        "tiktoken is not installed, so token counts are estimated from byte lengths. "
+        "Install code2prompt-cli[tokens] for exact counts, or use --approx-tokens to silence this warning.",
+        RuntimeWarning,
+        stacklevel=3,
+    )
@@ -0,0 +1,319 @@
+"""
+Directory traversal for the built-in prompt pipeline.
+
+The walker lists directories with ``os.scandir``, evaluates compiled
+``.gitignore`` rules (nested files included, and inside a git repository
+those above the walk root and ``info/exclude``) and never descends into
+ignored or hidden directories. With a DirectoryIndex, directories whose
+mtime and ignore rules are unchanged since the last run are not listed
+again.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .dirindex import DirectoryIndex, Listing
+from .gitignore import GitIgnore, IgnoreStack
+
+if TYPE_CHECKING:
+    from .gitsource import GitTree
+
+IGNORE_FILE = ".gitignore"
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """A file found during traversal, with the stat data used for caching."""
+
+    path: str
+    rel_path: str
+    size: int
+    mtime_ns: int
+    # Set for files listed from git objects (see gitsource.py): the blob holding
+    # the contents and the tree it is read from, as there is no file at ``path``.
+    blob: Optional[str] = None
+    tree: Optional["GitTree"] = field(default=None, compare=False, repr=False)
+
+    @property
+    def extension(self) -> str:
+        """File extension without the leading dot."""
+        return os.path.splitext(self.rel_path)[1].lstrip(".")
+
+
+def _ignore_file_stamp(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _signature(parent: str, stamp: str) -> str:
+    """Fingerprint the ignore rules in effect for a directory, for the directory index."""
+    return hashlib.sha1(f"{parent}|{stamp}".encode("utf-8")).hexdigest()
+
+
+def _push_rules(stack: Optional[IgnoreStack], dir_path: str, rel_dir: str) -> Optional[IgnoreStack]:
+    """Add a directory's ``.gitignore`` on top of the rules inherited from its parents."""
+    rules = GitIgnore.from_file(Path(dir_path, IGNORE_FILE))
+    if rules is None:
+        return stack
+    return IgnoreStack(rules, rel_dir.rstrip("/"), stack)
+
+
+def _git_dir(repo_root: Path) -> Path:
+    """Return the directory holding a repository's ``info/exclude``, following ``.git`` files."""
+    git_dir = repo_root / ".git"
+    if git_dir.is_file():
+        # Submodules and linked worktrees point to their git directory.
+        try:
+            text = git_dir.read_text(encoding="utf-8").strip()
+        except (OSError, UnicodeDecodeError):
+            return git_dir
+        if text.startswith("gitdir:"):
+            git_dir = repo_root / text[len("gitdir:"):].strip()
+            try:
+                common = (git_dir / "commondir").read_text(encoding="utf-8").strip()
+            except (OSError, UnicodeDecodeError):
+                common = None
+            if common:
+                git_dir = git_dir / common
+    return git_dir
+
+
+def _root_rules(root: Path, no_ignore: bool) -> Tuple[Optional[IgnoreStack], str]:
+    """
+    Return the rules in effect at the walk root from outside it, and the root signature.
+
+    Inside a git repository these are the repository's ``info/exclude`` and
+    the ``.gitignore`` files of the directories from the repository root down
+    to the walk root's parent; the walk root's own ``.gitignore`` is read by
+    the walk.
+    """
+    if no_ignore:
+        return None, "no-ignore"
+    root = root.resolve()
+    repo_root = next((directory for directory in (root, *root.parents) if (directory / ".git").exists()), None)
+    if repo_root is None:
+        return None, "-"
+    parts = root.relative_to(repo_root).parts
+    layers = [(_git_dir(repo_root) / "info" / "exclude", repo_root)]
+    layers.extend(
+        (repo_root.joinpath(*parts[:depth], IGNORE_FILE), repo_root.joinpath(*parts[:depth]))
+        for depth in range(len(parts))
+    )
+    stack = None
+    stamps = []
+    for path, directory in layers:
+        stamps.append(_ignore_file_stamp(str(path)))
+        rules = GitIgnore.from_file(path)
+        if rules is not None:
+            prefix = "/".join(parts[len(directory.relative_to(repo_root).parts):])
+            stack = IgnoreStack(rules, "", stack, prefix + "/" if prefix else "")
+    return stack, "|".join(stamps)
+
+
+def ignore_rules_stamp(root: Path) -> str:
+    """
+    Fingerprint the ignore files that apply to a walk root from outside it.
+
+    Covers the repository's ``info/exclude`` and the ``.gitignore`` files
+    above the root (see _root_rules); changes to them alter the walk without
+    touching anything under the root.
+    """
+    return _root_rules(root, False)[1]
+
+
+def _skip_name(name: str, hidden: bool) -> bool:
+    return name == ".git" or (not hidden and name.startswith("."))
+
+
+def walk_order_key(rel_path: str) -> Tuple[Tuple[int, str], ...]:
+    """
+    Sort key reproducing the walker's traversal order.
+
+    Within a directory, files come first and then subdirectories, each sorted by name.
+    """
+    parts = rel_path.split("/")
+    return tuple((1, part) for part in parts[:-1]) + ((0, parts[-1]),)
+
+
+def stat_entries(
+    root: Path,
+    rel_paths: Iterable[str],
+    hidden: bool = False,
+    no_ignore: bool = False,
+) -> List[FileEntry]:
+    """
+    Build entries for individual paths, applying the same rules as walk_files.
+
+    Args:
+        root: Codebase directory
+        rel_paths: POSIX-style paths relative to the root
+        hidden: Include hidden files and directories
+        no_ignore: Skip ``.gitignore`` rules
+
+    Returns:
+        Entries for the paths that exist and would be walked
+    """
+    root_stack, _ = _root_rules(root, no_ignore)
+    stacks: Dict[str, Optional[IgnoreStack]] = {}
+    walkable: Dict[str, bool] = {"": True}
+
+    def dir_state(rel_dir: str) -> Tuple[bool, Optional[IgnoreStack]]:
+        """Whether a directory is walked, and the rules in effect inside it."""
+        if rel_dir not in walkable:
+            parent, _, name = rel_dir.rpartition("/")
+            parent_walkable, parent_stack = dir_state(parent)
+            walkable[rel_dir] = parent_walkable and not _skip_name(name, hidden) and not (
+                parent_stack is not None and parent_stack.is_ignored(rel_dir, True)
+            )
+        if rel_dir not in stacks:
+            parent_stack = root_stack if rel_dir == "" else dir_state(rel_dir.rpartition("/")[0])[1]
+            dir_path = os.path.join(root, *rel_dir.split("/")) if rel_dir else str(root)
+            stacks[rel_dir] = parent_stack if no_ignore else _push_rules(parent_stack, dir_path, rel_dir)
+        return walkable[rel_dir], stacks[rel_dir]
+
+    entries = []
+    for rel_path in rel_paths:
+        rel_dir, _, name = rel_path.rpartition("/")
+        dir_walkable, stack = dir_state(rel_dir)
+        if not dir_walkable or _skip_name(name, hidden):
+            continue
+        if stack is not None and stack.is_ignored(rel_path, False):
+            continue
+        path = os.path.join(root, *rel_path.split("/"))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if os.path.isfile(path):
+            entries.append(FileEntry(path, rel_path, stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+def _list_directory(
+    dir_path: str,
+    rel_dir: str,
+    mtime_ns: int,
+    stack: Optional[IgnoreStack],
+    parent_signature: str,
+    hidden: bool,
+    follow_symlinks: bool,
+    no_ignore: bool,
+    index: Optional[DirectoryIndex],
+) -> Tuple[Listing, Optional[IgnoreStack], str]:
+    """
+    List a directory's walkable entries, from the index when it is unchanged.
+
+    Returns:
+        Sorted (name, is_dir) listing, the rules in effect inside the directory and its signature
+    """
+    if index is not None:
+        cached = index.lookup(dir_path, mtime_ns)
+        if cached is not None:
+            stored_signature, has_ignore_file, listing = cached
+            inner = stack
+            stamp = "-"
+            if has_ignore_file and not no_ignore:
+                inner = _push_rules(stack, dir_path, rel_dir)
+                stamp = _ignore_file_stamp(os.path.join(dir_path, IGNORE_FILE))
+            signature = _signature(parent_signature, stamp)
+            if signature == stored_signature:
+                index.hits += 1
+                return listing, inner, signature
+        index.misses += 1
+
+    with os.scandir(dir_path) as it:
+        dir_entries = sorted(it, key=lambda dir_entry: dir_entry.name)
+    has_ignore_file = any(dir_entry.name == IGNORE_FILE for dir_entry in dir_entries)
+    stamp = "-"
+    if has_ignore_file and not no_ignore:
+        stack = _push_rules(stack, dir_path, rel_dir)
+        stamp = _ignore_file_stamp(os.path.join(dir_path, IGNORE_FILE))
+    signature = _signature(parent_signature, stamp)
+
+    listing = []
+    for dir_entry in dir_entries:
+        if _skip_name(dir_entry.name, hidden):
+            continue
+        try:
+            is_dir = dir_entry.is_dir(follow_symlinks=follow_symlinks)
+            if not is_dir and not dir_entry.is_file():
+                continue
+        except OSError:
+            continue
+        if stack is not None and stack.is_ignored(rel_dir + dir_entry.name, is_dir):
+            continue
+        listing.append((dir_entry.name, is_dir))
+
+    if index is not None:
+        index.store(dir_path, mtime_ns, signature, has_ignore_file, listing)
+    return listing, stack, signature
+
+
+def walk_files(
+    root: Path,
+    hidden: bool = False,
+    follow_symlinks: bool = False,
+    no_ignore: bool = False,
+    index: Optional[DirectoryIndex] = None,
+    prune_dir: Optional[Callable[[str], bool]] = None,
+    reverse: bool = False,
+) -> Iterator[FileEntry]:
+    """
+    Walk a codebase and yield the files that are eligible for the prompt.
+
+    Args:
+        root: Codebase directory
+        hidden: Include hidden files and directories
+        follow_symlinks: Descend into symlinked directories
+        no_ignore: Skip ``.gitignore`` rules
+        index: Optional directory index used to skip listing unchanged directories
+        prune_dir: Optional predicate on a directory's relative path; True skips the directory
+        reverse: Visit the files and subdirectories of each directory in descending name order
+
+    Yields:
+        FileEntry for every non-ignored regular file, in walk order (see walk_order_key)
+    """
+    root_stack, root_stamp = _root_rules(root, no_ignore)
+    root_signature = _signature(f"h={hidden:d};L={follow_symlinks:d}", root_stamp)
+    visited = set()
+    pending = [("", str(root), root_stack, root_signature)]
+    while pending:
+        rel_dir, dir_path, stack, parent_signature = pending.pop()
+        try:
+            dir_stat = os.stat(dir_path)
+        except OSError:
+            continue
+        if follow_symlinks:
+            # Symlinks can form cycles; never list the same directory twice.
+            key = (dir_stat.st_dev, dir_stat.st_ino)
+            if key in visited:
+                continue
+            visited.add(key)
+
+        try:
+            listing, inner, signature = _list_directory(
+                dir_path, rel_dir, dir_stat.st_mtime_ns, stack, parent_signature,
+                hidden, follow_symlinks, no_ignore, index,
+            )
+        except OSError:
+            continue
+
+        subdirs = []
+        for name, is_dir in (reversed(listing) if reverse else listing):
+            path = os.path.join(dir_path, name)
+            if is_dir:
+                if prune_dir is None or not prune_dir(rel_dir + name):
+                    subdirs.append((rel_dir + name + "/", path, inner, signature))
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield FileEntry(path, rel_dir + name, stat.st_size, stat.st_mtime_ns)
+        pending.extend(reversed(subdirs))
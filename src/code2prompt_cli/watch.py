@@ -0,0 +1,179 @@
+"""
+Filesystem change notification for the daemon.
+
+On Linux, directories are watched with inotify through ctypes (no extra
+dependency). Elsewhere, or when inotify cannot be set up (for instance when
+the watch limit is exhausted), start_watcher() returns None and the daemon
+simply does not reuse walk results between requests.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+from typing import Callable, Dict, Optional
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """
+    Watches every directory below a root (except ``.git``) and reports changes.
+
+    Args:
+        root: Directory to watch
+        on_change: Called with the changed path (or the root on queue overflow) from the watcher thread
+
+    Raises:
+        OSError: If inotify is unavailable or a watch cannot be added
+    """
+
+    def __init__(self, root: str, on_change: Callable[[str], None]):
+        self.root = root
+        self.on_change = on_change
+        libc_name = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        # Non-blocking, so that drain() and the watcher thread can both read.
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, str] = {}
+        # Held while reading and handling events, so that drain() returns only once they are reported.
+        self._lock = threading.Lock()
+        try:
+            self._add_tree(root)
+            # Written to by close() to wake the thread waiting for events.
+            self._wake_r, self._wake_w = os.pipe()
+        except OSError:
+            os.close(self._fd)
+            raise
+        self._thread = threading.Thread(target=self._run, name="code2prompt-watch", daemon=True)
+
+    def start(self) -> None:
+        """Start delivering change notifications."""
+        self._thread.start()
+
+    def drain(self) -> None:
+        """
+        Report every event queued so far before returning.
+
+        The kernel queues an event before the change that caused it returns,
+        so after drain() every change made before the call has been reported.
+        """
+        with self._lock:
+            while self._read_events():
+                pass
+
+    def close(self) -> None:
+        """Stop watching, once the watcher thread has exited."""
+        # The descriptors are closed only after the thread is gone; a thread
+        # still reading could otherwise read from a reused descriptor number.
+        os.write(self._wake_w, b"x")
+        if self._thread.is_alive():
+            self._thread.join()
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            os.close(fd)
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return
+            raise OSError(error, f"inotify_add_watch failed for {path}")
+        self._watches[wd] = path
+
+    def _add_tree(self, root: str) -> None:
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name != ".git"]
+            self._add_watch(dirpath)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                ready, _, _ = select.select([self._fd, self._wake_r], [], [])
+                if self._wake_r in ready:
+                    return
+                with self._lock:
+                    self._read_events()
+            except OSError:
+                return
+
+    def _read_events(self) -> bool:
+        """Read and handle one batch of queued events; returns False if none were queued."""
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            self._handle(wd, mask, name)
+        return True
+
+    def _handle(self, wd: int, mask: int, name: str) -> None:
+        if mask & IN_Q_OVERFLOW:
+            self.on_change(self.root)
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        path = os.path.join(directory, name) if name else directory
+        if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and name != ".git":
+            try:
+                self._add_tree(path)
+            except OSError:
+                # Out of watches: changes below this directory would go unnoticed.
+                self.on_change(self.root)
+        self.on_change(path)
+
+
+def start_watcher(root: str, on_change: Callable[[str], None]) -> Optional[InotifyWatcher]:
+    """
+    Start watching a directory tree if the platform supports it.
+
+    Args:
+        root: Directory to watch
+        on_change: Called with the changed path whenever something below the root changes
+
+    Returns:
+        The running watcher, or None if change notification is unavailable
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        watcher = InotifyWatcher(root, on_change)
+    except (OSError, AttributeError):
+        return None
+    watcher.start()
+    return watcher
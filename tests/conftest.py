@@ -0,0 +1,63 @@
+import os
+import subprocess
+from pathlib import Path
+import pytest
+
+
+def write_tree(root, files):
+    """Create files under root from a {relative path: str or bytes contents} mapping, in order."""
+    for rel_path, contents in files.items():
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(contents, bytes):
+            path.write_bytes(contents)
+        else:
+            path.write_text(contents)
+    return root
+
+
+class GitRepo:
+    """A test git repository, with commits made by a fixed author on branch main."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def run(self, *args, date=None):
+        """Run git in the repository, dating new commits at ``date`` (seconds since the epoch) if given."""
+        env = None
+        if date is not None:
+            env = dict(os.environ, GIT_AUTHOR_DATE=f'{date} +0000', GIT_COMMITTER_DATE=f'{date} +0000')
+        subprocess.run(['git', '-C', str(self.root), *args], check=True, capture_output=True, env=env)
+
+    def commit(self, message, files=None, date=None):
+        """Write files (see write_tree), then commit every change in the working tree."""
+        write_tree(self.root, files or {})
+        self.run('add', '-A')
+        self.run('commit', '-q', '--allow-empty', '-m', message, date=date)
+
+
+@pytest.fixture
+def make_codebase():
+    """Factory writing a test codebase: ``make_codebase(root, files)`` returns root."""
+    return write_tree
+
+
+@pytest.fixture
+def git_repo():
+    """
+    Factory creating a repository: ``git_repo(root, commits=())`` returns a GitRepo.
+
+    ``commits`` is a sequence of (message, files, date) arguments of GitRepo.commit().
+    """
+
+    def init(root, commits=()):
+        repo = GitRepo(root)
+        repo.root.mkdir(parents=True, exist_ok=True)
+        repo.run('init', '-q', '-b', 'main')
+        repo.run('config', 'user.email', 'test@example.com')
+        repo.run('config', 'user.name', 'Test')
+        for message, files, date in commits:
+            repo.commit(message, files, date=date)
+        return repo
+
+    return init
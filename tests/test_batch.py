@@ -0,0 +1,89 @@
+import json
+import os
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.batch import ManifestError, load_manifest
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import generate_prompt
+
+
+def _make_services(root):
+    os.makedirs(root / 'services' / 'auth')
+    os.makedirs(root / 'services' / 'billing')
+    (root / 'services' / 'auth' / 'login.py').write_text('# Login handler\n')
+    (root / 'services' / 'auth' / 'README.md').write_text('# Auth readme\n')
+    (root / 'services' / 'billing' / 'invoice.py').write_text('# Invoice handler\n')
+
+
+class TestManifest:
+    """Test batch manifest parsing."""
+
+    def test_toml_manifest_defaults_and_paths(self, tmp_path):
+        """Test that defaults apply to every job and paths resolve against the manifest."""
+        _make_services(tmp_path)
+        (tmp_path / 'batch.toml').write_text(
+            '[defaults]\nline_numbers = true\n\n'
+            '[[jobs]]\npath = "services/auth"\nprompt = "Review auth"\ninclude = ["*.py"]\n'
+            'output_file = "out/auth.md"\n\n'
+            '[[jobs]]\nname = "billing"\npath = "services/billing"\nprompt = "Review billing"\n'
+            'line_numbers = false\noutput_file = "out/billing.md"\n'
+        )
+        jobs = load_manifest(tmp_path / 'batch.toml', {'hidden': True}, tmp_path)
+        assert [job.name for job in jobs] == ['out/auth.md', 'billing']
+        assert jobs[0].codebase_path == (tmp_path / 'services' / 'auth').resolve()
+        assert jobs[0].options['include_patterns'] == ['*.py']
+        assert jobs[0].options['line_numbers'] is True
+        assert jobs[1].options['line_numbers'] is False
+        assert jobs[1].options['hidden'] is True
+        assert jobs[1].output_file == (tmp_path / 'out' / 'billing.md').resolve()
+
+    def test_invalid_manifests(self, tmp_path):
+        """Test that unknown keys, missing outputs and duplicate outputs are rejected."""
+        manifests = [
+            {'jobs': [{'prompt': 'x', 'output_file': 'a.md', 'bogus': 1}]},
+            {'jobs': [{'prompt': 'x'}]},
+            {'jobs': [{'prompt': 'x', 'output_file': 'a.md'}, {'prompt': 'y', 'output_file': 'a.md'}]},
+            {'tasks': []},
+        ]
+        for manifest in manifests:
+            (tmp_path / 'batch.json').write_text(json.dumps(manifest))
+            with pytest.raises(ManifestError):
+                load_manifest(tmp_path / 'batch.json', {}, tmp_path)
+
+
+class TestCLIOptionBatch:
+    """Test --batch option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_batch_writes_every_prompt(self, tmp_path):
+        """Test that each job's output matches a standalone run of the same job."""
+        _make_services(tmp_path)
+        manifest = {'jobs': [
+            {'path': 'services/auth', 'prompt': 'Review auth', 'include': ['*.py'], 'output_file': 'out/auth.md'},
+            {'path': 'services/billing', 'prompt': 'Review billing', 'output_file': 'out/billing.md'},
+            {'path': 'services', 'prompt': 'Review all', 'output_file': 'services/all.md'},
+        ]}
+        (tmp_path / 'batch.json').write_text(json.dumps(manifest))
+
+        result = self.runner.invoke(main, ['--batch', str(tmp_path / 'batch.json'), '--jobs', '3'])
+        assert result.exit_code == 0
+        assert 'Batch: 3 of 3 prompts written.' in result.output
+
+        auth = (tmp_path / 'out' / 'auth.md').read_text()
+        assert auth == generate_prompt(
+            (tmp_path / 'services' / 'auth').resolve(), 'Review auth', {'include_patterns': ['*.py']}
+        )
+        assert '# Auth readme' not in auth
+        assert '# Invoice handler' in (tmp_path / 'out' / 'billing.md').read_text()
+        everything = (tmp_path / 'services' / 'all.md').read_text()
+        assert '# Login handler' in everything and '# Invoice handler' in everything
+        assert 'all.md' not in everything
+
+    def test_cli_batch_invalid_manifest(self, tmp_path):
+        """Test that a broken manifest is reported without writing anything."""
+        (tmp_path / 'batch.json').write_text('{not json')
+        result = self.runner.invoke(main, ['--batch', str(tmp_path / 'batch.json')])
+        assert result.exit_code == 1
+        assert 'Error reading batch manifest' in result.output
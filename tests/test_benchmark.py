@@ -0,0 +1,61 @@
+import json
+from click.testing import CliRunner
+from code2prompt_cli.benchmark import (
+    STARTUP_COMMANDS, RepoShape, cli, generate_repo, measure_startup, run_suite,
+)
+from code2prompt_cli.walker import walk_files
+
+
+class TestStartup:
+    """Test that fast CLI paths stay free of heavy imports."""
+
+    def test_startup_paths_skip_heavy_imports(self):
+        """Test that --help, --version and validation errors import none of the heavy modules."""
+        for name, args in STARTUP_COMMANDS.items():
+            result = measure_startup(name, args, runs=1)
+            assert result.heavy_imports == [], name
+            assert result.min_ms > 0
+
+
+class TestSyntheticRepository:
+    """Test the synthetic repository generator."""
+
+    def test_generate_repo_follows_shape(self, tmp_path):
+        """Test that file counts, binary files and ignored files match the reported stats."""
+        shape = RepoShape(files=200, depth=3, files_per_dir=10, mean_size=512, binary_ratio=0.1, ignore_density=0.2)
+        stats = generate_repo(tmp_path / 'repo', shape)
+        assert stats.files == 200
+        assert stats.binary_files > 0 and stats.ignored_files > 0
+        walked = list(walk_files(tmp_path / 'repo'))
+        assert len(walked) == stats.files - stats.ignored_files
+        assert not any(entry.rel_path.endswith('.log') for entry in walked)
+
+    def test_generate_repo_is_deterministic(self, tmp_path):
+        """Test that the same seed produces the same repository."""
+        first = generate_repo(tmp_path / 'a', RepoShape(files=50, seed=7))
+        second = generate_repo(tmp_path / 'b', RepoShape(files=50, seed=7))
+        assert first == second
+        assert sorted(p.relative_to(tmp_path / 'a') for p in (tmp_path / 'a').rglob('*')) == \
+            sorted(p.relative_to(tmp_path / 'b') for p in (tmp_path / 'b').rglob('*'))
+
+
+class TestSuite:
+    """Test the phase benchmark."""
+
+    def test_run_suite_reports_every_phase(self, tmp_path):
+        """Test that every phase is measured with positive throughput."""
+        generate_repo(tmp_path / 'repo', RepoShape(files=40, mean_size=256))
+        results = run_suite(tmp_path / 'repo', repeat=1, jobs=2)
+        names = [result.name for result in results]
+        assert names[:3] == ['walk', 'select', 'render']
+        assert 'prompt' in names and 'prompt-warm-cache' in names
+        assert all(result.files_per_s > 0 and result.peak_mb >= 0 for result in results)
+
+    def test_cli_run_json(self):
+        """Test that the run command emits machine-readable results."""
+        result = CliRunner().invoke(cli, ['run', '--files', '30', '--repeat', '1', '--json'])
+        assert result.exit_code == 0
+        data = json.loads(result.output)
+        assert data['repo']['files'] == 30
+        assert data['shape']['files'] == 30
+        assert {phase['name'] for phase in data['phases']} >= {'walk', 'render', 'prompt'}
@@ -0,0 +1,85 @@
+import os
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.budget import pack_files, rank_files
+from code2prompt_cli.tokens import TokenCounter, estimate_tokens
+from code2prompt_cli.walker import FileEntry
+
+
+def _entry(rel_path, size, mtime_ns=0):
+    return FileEntry('/repo/' + rel_path, rel_path, size, mtime_ns)
+
+
+class TestBudgetPacking:
+    """Test ranking and greedy packing of files into a token budget."""
+
+    def test_relevance_prefers_paths_matching_the_prompt(self):
+        """Test that files whose path mentions prompt terms rank first."""
+        files = [_entry('src/cli.py', 10), _entry('src/cache.py', 500), _entry('docs/cache.md', 50)]
+        ranked = rank_files(files, 'Fix the cache eviction', 'relevance')
+        assert [entry.rel_path for entry in ranked] == ['docs/cache.md', 'src/cache.py', 'src/cli.py']
+
+    def test_recent_and_size_orders(self):
+        """Test the recency and size rankings."""
+        files = [_entry('a', 30, mtime_ns=1), _entry('b', 10, mtime_ns=3), _entry('c', 20, mtime_ns=2)]
+        assert [entry.rel_path for entry in rank_files(files, None, 'recent')] == ['b', 'c', 'a']
+        assert [entry.rel_path for entry in rank_files(files, None, 'size')] == ['b', 'c', 'a']
+
+    def test_pack_truncates_then_drops(self):
+        """Test that files are included, truncated or dropped as the budget runs out."""
+        files = [_entry('a', 0), _entry('b', 0), _entry('c', 0)]
+        tokens = {'a': 100, 'b': 500, 'c': 50}
+        plan = pack_files(
+            files,
+            200,
+            lambda entry: tokens[entry.rel_path],
+            lambda entry, limit: ('partial', limit),
+        )
+        assert plan.included == {'/repo/a', '/repo/b'}
+        assert plan.truncated == {'/repo/b': 'partial'}
+        assert plan.dropped == ['c']
+        assert plan.used_tokens == 200
+
+    def test_token_counter_estimate(self):
+        """Test the byte-length estimate used without tiktoken."""
+        assert estimate_tokens('x' * 40) == 10
+        assert TokenCounter('cl100k').encoding == 'cl100k_base'
+
+
+class TestCLIOptionMaxTokens:
+    """Test --max-tokens option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_max_tokens_drops_files_over_budget(self):
+        """Test that a small budget keeps relevant files and reports the rest."""
+        with self.runner.isolated_filesystem():
+            os.makedirs('src')
+            with open('src/parser.py', 'w') as f:
+                f.write('# Parser module\n')
+            for index in range(5):
+                with open(f'src/big_{index}.py', 'w') as f:
+                    f.write(f'# Big module {index}\n' + 'x = 1\n' * 2000)
+
+            result = self.runner.invoke(main, [
+                '--path', '.', '--max-tokens', '400', '--no-clipboard', 'Improve the parser'
+            ])
+            assert result.exit_code == 0
+            assert '# Parser module' in result.output
+            assert 'Token budget:' in result.output
+            assert 'dropped: src/big_' in result.output
+            assert '# Big module 4' not in result.output
+
+    def test_cli_max_tokens_below_fixed_overhead(self):
+        """Test that a budget the header and footer alone exceed is an error, not an over-budget prompt."""
+        with self.runner.isolated_filesystem():
+            with open('a.py', 'w') as f:
+                f.write('a = 1\n')
+
+            result = self.runner.invoke(main, [
+                '--path', '.', '--max-tokens', '10', '--approx-tokens', '--no-clipboard', 'Explain'
+            ])
+            assert result.exit_code == 1
+            assert '--max-tokens 10 is too small' in result.output
+            assert 'a = 1' not in result.output
@@ -0,0 +1,192 @@
+import os
+import sqlite3
+from click.testing import CliRunner
+from code2prompt_cli import cache as cache_module
+from code2prompt_cli.main import main
+from code2prompt_cli.cache import FileCache, MemoryCache
+from code2prompt_cli.walker import FileEntry
+
+
+def _entry(path):
+    stat = os.stat(path)
+    # Backdate the mtime so the entry is outside the racy-timestamp window
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10_000_000_000))
+    stat = os.stat(path)
+    return FileEntry(str(path), path.name, stat.st_size, stat.st_mtime_ns)
+
+
+class TestFileCache:
+    """Test the persistent rendered-block cache."""
+
+    def test_unchanged_file_is_served_from_cache(self, tmp_path):
+        """Test that a second lookup of an unchanged file does not re-render it."""
+        source = tmp_path / 'a.py'
+        source.write_text('print(1)\n')
+        entry = _entry(source)
+        renders = []
+
+        def render(data):
+            renders.append(data)
+            return data.decode()
+
+        cache = FileCache(tmp_path / 'cache')
+        assert cache.get_or_render(entry, 'v', render).block == 'print(1)\n'
+        cache.close()
+
+        cache = FileCache(tmp_path / 'cache')
+        assert cache.get_or_render(entry, 'v', render).block == 'print(1)\n'
+        assert cache.hits == 1 and cache.misses == 0
+        cache.close()
+        assert len(renders) == 1
+
+    def test_binary_file_is_not_rendered(self, tmp_path):
+        """Test that a file whose first block looks binary is skipped without calling render."""
+        source = tmp_path / 'image.png'
+        source.write_bytes(b'\x89PNG\r\n\x1a\n' + b'x' * 20000)
+        renders = []
+
+        cache = FileCache(tmp_path / 'cache')
+        cached = cache.get_or_render(_entry(source), 'v', lambda data: renders.append(data) or 'text')
+        cache.close()
+        assert cached.block is None
+        assert renders == []
+
+    def test_modified_file_is_re_rendered(self, tmp_path):
+        """Test that a change in size or mtime invalidates the cached block."""
+        source = tmp_path / 'a.py'
+        source.write_text('old\n')
+        cache = FileCache(tmp_path / 'cache')
+        cache.get_or_render(_entry(source), 'v', lambda data: data.decode())
+
+        source.write_text('new content\n')
+        assert cache.get_or_render(_entry(source), 'v', lambda data: data.decode()).block == 'new content\n'
+        assert cache.misses == 2
+        cache.close()
+
+    def test_identical_contents_share_a_block(self, tmp_path):
+        """Test that blocks are addressed by content, not path."""
+        (tmp_path / 'a.py').write_text('same\n')
+        (tmp_path / 'b.py').write_text('same\n')
+        cache = FileCache(tmp_path / 'cache')
+        cache.get_or_render(_entry(tmp_path / 'a.py'), 'v', lambda data: data.decode())
+        cache.get_or_render(_entry(tmp_path / 'b.py'), 'v', lambda data: data.decode())
+        assert cache.hits == 1 and cache.misses == 1
+        cache.close()
+
+    def test_least_recently_used_blocks_are_evicted(self, tmp_path):
+        """Test that the cache is trimmed below its size cap on close."""
+        cache = FileCache(tmp_path / 'cache', max_bytes=1500)
+        for index in range(5):
+            source = tmp_path / f'f{index}.txt'
+            source.write_text(str(index) * 500)
+            cache.get_or_render(_entry(source), 'v', lambda data: data.decode())
+        cache.close()
+
+        cache = FileCache(tmp_path / 'cache', max_bytes=1500)
+        total = cache._db.execute('SELECT SUM(nbytes) FROM blocks').fetchone()[0]
+        assert total <= 1500
+        cache.get_or_render(_entry(tmp_path / 'f4.txt'), 'v', lambda data: data.decode())
+        assert cache.hits == 1
+        cache.close()
+
+    def test_racy_file_stat_is_not_stored(self, tmp_path):
+        """Test that a file modified just now is not remembered by size and mtime."""
+        source = tmp_path / 'a.py'
+        source.write_text('print(1)\n')
+        stat = os.stat(source)
+        entry = FileEntry(str(source), 'a.py', stat.st_size, stat.st_mtime_ns)
+        cache = FileCache(tmp_path / 'cache')
+        cache.get_or_render(entry, 'v', lambda data: data.decode())
+        assert cache._db.execute('SELECT COUNT(*) FROM files').fetchone()[0] == 0
+        cache.close()
+
+    def test_locked_cache_renders_uncached(self, tmp_path, monkeypatch):
+        """Test that a cache locked by another run is read but not written, without failing."""
+        monkeypatch.setattr(cache_module, '_BUSY_TIMEOUT', 0.1)
+        (tmp_path / 'a.py').write_text('print(1)\n')
+        (tmp_path / 'b.py').write_text('print(2)\n')
+        cache = FileCache(tmp_path / 'cache')
+        cache.get_or_render(_entry(tmp_path / 'a.py'), 'v', lambda data: data.decode())
+        cache.close()
+
+        other = sqlite3.connect(tmp_path / 'cache' / 'files.sqlite3', isolation_level=None)
+        other.execute('BEGIN IMMEDIATE')
+        try:
+            cache = FileCache(tmp_path / 'cache')
+            assert cache.get_or_render(_entry(tmp_path / 'a.py'), 'v', lambda data: data.decode()).block == 'print(1)\n'
+            assert cache.get_or_render(_entry(tmp_path / 'b.py'), 'v', lambda data: data.decode()).block == 'print(2)\n'
+            assert cache.hits == 1 and cache.misses == 1
+            cache.close()
+        finally:
+            other.execute('ROLLBACK')
+            other.close()
+
+
+class TestMemoryCache:
+    """Test the in-memory block cache."""
+
+    def test_token_counts_are_evicted(self, tmp_path):
+        """Test that token counts are bounded by the size cap, least recently used first."""
+        cache = MemoryCache(max_bytes=200)
+        for index in range(5):
+            source = tmp_path / f'f{index}.txt'
+            source.write_text(str(index) * 50)
+            cached = cache.get_or_render(_entry(source), 'v', lambda data: data.decode())
+            assert cache.get_or_count(cached, 'v', 'approx', len) == 50
+        assert cache._nbytes <= 200
+        assert len(cache._tokens) == 3
+        assert cache.get_or_count(cached, 'v', 'approx', lambda block: 0) == 50
+
+    def test_storing_a_key_again_is_counted_once(self, tmp_path):
+        """Test that a block rendered by two callers at once is accounted for once."""
+        source = tmp_path / 'a.txt'
+        source.write_text('a' * 100)
+        entry = _entry(source)
+        cache = MemoryCache()
+
+        def render(data):
+            # A second caller misses and stores the block while the first is still rendering.
+            cache.get_or_render(entry, 'v', lambda data: data.decode())
+            return data.decode()
+
+        cache.get_or_render(entry, 'v', render)
+        assert len(cache._blocks) == 1 and cache.misses == 2
+        assert cache._nbytes == len(cache._blocks) * 64 + 100
+
+
+class TestCLIOptionCache:
+    """Test --cache and --cache-dir options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_cache_dir_option(self):
+        """Test that repeated runs with --cache-dir produce the same prompt."""
+        with self.runner.isolated_filesystem():
+            os.makedirs('src')
+            with open('src/test.py', 'w') as f:
+                f.write('# Cached file\n')
+
+            args = ['--path', 'src', '--cache-dir', 'cache', '--no-clipboard', 'Test cache']
+            first = self.runner.invoke(main, args)
+            second = self.runner.invoke(main, args)
+            assert first.exit_code == 0
+            assert '# Cached file' in first.output
+            assert 'User Request' in first.output
+            assert first.output == second.output
+            assert os.path.exists('cache/files.sqlite3')
+
+    def test_cli_cache_with_jobs(self):
+        """Test that the cache can be shared between worker threads."""
+        with self.runner.isolated_filesystem():
+            os.makedirs('src')
+            for index in range(20):
+                with open(f'src/file_{index}.py', 'w') as f:
+                    f.write(f'# File {index}\n')
+
+            args = ['--path', 'src', '--cache-dir', 'cache', '--jobs', '4', '--no-clipboard', 'Test cache']
+            first = self.runner.invoke(main, args)
+            second = self.runner.invoke(main, args)
+            assert first.exit_code == 0
+            assert '# File 19' in first.output
+            assert first.output == second.output
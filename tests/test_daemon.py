@@ -0,0 +1,73 @@
+import threading
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.daemon import DaemonUnavailable, PromptServer, request_prompt
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import generate_prompt
+
+
+@pytest.fixture
+def server(tmp_path):
+    codebase = tmp_path / 'codebase'
+    codebase.mkdir()
+    (codebase / 'main.py').write_text('print("main")\n')
+    server = PromptServer(tmp_path / 'd.sock', codebase)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestDaemon:
+    """Test the prompt daemon and its client."""
+
+    def test_daemon_matches_local_generation(self, server):
+        """Test that a daemon reply is identical to generating locally."""
+        prompt, _ = request_prompt(server.server_address, server.codebase_path, 'Explain', {})
+        assert prompt == generate_prompt(server.codebase_path, 'Explain', {})
+
+    def test_daemon_sees_file_changes(self, server):
+        """Test that new and modified files show up in later requests."""
+        request_prompt(server.server_address, server.codebase_path, None, {})
+        (server.codebase_path / 'added.py').write_text('# Added file\n')
+        (server.codebase_path / 'main.py').write_text('print("changed")\n')
+        # No pause: pending watcher events are handled before the request is served.
+        prompt, _ = request_prompt(server.server_address, server.codebase_path, None, {})
+        assert '# Added file' in prompt
+        assert 'print("changed")' in prompt
+
+    def test_daemon_rejects_other_roots(self, server, tmp_path):
+        """Test that a request for a different codebase is refused."""
+        with pytest.raises(DaemonUnavailable):
+            request_prompt(server.server_address, tmp_path, None, {})
+
+
+class TestCLIOptionDaemon:
+    """Test --daemon option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_daemon_falls_back_without_server(self):
+        """Test that a missing daemon falls back to local generation."""
+        with self.runner.isolated_filesystem():
+            with open('app.py', 'w') as f:
+                f.write('# App file\n')
+
+            result = self.runner.invoke(main, [
+                '--path', '.', '--daemon', '--socket', 'missing.sock', '--no-clipboard', '--no-ignore', 'Test'
+            ])
+            assert result.exit_code == 0
+            assert 'daemon unavailable' in result.output
+            assert '# App file' in result.output
+
+    def test_cli_daemon_uses_server(self, server):
+        """Test that --daemon prints the prompt generated by the server."""
+        result = self.runner.invoke(main, [
+            '--path', str(server.codebase_path), '--daemon', '--socket', server.server_address,
+            '--no-clipboard', 'Test'
+        ])
+        assert result.exit_code == 0
+        assert 'daemon unavailable' not in result.output
+        assert 'print("main")' in result.output
@@ -0,0 +1,130 @@
+import json
+from click.testing import CliRunner
+from code2prompt_cli.dedup import Deduplicator, estimate_similarity, minhash_signature
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.tokens import estimate_tokens
+from code2prompt_cli.walker import walk_files
+
+BODY = ''.join(f'def f{i}(x):\n    return x + {i}\n' for i in range(30))
+
+
+CODEBASE = {
+    'main.py': BODY.replace('return x + 7', 'return x * 7 + 1'),
+    'vendor/a/lib.py': BODY,
+    'vendor/b/lib.py': BODY,
+    'other.py': ''.join(f'value_{i} = "{i * i}"\n' for i in range(40)),
+}
+
+
+class TestDeduplicator:
+    """Test duplicate and near-duplicate detection."""
+
+    def test_signature_similarity(self):
+        """Test that similar line sets get close signatures and unrelated ones do not."""
+        changed = BODY.replace('return x + 7', 'return x * 7').replace('return x + 8', 'return x * 8')
+        unrelated = ''.join(f'print({i})\n' for i in range(60))
+        assert estimate_similarity(minhash_signature(BODY), minhash_signature(BODY)) == 1.0
+        assert estimate_similarity(minhash_signature(BODY), minhash_signature(changed)) > 0.8
+        assert estimate_similarity(minhash_signature(BODY), minhash_signature(unrelated)) < 0.2
+        assert minhash_signature('short\nfile\n') is None
+
+    def test_only_same_size_files_are_hashed(self, tmp_path, monkeypatch, make_codebase):
+        """Test that files with a unique size are never read for exact deduplication."""
+        make_codebase(tmp_path, CODEBASE)
+        entries = list(walk_files(tmp_path))
+        deduplicator = Deduplicator(entries)
+        read = []
+        monkeypatch.setattr('code2prompt_cli.dedup._file_digest', lambda path: read.append(path) or 'same')
+        for entry in entries:
+            deduplicator.add(entry, deduplicator.fingerprint(entry))
+        assert sorted(read) == [str(tmp_path / 'vendor' / 'a' / 'lib.py'), str(tmp_path / 'vendor' / 'b' / 'lib.py')]
+        assert {path: original.rel_path for path, original in deduplicator.plan.duplicates.items()} == {
+            str(tmp_path / 'vendor' / 'b' / 'lib.py'): 'vendor/a/lib.py'
+        }
+
+
+class TestDedupPipeline:
+    """Test --dedup and --near-dup in the built-in pipeline."""
+
+    def test_identical_files_are_referenced(self, tmp_path, make_codebase):
+        """Test that later copies refer to the first one and are reported."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, {'dedup': True}, summary)
+        assert result.count('return x + 0') == 2
+        assert '`vendor/b/lib.py`:\n\nIdentical to `vendor/a/lib.py`.' in result
+        assert summary.duplicate_files == [('vendor/b/lib.py', 'vendor/a/lib.py')]
+        assert summary.near_duplicate_files == []
+
+    def test_near_duplicates_become_diffs(self, tmp_path, make_codebase):
+        """Test that a similar file is emitted as a diff against the earlier one."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, {'dedup': True, 'near_dup': 0.8}, summary)
+        assert result.count('return x + 0') == 1
+        assert 'Near-duplicate of `main.py` (' in result
+        assert '-    return x * 7 + 1\n+    return x + 7' in result
+        assert 'Identical to `vendor/a/lib.py`.' in result
+        assert [(path, base) for path, base, _ in summary.near_duplicate_files] == [('vendor/a/lib.py', 'main.py')]
+        assert 'value_39' in result
+
+    def test_structured_references(self, tmp_path, make_codebase):
+        """Test that structured formats name the original instead of carrying contents."""
+        make_codebase(tmp_path, CODEBASE)
+        result = generate_prompt(tmp_path, None, {'dedup': True, 'near_dup': 0.8, 'output_format': 'json'})
+        records = {record['path']: record for record in json.loads(result)['files']}
+        assert records['vendor/b/lib.py'] == {'path': 'vendor/b/lib.py', 'extension': 'py', 'duplicate_of': 'vendor/a/lib.py'}
+        assert records['vendor/a/lib.py']['near_duplicate_of'] == 'main.py'
+        assert 'content' not in records['vendor/a/lib.py']
+
+    def test_duplicates_of_dropped_files_are_dropped(self, tmp_path, make_codebase):
+        """Test that a copy is only referenced when its original made it into the budget."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        options = {'dedup': True, 'max_tokens': 60, 'include_patterns': ['vendor/**'], 'approx_tokens': True}
+        result = generate_prompt(tmp_path, None, options, summary)
+        assert '`vendor/b/lib.py`:' not in result
+        assert summary.dropped_files == ['vendor/a/lib.py']
+        assert summary.duplicate_files == []
+
+    def test_references_are_charged_to_the_budget(self, tmp_path, make_codebase):
+        """Test that references to identical copies count against --max-tokens."""
+        make_codebase(tmp_path, {f'copies/c{i:02}.py': 'x = 1\n' for i in range(40)})
+        summary = RunSummary()
+        for output_format in ('markdown', 'json'):
+            options = {'dedup': True, 'max_tokens': 300, 'approx_tokens': True, 'output_format': output_format}
+            result = generate_prompt(tmp_path, None, options, summary)
+            assert estimate_tokens(result) <= summary.used_tokens <= 300
+            assert summary.dropped_files and 'copies/c39.py' in summary.dropped_files
+            assert 'copies/c00.py' not in summary.dropped_files
+
+
+class TestCLIOptionDedup:
+    """Test --dedup and --near-dup options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_dedup_summary(self):
+        """Test that deduplicated files are summarized after the prompt."""
+        with self.runner.isolated_filesystem():
+            with open('LICENSE', 'w') as f:
+                f.write('MIT\n')
+            with open('COPYING', 'w') as f:
+                f.write('MIT\n')
+
+            result = self.runner.invoke(main, ['--path', '.', '--dedup', '--no-clipboard', 'Test'])
+            assert result.exit_code == 0
+            assert 'Identical to `COPYING`.' in result.output
+            assert 'Deduplicated 1 identical files and 0 near-duplicates' in result.output
+            assert 'identical to COPYING: LICENSE' in result.output
+
+    def test_cli_incremental_rejects_dedup(self):
+        """Test that --near-dup cannot be combined with --incremental."""
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                main, ['--path', '.', '--incremental', 'state.json', '--near-dup', '0.9', 'Test']
+            )
+            assert result.exit_code == 1
+            assert '--incremental cannot be combined' in result.output
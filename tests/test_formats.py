@@ -0,0 +1,92 @@
+import json
+import xml.etree.ElementTree as ElementTree
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.formats import get_format
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt, iter_prompt
+
+
+CODEBASE = {
+    'a.py': 'print("<a> & \'b\'")\n',
+    'b.md': '# B\x1b\n',
+    'image.png': b'\x89PNG\r\n\x1a\n',
+}
+
+
+class TestFormats:
+    """Test the structured output formats of the built-in pipeline."""
+
+    def test_json_document(self, tmp_path, make_codebase):
+        """Test that the JSON document holds plain contents, one record per line."""
+        make_codebase(tmp_path / 'src', CODEBASE)
+        result = generate_prompt(tmp_path / 'src', 'Explain', {'output_format': 'json', 'line_numbers': True})
+        document = json.loads(result)
+        assert document['project_path'] == str(tmp_path / 'src')
+        assert document['source_tree'] == 'src\n├── a.py\n├── b.md\n└── image.png'
+        assert document['files'][0] == {'path': 'a.py', 'extension': 'py', 'content': '   1 | print("<a> & \'b\'")'}
+        assert document['user_request'] == 'Explain'
+        assert len(result.splitlines()) == 4
+
+    def test_ndjson_records(self, tmp_path, make_codebase):
+        """Test that every line is a record and each file record is yielded as its own chunk."""
+        make_codebase(tmp_path / 'src', CODEBASE)
+        chunks = list(iter_prompt(tmp_path / 'src', 'Explain', {'output_format': 'ndjson'}))
+        records = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        assert [record['type'] for record in records] == ['project', 'file', 'file', 'request']
+        assert records[2] == {'type': 'file', 'path': 'b.md', 'extension': 'md', 'content': '# B\x1b\n'}
+        assert '\n' + json.dumps(records[1], ensure_ascii=False) in chunks
+
+    def test_xml_document(self, tmp_path, make_codebase):
+        """Test that markup is escaped and characters XML cannot hold are replaced."""
+        make_codebase(tmp_path / 'src', CODEBASE)
+        root = ElementTree.fromstring(generate_prompt(tmp_path / 'src', None, {'output_format': 'xml'}).encode())
+        files = root.find('files')
+        assert [(f.get('path'), f.get('extension')) for f in files] == [('a.py', 'py'), ('b.md', 'md')]
+        assert files[0].text == 'print("<a> & \'b\'")\n'
+        assert files[1].text == '# B\ufffd\n'
+        assert root.find('user_request') is None
+
+    def test_empty_and_counted(self, tmp_path):
+        """Test a document without files and that token counts cover the serialized records."""
+        (tmp_path / 'src').mkdir()
+        summary = RunSummary()
+        result = generate_prompt(tmp_path / 'src', None, {'output_format': 'json', 'token_count_format': 'raw'}, summary)
+        assert json.loads(result)['files'] == []
+        assert summary.prompt_tokens > 0
+
+    def test_unknown_format(self):
+        """Test that an unknown format name is rejected."""
+        with pytest.raises(ValueError):
+            get_format('yaml')
+
+
+class TestCLIOptionOutputFormatStructured:
+    """Test --output-format with structured formats."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_stream_ndjson(self):
+        """Test that NDJSON is streamed to the output file."""
+        with self.runner.isolated_filesystem():
+            with open('test.py', 'w') as f:
+                f.write('x = 1\n')
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '-F', 'ndjson', '--stream', '-O', 'out.ndjson', '--no-clipboard', 'Test']
+            )
+            assert result.exit_code == 0
+            with open('out.ndjson', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+            assert records[1] == {'type': 'file', 'path': 'test.py', 'extension': 'py', 'content': 'x = 1\n'}
+
+    def test_cli_template_conflict(self):
+        """Test that a custom template cannot be combined with a structured format."""
+        with self.runner.isolated_filesystem():
+            with open('custom.hbs', 'w') as f:
+                f.write('{{source_tree}}')
+
+            result = self.runner.invoke(main, ['--path', '.', '-F', 'xml', '-t', 'custom.hbs', 'Test'])
+            assert result.exit_code == 1
+            assert '--template cannot be combined with --output-format xml' in result.output
@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import time
+import pytest
+import code2prompt_cli
+from code2prompt_cli import (
+    Code2PromptError,
+    ConfigurationError,
+    GenerationError,
+    PromptGenerator,
+    RunSummary,
+)
+from code2prompt_cli import generator as generator_module
+from code2prompt_cli.gitutils import GitError
+from code2prompt_cli.pipeline import generate_prompt
+from code2prompt_cli.templates import TemplateError
+
+
+CODEBASE = {
+    'main.py': 'print("main")\n',
+    'util.py': 'def helper():\n    return 1\n',
+    'notes.txt': 'notes\n',
+}
+
+
+class TestPromptGenerator:
+    """Test the PromptGenerator Python API."""
+
+    def test_matches_pipeline(self, tmp_path, make_codebase):
+        """Test that generated prompts match the built-in pipeline with the same options."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        with PromptGenerator(tmp_path / 'code', include=['*.py'], line_numbers=True) as generator:
+            expected = generate_prompt(
+                tmp_path / 'code', 'Explain', {'include_patterns': ['*.py'], 'line_numbers': True}
+            )
+            assert generator.generate('Explain') == expected
+            assert ''.join(generator.iter_prompt('Explain')) == expected
+
+    def test_state_is_reused(self, tmp_path, make_codebase):
+        """Test that rendered blocks are served from the generator's cache on later calls."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        # Stat data older than the racy window can be trusted.
+        for path in (tmp_path / 'code').iterdir():
+            os.utime(path, (time.time() - 10, time.time() - 10))
+        with PromptGenerator(tmp_path / 'code', watch=False) as generator:
+            generator.generate(None)
+            hits = generator.state.cache.hits
+            generator.generate(None)
+            assert generator.state.cache.hits > hits
+
+    def test_sees_file_changes(self, tmp_path, make_codebase):
+        """Test that files added between calls show up in later prompts."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        with PromptGenerator(tmp_path / 'code') as generator:
+            generator.generate('Explain')
+            (tmp_path / 'code' / 'added.py').write_text('# Added file\n')
+            # Give the watcher thread a moment to deliver its events.
+            time.sleep(0.2)
+            assert '# Added file' in generator.generate('Explain')
+
+    def test_summary_and_options(self, tmp_path, make_codebase):
+        """Test that options map to the pipeline and the summary is filled in."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        summary = RunSummary()
+        with PromptGenerator(tmp_path / 'code', tokens='raw', approx_tokens=True, max_file_size='10') as generator:
+            result = generator.generate('Explain', summary)
+        assert '`util.py`' not in result
+        assert summary.prompt_tokens > 0
+        assert ('util.py', 'over --max-file-size') in summary.skipped_files
+
+    def test_invalid_configuration(self, tmp_path, make_codebase):
+        """Test that invalid options raise ConfigurationError instead of exiting."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        with pytest.raises(ConfigurationError):
+            PromptGenerator(tmp_path / 'missing')
+        with pytest.raises(ConfigurationError):
+            PromptGenerator(tmp_path / 'code', output_format='yaml')
+        with pytest.raises(ConfigurationError):
+            PromptGenerator(tmp_path / 'code', near_dup=1.5)
+        with pytest.raises(ConfigurationError):
+            PromptGenerator(tmp_path / 'code', max_total_bytes='lots')
+        with pytest.raises(ConfigurationError):
+            PromptGenerator(tmp_path / 'code', git_diff_branch='main')
+        for name in ('top_k', 'max_tokens', 'max_log_entries'):
+            with pytest.raises(ConfigurationError):
+                PromptGenerator(tmp_path / 'code', **{name: 0})
+        PromptGenerator(tmp_path / 'code', jobs=0, watch=False).close()
+        with PromptGenerator(tmp_path / 'code', top_k=2) as generator:
+            with pytest.raises(ConfigurationError):
+                generator.generate()
+
+    def test_generation_errors_are_typed(self, tmp_path, make_codebase):
+        """Test that template and filesystem failures raise Code2PromptError subclasses."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        (tmp_path / 'bad.hbs').write_text('{{#with x}}{{/with}}')
+        with PromptGenerator(tmp_path / 'code', template=tmp_path / 'bad.hbs') as generator:
+            with pytest.raises(TemplateError) as excinfo:
+                generator.generate()
+            assert isinstance(excinfo.value, ConfigurationError)
+
+        generator = PromptGenerator(tmp_path / 'code', watch=False)
+        generator.close()
+        with pytest.raises(GenerationError):
+            generator.generate()
+        assert issubclass(GenerationError, Code2PromptError)
+
+    def test_backend_errors_are_wrapped(self, tmp_path, monkeypatch, make_codebase):
+        """Test that database and other unexpected failures reach callers as GenerationError."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+
+        def locked(*args):
+            raise sqlite3.OperationalError('database is locked')
+            yield
+
+        monkeypatch.setattr(generator_module, '_iter_prompt', locked)
+        with PromptGenerator(tmp_path / 'code', watch=False) as generator:
+            with pytest.raises(GenerationError) as excinfo:
+                generator.generate()
+        assert isinstance(excinfo.value.__cause__, sqlite3.OperationalError)
+
+    def test_git_errors_are_wrapped(self, tmp_path, git_repo):
+        """Test that a git failure while generating reaches callers as GenerationError."""
+        git_repo(tmp_path / 'code', [('initial', CODEBASE, None)])
+        with PromptGenerator(tmp_path / 'code', git_log_branch=('main', 'nope'), watch=False) as generator:
+            with pytest.raises(GenerationError) as excinfo:
+                generator.generate()
+        assert isinstance(excinfo.value.__cause__, GitError)
+
+    def test_package_exports(self):
+        """Test that the public API is importable from the package."""
+        assert code2prompt_cli.PromptGenerator is PromptGenerator
+        with pytest.raises(AttributeError):
+            code2prompt_cli.Missing
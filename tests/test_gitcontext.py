@@ -0,0 +1,143 @@
+import json
+import xml.etree.ElementTree as ET
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli import gitcontext
+from code2prompt_cli.gitcontext import iter_git_context
+from code2prompt_cli.gitutils import GitError
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt, iter_prompt
+
+
+@pytest.fixture
+def repo(tmp_path, git_repo):
+    """Repository in tmp_path/repo whose branch feature renames a file and grows another."""
+    old_lines = ''.join(f'line {i}\n' for i in range(20))
+    repo = git_repo(tmp_path / 'repo', [('initial', {'old_name.py': old_lines, 'big.txt': 'start\n'}, None)])
+    repo.run('checkout', '-q', '-b', 'feature')
+    repo.run('mv', 'old_name.py', 'new_name.py')
+    repo.commit('rename', {'new_name.py': old_lines + 'line 20\n'})
+    repo.commit('grow', {'big.txt': ''.join(f'added line {i}\n' for i in range(500))})
+    repo.commit('third')
+    return repo
+
+
+class TestGitContext:
+    """Test reading git diffs and logs."""
+
+    def test_branch_diff_and_log(self, tmp_path, repo):
+        """Test renames, the per-file cap and the log limit."""
+        options = {
+            'git_diff_branches': ['main', 'feature'],
+            'git_log_branches': ['main', 'feature'],
+            'max_diff_bytes': 1024,
+            'max_log_entries': 2,
+        }
+        records = list(iter_git_context(tmp_path / 'repo', options, tmp_path / 'cache'))
+        diffs = {record.path: record for record in records if record.kind == 'diff'}
+        assert diffs['new_name.py'].old_path == 'old_name.py'
+        assert 'rename from old_name.py' in diffs['new_name.py'].text
+        assert '+line 20' in diffs['new_name.py'].text and diffs['new_name.py'].omitted == 0
+        big = diffs['big.txt']
+        assert big.omitted > 0 and len(big.text) <= 1024
+        assert big.full_text().endswith(f'[... {big.omitted} more lines of diff]')
+        log = records[-1]
+        assert log.kind == 'log' and log.source == 'main..feature'
+        assert [line.split(': ')[1] for line in log.text.splitlines()] == ['third', 'grow']
+        assert log.omitted == 1
+
+    def test_branch_comparison_cached(self, tmp_path, monkeypatch, repo):
+        """Test that comparing the same commits again is served from the cache."""
+        calls = []
+        stream_diff = gitcontext._stream_diff
+
+        def counting_stream_diff(*args):
+            calls.append(args[1])
+            return stream_diff(*args)
+
+        monkeypatch.setattr(gitcontext, '_stream_diff', counting_stream_diff)
+        options = {'git_diff_branches': ['main', 'feature']}
+        first = list(iter_git_context(tmp_path / 'repo', options, tmp_path / 'cache'))
+        second = list(iter_git_context(tmp_path / 'repo', options, tmp_path / 'cache'))
+        assert first == second and calls == ['main...feature']
+        # A new commit on the branch is a new comparison.
+        repo.commit('fourth')
+        list(iter_git_context(tmp_path / 'repo', options, tmp_path / 'cache'))
+        assert len(calls) == 2
+
+    def test_unknown_branch_is_reported_up_front(self, tmp_path, repo):
+        """Test that branches are resolved before any record or prompt chunk is produced."""
+        with pytest.raises(GitError):
+            iter_git_context(tmp_path / 'repo', {'git_log_branches': ['main', 'nope']}, tmp_path / 'cache')
+        chunks = iter_prompt(tmp_path / 'repo', 'Review', {'git_diff_branches': ['nope', 'feature']})
+        with pytest.raises(GitError):
+            next(chunks)
+
+    def test_uncommitted_diff_in_subdirectory(self, tmp_path, repo):
+        """Test that --diff shows only changes under the codebase, with relative paths."""
+        (tmp_path / 'repo' / 'sub').mkdir()
+        (tmp_path / 'repo' / 'sub' / 'a.py').write_text('print("a")\n')
+        repo.run('add', 'sub/a.py')
+        (tmp_path / 'repo' / 'big.txt').write_text('changed\n')
+        records = list(iter_git_context(tmp_path / 'repo' / 'sub', {'include_git_diff': True}, tmp_path / 'cache'))
+        assert [(record.source, record.path) for record in records] == [('HEAD', 'a.py')]
+
+
+class TestGitContextPipeline:
+    """Test git sections in generated prompts."""
+
+    def test_structured_formats(self, tmp_path, repo):
+        """Test that json and xml prompts with git records stay well formed."""
+        options = {
+            'git_diff_branches': ['main', 'feature'],
+            'git_log_branches': ['main', 'feature'],
+            'cache_dir': str(tmp_path / 'cache'),
+            'cache_max_bytes': 10 ** 6,
+        }
+        data = json.loads(generate_prompt(tmp_path / 'repo', 'Review', {**options, 'output_format': 'json'}))
+        assert [record['kind'] for record in data['git']] == ['diff', 'diff', 'log']
+        root = ET.fromstring(generate_prompt(tmp_path / 'repo', 'Review', {**options, 'output_format': 'xml'}))
+        renamed = root.find("git/diff[@path='new_name.py']")
+        assert renamed.get('old_path') == 'old_name.py'
+        assert root.find('git/log').get('source') == 'main..feature'
+
+    def test_markdown_summary(self, tmp_path, repo):
+        """Test the markdown sections and the summary of cut diffs."""
+        summary = RunSummary()
+        options = {
+            'git_diff_branches': ['main', 'feature'],
+            'max_diff_bytes': 1024,
+            'cache_dir': str(tmp_path / 'cache'),
+            'cache_max_bytes': 10 ** 6,
+        }
+        result = generate_prompt(tmp_path / 'repo', 'Review', options, summary)
+        assert 'Git Diff (main...feature):' in result and '```diff\ndiff --git a/big.txt' in result
+        assert result.index('Git Diff') < result.index('## User Request')
+        assert sorted(summary.diff_files) == ['big.txt', 'new_name.py']
+        assert summary.truncated_diffs == ['big.txt']
+
+
+class TestCLIOptionGitContext:
+    """Test the git diff and log options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_diff(self, tmp_path, repo):
+        """Test --diff and --max-diff-size."""
+        (repo.root / 'big.txt').write_text(''.join(f'edited {i}\n' for i in range(500)))
+        result = self.runner.invoke(main, [
+            '--path', str(repo.root), '--diff', '--max-diff-size', '1K', '--cache-dir', str(tmp_path / 'cache'),
+            '--no-clipboard', 'Review',
+        ])
+        assert result.exit_code == 0
+        assert 'Git Diff (HEAD):' in result.output and 'more lines of diff]' in result.output
+        assert 'Git diff: 1 files, 1 cut at the --max-diff-size limit' in result.output
+
+    def test_cli_unknown_branch(self, repo):
+        """Test that a branch that does not exist is reported."""
+        result = self.runner.invoke(main, [
+            '--path', str(repo.root), '--git-log-branch', 'main', 'nope', '--no-clipboard', 'Review',
+        ])
+        assert result.exit_code == 1
+        assert "'nope' does not name a commit" in result.output
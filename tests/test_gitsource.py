@@ -0,0 +1,117 @@
+import os
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.gitsource import GitTree
+from code2prompt_cli.gitutils import GitError
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.timings import Timings
+
+
+@pytest.fixture
+def repo(tmp_path, git_repo, make_codebase):
+    """Repository in tmp_path: tag v1, a second commit, then uncommitted changes."""
+    repo = git_repo(tmp_path, [('initial', {
+        '.gitignore': 'build/\n',
+        'src/app.py': 'print("v1")\n',
+        'src/util.py': 'def helper():\n    pass\n',
+        'README.md': '# Readme\n',
+    }, None)])
+    repo.run('tag', 'v1')
+    repo.commit('second', {'src/app.py': 'print("v2")\n', 'src/new.py': '# new\n'})
+    # Working tree clutter that --from-git never sees.
+    make_codebase(tmp_path, {'src/app.py': 'print("uncommitted")\n', 'scratch.txt': 'untracked notes\n'})
+    return repo
+
+
+class TestGitTree:
+    """Test listing and reading files from git objects."""
+
+    def test_list_files(self, tmp_path, repo):
+        """Test that tracked files are listed in walk order with their blob sizes."""
+        tree = GitTree(tmp_path, 'v1')
+        try:
+            entries = tree.list_files()
+            assert [entry.rel_path for entry in entries] == ['README.md', 'src/app.py', 'src/util.py']
+            assert [entry.rel_path for entry in tree.list_files(hidden=True)][0] == '.gitignore'
+            assert [entry.rel_path for entry in tree.list_files(reverse=True)] == [
+                'README.md', 'src/util.py', 'src/app.py'
+            ]
+            app = entries[1]
+            assert app.path == os.path.join(str(tmp_path), 'src', 'app.py')
+            assert app.size == len('print("v1")\n')
+            assert tree.read(app.blob) == b'print("v1")\n'
+        finally:
+            tree.close()
+
+    def test_subdirectory_and_index(self, tmp_path, repo):
+        """Test listing a codebase below the repository root, and the staging area."""
+        (tmp_path / 'src' / 'staged.py').write_text('# staged\n')
+        repo.run('add', 'src/staged.py')
+        tree = GitTree(tmp_path / 'src', 'INDEX')
+        try:
+            entries = tree.list_files()
+            assert [entry.rel_path for entry in entries] == ['app.py', 'new.py', 'staged.py', 'util.py']
+            assert tree.read(entries[0].blob) == b'print("v2")\n'
+        finally:
+            tree.close()
+
+    def test_unknown_ref(self, tmp_path, repo):
+        """Test that a ref that does not name a tree is rejected."""
+        with pytest.raises(GitError):
+            GitTree(tmp_path, 'no-such-branch')
+
+
+class TestFromGitPipeline:
+    """Test generating prompts from git objects."""
+
+    def test_prompt_from_ref(self, tmp_path, repo):
+        """Test that the prompt shows the committed contents and no untracked files."""
+        result = generate_prompt(tmp_path, None, {'from_git': 'v1'})
+        assert 'print("v1")' in result and 'print("uncommitted")' not in result
+        assert '`src/new.py`' not in result and 'scratch.txt' not in result
+        assert 'print("v2")' in generate_prompt(tmp_path, None, {'from_git': 'HEAD', 'jobs': 2})
+
+    def test_blob_cache(self, tmp_path, repo):
+        """Test that blocks are cached by blob ID, so unchanged files are served across refs."""
+        options = {'cache_dir': str(tmp_path / 'cache'), 'cache_max_bytes': 10 ** 6, 'include_patterns': ['src/*']}
+        generate_prompt(tmp_path, None, {**options, 'from_git': 'v1'})
+        summary = RunSummary()
+        timings = Timings()
+        result = generate_prompt(tmp_path, None, {**options, 'from_git': 'HEAD'}, summary, timings=timings)
+        assert 'print("v2")' in result and '# new' in result
+        assert summary.included_files == 3
+        # Only src/util.py is unchanged between the two commits.
+        assert timings.counters['cache_hits'] == 1 and timings.counters['cache_misses'] == 2
+
+    def test_dedup_by_blob(self, tmp_path, repo):
+        """Test that files with the same blob are emitted once."""
+        (tmp_path / 'src' / 'copy.py').write_text('def helper():\n    pass\n')
+        repo.run('add', '.')
+        summary = RunSummary()
+        generate_prompt(tmp_path, None, {'from_git': 'INDEX', 'dedup': True}, summary)
+        assert summary.duplicate_files == [('src/util.py', 'src/copy.py')]
+
+
+class TestCLIOptionFromGit:
+    """Test the --from-git option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_from_git(self, tmp_path, repo):
+        """Test generating a prompt for a tag without checking it out."""
+        result = self.runner.invoke(main, ['--path', str(tmp_path), '--from-git', 'v1', '--no-clipboard', 'Test'])
+        assert result.exit_code == 0
+        assert 'print("v1")' in result.output and 'untracked notes' not in result.output
+
+    def test_cli_from_git_errors(self, tmp_path, repo):
+        """Test an unknown ref and the options --from-git cannot be combined with."""
+        result = self.runner.invoke(main, ['--path', str(tmp_path), '--from-git', 'nope', '--no-clipboard', 'Test'])
+        assert result.exit_code == 1
+        assert "'nope' does not name a commit or tree" in result.output
+        result = self.runner.invoke(
+            main, ['--path', str(tmp_path), '--from-git', 'v1', '--incremental', str(tmp_path / 's.json'), 'Test']
+        )
+        assert result.exit_code == 1
+        assert '--incremental cannot be combined' in result.output
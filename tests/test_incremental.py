@@ -0,0 +1,113 @@
+import os
+from pathlib import Path
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+
+
+CODEBASE = {
+    'src/a.py': '# A version 1\n',
+    'src/b.py': '# B version 1\n',
+    'README.md': '# Readme\n',
+}
+
+
+class TestCLIOptionIncremental:
+    """Test --incremental option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_incremental_splices_changed_files(self, git_repo):
+        """Test that a second run picks up committed, modified, new and deleted files."""
+        with self.runner.isolated_filesystem():
+            repo = git_repo(Path.cwd())
+            repo.commit('initial', CODEBASE)
+            args = ['--path', '.', '--incremental', '.prompt-state.json', '--no-clipboard', 'Test incremental']
+            first = self.runner.invoke(main, args)
+            assert first.exit_code == 0
+            assert '# A version 1' in first.output
+            assert os.path.exists('.prompt-state.json')
+
+            with open('src/a.py', 'w') as f:
+                f.write('# A version 2\n')
+            repo.run('commit', '-q', '-am', 'update a')
+            with open('src/b.py', 'w') as f:
+                f.write('# B version 2\n')
+            with open('src/c.py', 'w') as f:
+                f.write('# C new\n')
+            os.remove('README.md')
+
+            second = self.runner.invoke(main, args)
+            assert second.exit_code == 0
+            assert 'Incremental: re-checked' in second.output
+            assert '# A version 2' in second.output
+            assert '# B version 2' in second.output
+            assert '# C new' in second.output
+            assert '# Readme' not in second.output
+
+            options = {'state_file': str(Path('.prompt-state.json').resolve())}
+            fresh = generate_prompt(Path('.').resolve(), 'Test incremental', {})
+            spliced = generate_prompt(Path('.').resolve(), 'Test incremental', options)
+            assert spliced == fresh
+
+    def test_incremental_reuses_unchanged_blocks(self, tmp_path, monkeypatch, git_repo):
+        """Test that only changed files are reported as re-checked."""
+        monkeypatch.chdir(tmp_path)
+        git_repo(tmp_path).commit('initial', CODEBASE)
+        options = {'state_file': str(tmp_path / 'state.json')}
+        generate_prompt(tmp_path, None, options)
+
+        with open('src/b.py', 'w') as f:
+            f.write('# B version 2\n')
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, options, summary)
+        assert summary.incremental_changed == 2  # src/b.py and the untracked state file
+        assert '# B version 2' in result and '# A version 1' in result
+
+    def test_full_directory_tree_invalidates_state(self, tmp_path, git_repo):
+        """Test that toggling the full tree re-renders it instead of reusing the saved one."""
+        git_repo(tmp_path).commit('initial', {**CODEBASE, 'docs/guide.md': '# Guide\n'})
+        # Without the full tree, the walk skips directories the include patterns cannot match.
+        options = {'state_file': str(tmp_path / 'state.json'), 'include_patterns': ['src/**']}
+        generate_prompt(tmp_path, None, options)
+
+        full = {**options, 'full_directory_tree': True}
+        result = generate_prompt(tmp_path, None, full)
+        assert 'guide.md' in result
+        assert result == generate_prompt(tmp_path, None, {key: full[key] for key in full if key != 'state_file'})
+
+    def test_ignore_file_changes_render_everything(self, tmp_path, git_repo):
+        """Test that edited ignore rules, inside or above the codebase, are not spliced around."""
+        files = {f'code/{path}': text for path, text in CODEBASE.items()}
+        repo = git_repo(tmp_path / 'repo', [('initial', files, None)])
+        codebase = repo.root / 'code'
+        options = {'state_file': str(tmp_path / 'state.json')}
+        generate_prompt(codebase, None, options)
+
+        (codebase / '.gitignore').write_text('src/a.py\n')
+        summary = RunSummary()
+        result = generate_prompt(codebase, None, options, summary)
+        assert '# A version 1' not in result and summary.incremental_changed is None
+
+        (repo.root / '.git' / 'info' / 'exclude').write_text('README.md\n')
+        summary = RunSummary()
+        result = generate_prompt(codebase, None, options, summary)
+        assert '# Readme' not in result and summary.incremental_changed is None
+        assert result == generate_prompt(codebase, None, {})
+
+    def test_cli_incremental_rejects_no_ignore(self):
+        """Test that --no-ignore cannot be combined with --incremental."""
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(main, ['--path', '.', '--incremental', 'state.json', '--no-ignore', 'Test'])
+            assert result.exit_code == 1
+            assert '--incremental cannot be combined' in result.output
+
+    def test_cli_incremental_requires_git(self):
+        """Test that --incremental outside a git repository reports an error."""
+        with self.runner.isolated_filesystem():
+            with open('test.py', 'w') as f:
+                f.write('# Test file\n')
+            result = self.runner.invoke(main, ['--path', '.', '--incremental', 'state.json', 'Test'])
+            assert result.exit_code == 1
+            assert 'not inside a git repository' in result.output
@@ -0,0 +1,77 @@
+import os
+from click.testing import CliRunner
+from code2prompt_cli.ingest import LARGE_FILE_BYTES, FileBody, copy_body, is_text_file, read_text
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import generate_prompt, iter_prompt
+
+
+def _large_text(lines=None):
+    line = 'SELECT * FROM orders WHERE id = 42; -- fixture ünïcode\n'
+    return line * (lines or LARGE_FILE_BYTES // len(line) + 10)
+
+
+class TestIngest:
+    """Test memory-mapped reading and pass-through copying."""
+
+    def test_read_text_large_and_binary(self, tmp_path):
+        """Test that large files decode from the mapping and binary heads are rejected."""
+        text_path = tmp_path / 'dump.sql'
+        text_path.write_text(_large_text(), encoding='utf-8')
+        assert read_text(str(text_path), text_path.stat().st_size) == _large_text()
+
+        binary_path = tmp_path / 'blob.bin'
+        binary_path.write_bytes(b'\x89PNG\0' + b'a' * LARGE_FILE_BYTES)
+        assert read_text(str(binary_path), binary_path.stat().st_size) is None
+        assert not is_text_file(str(binary_path))
+
+        invalid_path = tmp_path / 'latin1.txt'
+        invalid_path.write_bytes(b'a' * LARGE_FILE_BYTES + b'\xe9')
+        assert read_text(str(invalid_path), invalid_path.stat().st_size) is None
+        assert not is_text_file(str(invalid_path))
+
+    def test_copy_body_to_file_and_stream(self, tmp_path):
+        """Test that bodies copy identically through sendfile and the chunked fallback."""
+        source = tmp_path / 'dump.sql'
+        source.write_text(_large_text(), encoding='utf-8')
+        body = FileBody(str(source), source.stat().st_size)
+
+        with open(tmp_path / 'out.txt', 'w', encoding='utf-8') as out:
+            out.write('before\n')
+            copy_body(body, out)
+            out.write('\nafter')
+        assert (tmp_path / 'out.txt').read_text(encoding='utf-8') == 'before\n' + _large_text() + '\nafter'
+
+
+class TestPassthrough:
+    """Test pass-through of large files in streamed prompts."""
+
+    def test_iter_prompt_passthrough_matches_rendered(self, tmp_path):
+        """Test that joining pass-through chunks gives the same prompt as rendering."""
+        (tmp_path / 'dump.sql').write_text(_large_text(), encoding='utf-8')
+        (tmp_path / 'small.py').write_text('print(1)\n')
+        (tmp_path / 'blob.bin').write_bytes(b'\0' * (LARGE_FILE_BYTES + 1))
+
+        chunks = list(iter_prompt(tmp_path, 'Explain', {}, passthrough=True))
+        bodies = [chunk for chunk in chunks if isinstance(chunk, FileBody)]
+        assert [os.path.basename(body.path) for body in bodies] == ['dump.sql']
+
+        def load(chunk):
+            return open(chunk.path, encoding='utf-8').read() if isinstance(chunk, FileBody) else chunk
+
+        assert ''.join(map(load, chunks)) == generate_prompt(tmp_path, 'Explain', {})
+
+    def test_cli_stream_passthrough_output_file(self):
+        """Test that a streamed prompt with a large file equals the non-streamed one."""
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            os.makedirs('src')
+            with open('src/dump.sql', 'w', encoding='utf-8') as f:
+                f.write(_large_text())
+            with open('src/app.py', 'w') as f:
+                f.write('# App file\n')
+
+            args = ['--path', 'src', '--no-ignore', '--no-clipboard', 'Test']
+            assert runner.invoke(main, args + ['--stream', '-O', 'streamed.md']).exit_code == 0
+            assert runner.invoke(main, args + ['-O', 'buffered.md']).exit_code == 0
+            with open('streamed.md', encoding='utf-8') as streamed, open('buffered.md', encoding='utf-8') as buffered:
+                assert streamed.read() == buffered.read()
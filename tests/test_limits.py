@@ -0,0 +1,106 @@
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.defaults import parse_size
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.render import looks_binary
+
+
+CODEBASE = {
+    'a.py': 'a = 1\n',
+    'big.py': 'b = 2\n' * 1000,
+    'c.py': 'c = 3\n',
+    'image.png': b'\x89PNG\r\n\x1a\n' + b'x' * 100,
+    'paper.pdf': b'%PDF-1.7 text-looking header\n',
+}
+
+
+class TestBinarySniffing:
+    """Test binary detection from the first block of a file."""
+
+    def test_looks_binary(self):
+        """Test signatures, NUL bytes and invalid UTF-8, but not a cut-off trailing character."""
+        assert looks_binary(b'%PDF-1.4\n')
+        assert looks_binary(b'\x7fELF\x02\x01')
+        assert looks_binary(b'text\0more')
+        assert looks_binary(b'caf\xe9 latin-1')
+        assert not looks_binary('plain text ü'.encode())
+        assert not looks_binary('ü'.encode()[:1])
+
+    def test_parse_size(self):
+        """Test plain byte counts and binary suffixes."""
+        assert parse_size(1500) == 1500
+        assert parse_size('1500') == 1500
+        assert parse_size('4K') == 4096
+        assert parse_size('1.5mb') == 1536 * 1024
+        assert parse_size('2G') == 2 * 1024 ** 3
+        with pytest.raises(ValueError):
+            parse_size('lots')
+        with pytest.raises(ValueError):
+            parse_size('0')
+
+
+class TestSizeLimits:
+    """Test --max-file-size and --max-total-bytes in the built-in pipeline."""
+
+    def test_binary_files_are_reported(self, tmp_path, make_codebase):
+        """Test that files rejected as binary are listed as skipped."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, {}, summary)
+        assert '`a.py`' in result and '`image.png`' not in result and '`paper.pdf`' not in result
+        assert sorted(summary.skipped_files) == [('image.png', 'binary'), ('paper.pdf', 'binary')]
+
+    def test_max_file_size(self, tmp_path, make_codebase):
+        """Test that files over the limit are skipped without affecting the others."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, {'include_patterns': ['*.py'], 'max_file_size': 1024}, summary)
+        assert '`a.py`' in result and '`c.py`' in result
+        assert 'big.py' not in result
+        assert summary.skipped_files == [('big.py', 'over --max-file-size')]
+
+    def test_max_total_bytes(self, tmp_path, make_codebase):
+        """Test that a file that does not fit is skipped and smaller later files still fit."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        result = generate_prompt(tmp_path, None, {'include_patterns': ['*.py'], 'max_total_bytes': 100}, summary)
+        assert '`a.py`' in result and '`c.py`' in result
+        assert summary.skipped_files == [('big.py', 'over --max-total-bytes')]
+
+
+class TestCLIOptionSizeLimits:
+    """Test --max-file-size and --max-total-bytes options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_skipped_files_summary(self):
+        """Test that skipped files are summarized after the prompt."""
+        with self.runner.isolated_filesystem():
+            with open('small.py', 'w') as f:
+                f.write('x = 1\n')
+            with open('large.py', 'w') as f:
+                f.write('y = 2\n' * 2000)
+
+            result = self.runner.invoke(main, ['--path', '.', '--max-file-size', '4K', '--no-clipboard', 'Test'])
+            assert result.exit_code == 0
+            assert 'x = 1' in result.output
+            assert 'y = 2' not in result.output
+            assert 'Skipped 1 files: 1 over --max-file-size' in result.output
+            assert 'skipped (over --max-file-size): large.py' in result.output
+
+    def test_cli_invalid_size(self):
+        """Test that malformed sizes are rejected by argument parsing."""
+        result = self.runner.invoke(main, ['--max-total-bytes', 'huge', 'Test'])
+        assert result.exit_code == 2
+        assert 'invalid size' in result.output
+
+    def test_cli_incremental_rejects_total_limit(self):
+        """Test that --max-total-bytes cannot be combined with --incremental."""
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(
+                main, ['--path', '.', '--incremental', 'state.json', '--max-total-bytes', '1M', 'Test']
+            )
+            assert result.exit_code == 1
+            assert '--incremental cannot be combined' in result.output
@@ -0,0 +1,104 @@
+from click.testing import CliRunner
+from code2prompt_cli import gitlog
+from code2prompt_cli.main import main
+from code2prompt_cli.ordering import sort_files
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.walker import FileEntry, walk_files
+
+
+HISTORY = [
+    ('initial', {'src/old.py': '# old\n' * 30, 'src/new.py': '# new\n' * 30, 'README.md': '# Readme\n' * 20},
+     1_600_000_000),
+    ('update new', {'src/new.py': '# new, changed\n' * 12}, 1_700_000_000),
+]
+
+
+class TestSortFiles:
+    """Test the --sort orders."""
+
+    def test_stat_orders(self):
+        """Test that date and size orders use the walk's stat data and keep walk order on ties."""
+        files = [FileEntry('/r/a', 'a', 30, 2), FileEntry('/r/b', 'b', 10, 3), FileEntry('/r/c', 'c', 30, 1)]
+        assert [e.rel_path for e in sort_files(files, 'size_asc')] == ['b', 'a', 'c']
+        assert [e.rel_path for e in sort_files(files, 'size_desc')] == ['a', 'c', 'b']
+        assert [e.rel_path for e in sort_files(files, 'date_asc')] == ['c', 'a', 'b']
+        assert [e.rel_path for e in sort_files(files, 'date_desc')] == ['b', 'a', 'c']
+        assert sort_files(files, 'name_asc') is files
+
+    def test_name_desc_walk(self, tmp_path):
+        """Test that the reversed walk lists each directory in descending name order."""
+        (tmp_path / 'a').mkdir()
+        (tmp_path / 'b').mkdir()
+        for rel_path in ('a/x.py', 'a/y.py', 'b/z.py', 'm.py', 'n.py'):
+            (tmp_path / rel_path).write_text('#\n')
+        paths = [entry.rel_path for entry in walk_files(tmp_path, reverse=True)]
+        assert paths == ['n.py', 'm.py', 'b/z.py', 'a/y.py', 'a/x.py']
+
+    def test_git_recent(self, tmp_path, git_repo):
+        """Test that uncommitted files come first, then the most recently committed."""
+        git_repo(tmp_path / 'repo', HISTORY)
+        (tmp_path / 'repo' / 'src' / 'draft.py').write_text('# draft\n')
+        options = {'sort_order': 'git_recent', 'cache_dir': str(tmp_path / 'cache'), 'cache_max_bytes': 10 ** 6}
+        result = generate_prompt(tmp_path / 'repo' / 'src', None, options)
+        positions = [result.index(f'`{name}`') for name in ('draft.py', 'new.py', 'old.py')]
+        assert positions == sorted(positions)
+
+    def test_git_recent_budget_rank(self, tmp_path, monkeypatch, git_repo):
+        """Test that rank git_recent keeps the most recently committed file within the budget."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        git_repo(tmp_path / 'repo', HISTORY)
+        summary = RunSummary()
+        options = {'max_tokens': 130, 'rank': 'git_recent', 'approx_tokens': True}
+        result = generate_prompt(tmp_path / 'repo', None, options, summary)
+        assert '`src/new.py`' in result
+        assert sorted(summary.dropped_files) == ['README.md', 'src/old.py']
+
+    def test_git_log_index_is_incremental(self, tmp_path, monkeypatch, git_repo):
+        """Test that only commits after the indexed one are read from the log."""
+        repo = git_repo(tmp_path / 'repo', HISTORY)
+        assert gitlog.commit_times(tmp_path / 'repo', tmp_path / 'cache') == {
+            'src/old.py': 1_600_000_000, 'src/new.py': 1_700_000_000, 'README.md': 1_600_000_000
+        }
+        repo.commit('update old', {'src/old.py': '# old, changed\n' * 12}, date=1_800_000_000)
+
+        read = []
+        read_log = gitlog._read_log
+
+        def counting_read_log(repo, revisions):
+            read.append(revisions)
+            return read_log(repo, revisions)
+
+        monkeypatch.setattr(gitlog, '_read_log', counting_read_log)
+        times = gitlog.commit_times(tmp_path / 'repo' / 'src', tmp_path / 'cache')
+        assert times == {'old.py': 1_800_000_000, 'new.py': 1_700_000_000}
+        assert len(read) == 1 and '..' in read[0]
+        gitlog.commit_times(tmp_path / 'repo', tmp_path / 'cache')
+        assert len(read) == 1
+
+
+class TestCLIOptionSortOrders:
+    """Test the size- and recency-based --sort orders."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_sort_size_desc_with_byte_budget(self):
+        """Test that --max-total-bytes fills in sort order."""
+        with self.runner.isolated_filesystem():
+            for name, size in (('a.py', 10), ('b.py', 300), ('c.py', 200)):
+                with open(name, 'w') as f:
+                    f.write('#' * (size - 1) + '\n')
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--sort', 'size_desc', '--max-total-bytes', '350', '--no-clipboard', 'Test']
+            )
+            assert result.exit_code == 0
+            assert result.output.index('`b.py`') < result.output.index('`a.py`')
+            assert '`c.py`:' not in result.output
+
+    def test_cli_incremental_rejects_sort(self):
+        """Test that --sort cannot be combined with --incremental."""
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(main, ['--path', '.', '--incremental', 's.json', '--sort', 'size_asc', 'Test'])
+            assert result.exit_code == 1
+            assert '--incremental cannot be combined' in result.output
@@ -0,0 +1,91 @@
+from fnmatch import fnmatchcase
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.patterns import PatternMatcher
+import os
+
+PATHS = [
+    'main.py', 'README.md', 'setup.cfg',
+    'src/app.py', 'src/app.js', 'src/util/helpers.py', 'src/util/data.json',
+    'build/out.js', 'build/lib/mod.py', 'docs/index.md', 'docs/api/ref.md',
+    'node_modules/pkg/index.js', 'web/node_modules/pkg/index.js', 'tests/test_app.py',
+]
+
+PATTERN_SETS = [
+    ([], []),
+    (['*.py'], []),
+    ([], ['*.js', 'build/**']),
+    (['src/*'], ['*.json']),
+    (['src/**/*.py', 'docs/index.md'], []),
+    (['*.py'], ['build/*', '*/node_modules/*', 'tests/test_?pp.py']),
+    (['build/lib/mod.py'], ['build/**']),
+    (['README.md', 'docs/[a-z]*/*.md'], ['docs/api/*']),
+]
+
+
+def _reference(rel_path, include, exclude, include_priority):
+    """The straightforward definition the compiled matcher must agree with."""
+    included = any(fnmatchcase(rel_path, pattern) for pattern in include)
+    excluded = any(fnmatchcase(rel_path, pattern) for pattern in exclude)
+    if included and excluded:
+        return include_priority
+    if excluded:
+        return False
+    return included or not include
+
+
+class TestPatternMatcher:
+    """Test the compiled include/exclude matcher."""
+
+    def test_matches_agree_with_fnmatch(self):
+        """Test that compiled matching gives the same answers as pattern-by-pattern fnmatch."""
+        for include, exclude in PATTERN_SETS:
+            for include_priority in (False, True):
+                matcher = PatternMatcher(include, exclude, include_priority)
+                for rel_path in PATHS:
+                    expected = _reference(rel_path, include, exclude, include_priority)
+                    assert matcher.matches(rel_path) == expected, (rel_path, include, exclude)
+
+    def test_pruned_directories_contain_no_selected_files(self):
+        """Test that directory pruning never hides a file that would be selected."""
+        directories = {path.rsplit('/', depth)[0] for path in PATHS for depth in (1, 2) if '/' in path}
+        for include, exclude in PATTERN_SETS:
+            for include_priority in (False, True):
+                matcher = PatternMatcher(include, exclude, include_priority)
+                for directory in directories:
+                    if matcher.prunes_dir(directory):
+                        below = [path for path in PATHS if path.startswith(directory + '/')]
+                        assert not any(matcher.matches(path) for path in below), (directory, include, exclude)
+
+    def test_prunes_excluded_and_unreachable_directories(self):
+        """Test that excluded subtrees and directories outside the include prefixes are pruned."""
+        matcher = PatternMatcher(['src/**/*.py'], ['src/vendor/**'])
+        assert matcher.prunes_dir('docs')
+        assert matcher.prunes_dir('src/vendor')
+        assert not matcher.prunes_dir('src')
+        assert not matcher.prunes_dir('src/util')
+        assert not PatternMatcher(['*.py'], []).prunes_dir('docs')
+
+
+class TestCLIPatternPruning:
+    """Test include/exclude handling through the built-in pipeline."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_exclude_directory_pattern(self):
+        """Test that a directory exclude pattern removes the whole subtree."""
+        with self.runner.isolated_filesystem():
+            os.makedirs('vendor/lib')
+            with open('app.py', 'w') as f:
+                f.write('# App file\n')
+            with open('vendor/lib/dep.py', 'w') as f:
+                f.write('# Vendored file\n')
+
+            result = self.runner.invoke(main, [
+                '--path', '.', '--no-ignore', '--no-clipboard', '-e', 'vendor/**', 'Test prune'
+            ])
+            assert result.exit_code == 0
+            assert '# App file' in result.output
+            assert '# Vendored file' not in result.output
+            assert 'vendor' not in result.output
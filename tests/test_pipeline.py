@@ -0,0 +1,86 @@
+from pathlib import Path
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import generate_prompt, iter_prompt
+
+
+CODEBASE = {
+    'main.py': 'print("main")\n',
+    'pkg/util.py': 'def util():\n    return 1\n',
+    'README.md': '# Readme\n',
+}
+
+
+class TestPipeline:
+    """Test the built-in prompt generation pipeline."""
+
+    def test_iter_prompt_yields_sections(self, tmp_path, make_codebase):
+        """Test that the header, each file and the footer are separate chunks."""
+        make_codebase(tmp_path, CODEBASE)
+        chunks = list(iter_prompt(tmp_path, 'Explain', {}))
+        assert chunks[0].startswith('Project Path:')
+        assert 'Source Tree:' in chunks[0]
+        assert len(chunks) == 5
+        assert '## User Request\nExplain' in chunks[-1]
+        assert ''.join(chunks) == generate_prompt(tmp_path, 'Explain', {})
+
+    def test_include_patterns_filter_files(self, tmp_path, make_codebase):
+        """Test that include patterns select files and the tree follows the selection."""
+        make_codebase(tmp_path, CODEBASE)
+        result = generate_prompt(tmp_path, None, {'include_patterns': ['*.py']})
+        assert '`pkg/util.py`' in result
+        assert '# Readme' not in result
+        assert 'README.md' not in result
+
+
+class TestCLIOptionStream:
+    """Test --stream option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_stream_to_stdout(self, make_codebase):
+        """Test that --stream writes the prompt to stdout."""
+        with self.runner.isolated_filesystem():
+            make_codebase(Path('.'), CODEBASE)
+            result = self.runner.invoke(main, ['--path', '.', '--stream', 'Test stream'])
+            assert result.exit_code == 0
+            assert 'print("main")' in result.output
+            assert 'User Request' in result.output
+            assert 'Clipboard copy skipped in stream mode.' in result.output
+
+    def test_cli_stream_to_output_file(self, make_codebase):
+        """Test that --stream with --output-file writes the same prompt as the pipeline."""
+        with self.runner.isolated_filesystem():
+            make_codebase(Path('.'), CODEBASE)
+            result = self.runner.invoke(main, [
+                '--path', '.', '--stream', '--no-clipboard', '-O', 'out.md', 'Test stream'
+            ])
+            assert result.exit_code == 0
+            assert 'Prompt written to: out.md' in result.output
+            with open('out.md', encoding='utf-8') as f:
+                written = f.read()
+            assert 'out.md' not in written
+            options = {'output_file': str(Path('out.md').resolve())}
+            assert written == generate_prompt(Path('.').resolve(), 'Test stream', options)
+
+
+class TestCLIOptionJobs:
+    """Test --jobs option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_jobs_preserves_order(self):
+        """Test that parallel rendering produces the same prompt as a serial run."""
+        with self.runner.isolated_filesystem():
+            for index in range(40):
+                with open(f'file_{index:02d}.py', 'w') as f:
+                    f.write(f'value = {index}\n')
+
+            serial = self.runner.invoke(main, ['--path', '.', '--jobs', '1', '--no-clipboard', 'Test jobs'])
+            parallel = self.runner.invoke(main, ['--path', '.', '--jobs', '8', '--no-clipboard', 'Test jobs'])
+            assert serial.exit_code == 0
+            assert parallel.exit_code == 0
+            assert serial.output == parallel.output
+            assert parallel.output.index('value = 3\n') < parallel.output.index('value = 30\n')
@@ -0,0 +1,91 @@
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.errors import ConfigurationError
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.roots import plan_roots
+
+
+def _make_estate(root):
+    for service in ('auth', 'billing'):
+        (root / 'services' / service / 'vendor').mkdir(parents=True)
+        (root / 'services' / service / 'main.py').write_text(f'# {service} main\n')
+        (root / 'services' / service / 'vendor' / 'lib.py').write_text(f'# {service} vendored\n')
+    (root / 'services' / 'auth' / '.gitignore').write_text('secrets.txt\n')
+    (root / 'services' / 'auth' / 'secrets.txt').write_text('hunter2\n')
+    (root / 'services' / 'billing' / 'secrets.txt').write_text('billing secrets\n')
+
+
+class TestPlanRoots:
+    """Test labelling roots and splitting their patterns."""
+
+    def test_labels_and_patterns(self, tmp_path):
+        """Test that roots are labelled relative to their common ancestor and own their prefixed patterns."""
+        common, roots, include, exclude = plan_roots(
+            [tmp_path / 'a' / 'auth', tmp_path / 'b' / 'billing'],
+            ['*.py', 'a/auth:src/**'],
+            ['b/billing:vendor/**', 'other:x'],
+        )
+        assert common == tmp_path
+        assert [(root['label'], root['include_patterns'], root['exclude_patterns']) for root in roots] == [
+            ('a/auth', ['src/**'], []), ('b/billing', [], ['vendor/**'])
+        ]
+        assert include == ['*.py'] and exclude == ['other:x']
+
+    def test_overlapping_roots(self, tmp_path):
+        """Test that a root inside another root is rejected."""
+        with pytest.raises(ConfigurationError):
+            plan_roots([tmp_path, tmp_path / 'sub'], [], [])
+        with pytest.raises(ConfigurationError):
+            plan_roots([tmp_path / 'x', tmp_path / 'x'], [], [])
+
+
+class TestMultiRootPipeline:
+    """Test merging several roots into one prompt."""
+
+    def test_merged_prompt(self, tmp_path):
+        """Test the combined tree, per-root ignore files and per-root patterns."""
+        _make_estate(tmp_path)
+        common, roots, include, exclude = plan_roots(
+            [tmp_path / 'services' / 'auth', tmp_path / 'services' / 'billing'], [], ['billing:vendor/**']
+        )
+        summary = RunSummary()
+        options = {'roots': roots, 'include_patterns': include, 'exclude_patterns': exclude, 'jobs': 2}
+        result = generate_prompt(common, 'Review', options, summary)
+        assert 'Project Path: ' + str(tmp_path / 'services') in result
+        assert '`auth/main.py`' in result and '`auth/vendor/lib.py`' in result
+        assert '`billing/main.py`' in result and '`billing/vendor/lib.py`' not in result
+        # Each root keeps its own .gitignore.
+        assert 'hunter2' not in result and 'billing secrets' in result
+        assert '├── auth\n│   ├── main.py' in result
+        assert result.index('`auth/main.py`') < result.index('`billing/main.py`')
+        assert summary.included_files == 4
+
+
+class TestCLIOptionMultiplePaths:
+    """Test repeating --path."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_multiple_paths(self, tmp_path):
+        """Test that several roots are merged into one prompt."""
+        _make_estate(tmp_path)
+        result = self.runner.invoke(main, [
+            '--path', str(tmp_path / 'services' / 'auth'), '--path', str(tmp_path / 'services' / 'billing'),
+            '-i', 'auth:main.py', '--no-clipboard', 'Review',
+        ])
+        assert result.exit_code == 0
+        assert 'Generating prompt for 2 codebases under: ' + str(tmp_path / 'services') in result.output
+        assert '`auth/main.py`' in result.output and '`auth/vendor/lib.py`' not in result.output
+        assert '`billing/vendor/lib.py`' in result.output
+
+    def test_cli_multiple_paths_conflicts(self, tmp_path):
+        """Test that nested roots and multi-root daemon use are rejected."""
+        _make_estate(tmp_path)
+        result = self.runner.invoke(main, ['--path', str(tmp_path), '--path', str(tmp_path / 'services'), 'Test'])
+        assert result.exit_code == 1
+        assert 'overlap' in result.output
+        result = self.runner.invoke(main, ['--path', str(tmp_path), '--path', str(tmp_path), '--serve'])
+        assert result.exit_code == 1
+        assert 'several --path roots cannot be combined' in result.output
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import RunSummary, generate_prompt
+from code2prompt_cli.search import SearchIndex, document_terms, split_terms
+from code2prompt_cli.walker import walk_files
+
+
+CODEBASE = {
+    'src/rate_limiter.py': (
+        'class TokenBucket:\n    def refill(self, now):\n        self.tokens = min(self.capacity, now)\n'
+    ),
+    'src/config.py': 'def parse_config(path):\n    return {"path": path}\n',
+    'src/http_client.py': 'def send_request(url):\n    return fetch(url)\n',
+    'README.md': '# Service\nHandles requests with a bucket of tokens.\n',
+}
+
+
+class TestSearchIndex:
+    """Test tokenizing, indexing and BM25 ranking."""
+
+    def test_split_terms(self):
+        """Test that identifiers are split at camelCase and snake_case boundaries."""
+        assert list(split_terms('parseHTTPResponse rate_limiter')) == [
+            'parsehttpresponse', 'parse', 'http', 'response', 'rate_limiter', 'rate', 'limiter'
+        ]
+        assert list(split_terms('How does the x work')) == ['work']
+
+    def test_symbols_and_paths_are_weighted(self, tmp_path, make_codebase):
+        """Test that definitions and path components count more than plain mentions."""
+        make_codebase(tmp_path, CODEBASE)
+        entry = next(entry for entry in walk_files(tmp_path) if entry.rel_path == 'src/rate_limiter.py')
+        terms = document_terms(entry)
+        assert terms['bucket'] == 3 and terms['refill'] == 3
+        assert terms['limiter'] == 3 and terms['capacity'] == 1
+
+    def test_index_is_persistent_and_incremental(self, tmp_path, make_codebase):
+        """Test that only new or changed files are re-read and deleted files are pruned."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        files = list(walk_files(tmp_path / 'code'))
+        index = SearchIndex(tmp_path / 'cache')
+        for entry in index.stale(files):
+            index.store(entry, document_terms(entry))
+        index.close()
+
+        # Stat data older than the racy window can be trusted.
+        for entry in files:
+            os.utime(entry.path, ns=(entry.mtime_ns - 10 ** 10, entry.mtime_ns - 10 ** 10))
+        files = list(walk_files(tmp_path / 'code'))
+        index = SearchIndex(tmp_path / 'cache')
+        for entry in index.stale(files):
+            index.store(entry, document_terms(entry))
+        assert index.stale(files) == []
+        ranked = index.rank(files, 'How does the token bucket refill?')
+        assert [entry.rel_path for entry, _ in ranked] == ['src/rate_limiter.py', 'README.md']
+
+        os.remove(tmp_path / 'code' / 'README.md')
+        index.prune(tmp_path / 'code', [entry.path for entry in files if entry.rel_path != 'README.md'])
+        assert [entry.rel_path for entry, _ in index.rank(files, 'bucket')] == ['src/rate_limiter.py']
+        index.close()
+
+
+    def test_updates_do_not_hold_the_write_lock(self, tmp_path, monkeypatch, make_codebase):
+        """Test that another run can write to the index while one is still open."""
+        monkeypatch.setattr('code2prompt_cli.search._COMMIT_BATCH', 2)
+        make_codebase(tmp_path / 'code', CODEBASE)
+        files = list(walk_files(tmp_path / 'code'))
+        index = SearchIndex(tmp_path / 'cache')
+        for entry in files[:2]:
+            index.store(entry, document_terms(entry))
+        other = sqlite3.connect(tmp_path / 'cache' / 'search_index.sqlite3', timeout=0)
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+        index.store(files[2], document_terms(files[2]))
+        index.prune(tmp_path / 'code', [entry.path for entry in files])
+        other.execute('BEGIN IMMEDIATE')
+        other.rollback()
+        other.close()
+        index.close()
+
+
+class TestTopK:
+    """Test --top-k in the built-in pipeline."""
+
+    def test_top_k_keeps_relevant_files_in_order(self, tmp_path, make_codebase):
+        """Test that only matching files are kept, at most K, in traversal order."""
+        make_codebase(tmp_path / 'code', CODEBASE)
+        summary = RunSummary()
+        options = {'top_k': 2, 'cache_dir': str(tmp_path / 'cache'), 'cache_max_bytes': 10 ** 6}
+        result = generate_prompt(tmp_path / 'code', 'Where are HTTP requests sent and the config parsed?', options, summary)
+        assert '`src/config.py`' in result and '`src/http_client.py`' in result
+        assert '`src/rate_limiter.py`' not in result
+        assert result.index('`src/config.py`') < result.index('`src/http_client.py`')
+        assert summary.relevance_candidates == 4
+        assert len(summary.relevant_files) == 2
+
+
+class TestCLIOptionTopK:
+    """Test the --top-k option."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_top_k(self, monkeypatch, tmp_path):
+        """Test that the ranking is summarized after the prompt."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        with self.runner.isolated_filesystem():
+            with open('billing.py', 'w') as f:
+                f.write('def charge_invoice(invoice):\n    pass\n')
+            with open('search.py', 'w') as f:
+                f.write('def query_index(q):\n    pass\n')
+
+            result = self.runner.invoke(main, ['--path', '.', '--top-k', '5', '--no-clipboard', 'How is an invoice charged?'])
+            assert result.exit_code == 0
+            assert '`billing.py`' in result.output and '`search.py`' not in result.output
+            assert 'Relevance: kept 1 of 2 files matching the prompt' in result.output
+
+    def test_cli_top_k_requires_prompt(self):
+        """Test that --top-k without prompt text is rejected."""
+        result = self.runner.invoke(main, ['--top-k', '3', '-i', '*.py'])
+        assert result.exit_code == 1
+        assert '--top-k needs a prompt text' in result.output
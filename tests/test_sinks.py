@@ -0,0 +1,123 @@
+import bz2
+import gzip
+import lzma
+import time
+import pytest
+import pyperclip
+from click.testing import CliRunner
+from code2prompt_cli.ingest import LARGE_FILE_BYTES
+from code2prompt_cli.main import main
+from code2prompt_cli.sinks import ClipboardSink, FileSink, Sink, SinkError, open_output, write_to_sinks
+
+
+class _ListSink(Sink):
+    def __init__(self, delay=0.0, fail_on=None):
+        self.chunks = []
+        self.closed = False
+        self.delay = delay
+        self.fail_on = fail_on
+
+    def write(self, chunk):
+        if chunk == self.fail_on:
+            raise OSError('disk full')
+        time.sleep(self.delay)
+        self.chunks.append(chunk)
+
+    def close(self):
+        self.closed = True
+
+
+class TestSinks:
+    """Test output sinks and concurrent writing."""
+
+    @pytest.mark.parametrize('suffix', ['.gz', '.bz2', '.xz'])
+    def test_compressed_output_round_trip(self, tmp_path, suffix):
+        """Test that output files are compressed according to their suffix."""
+        path = tmp_path / f'prompt.md{suffix}'
+        with open_output(path) as f:
+            f.write('ünïcode prompt\n' * 100)
+        assert path.read_bytes()[:20] != b'\xc3\xbcn\xc3\xaf'
+        opener = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}[suffix]
+        with opener(path, 'rt', encoding='utf-8') as f:
+            assert f.read() == 'ünïcode prompt\n' * 100
+
+    def test_sinks_are_independent(self):
+        """Test that every sink gets every chunk and one failing sink does not stop the others."""
+        slow, failing = _ListSink(delay=0.01), _ListSink(fail_on='b')
+        errors = write_to_sinks(['a', 'b', 'c'], [slow, failing])
+        assert slow.chunks == ['a', 'b', 'c'] and slow.closed
+        assert failing.chunks == ['a'] and failing.closed
+        assert errors[0] is None and isinstance(errors[1], OSError)
+
+    def test_incomplete_prompt_is_not_copied(self, monkeypatch):
+        """Test that a failure while producing the prompt closes sinks and skips the clipboard."""
+        copies = []
+        monkeypatch.setattr(pyperclip, 'copy', copies.append)
+        output = _ListSink()
+
+        def chunks():
+            yield 'partial'
+            raise RuntimeError('walk failed')
+
+        with pytest.raises(RuntimeError):
+            write_to_sinks(chunks(), [output, ClipboardSink(timeout=1)])
+        assert output.closed
+        assert copies == []
+
+    def test_clipboard_timeout(self, monkeypatch):
+        """Test that a hanging clipboard helper is abandoned after the timeout."""
+        monkeypatch.setattr(pyperclip, 'copy', lambda text: time.sleep(5))
+        output = _ListSink()
+        start = time.monotonic()
+        errors = write_to_sinks(['prompt'], [output, ClipboardSink(timeout=0.1)])
+        assert time.monotonic() - start < 2
+        assert output.chunks == ['prompt']
+        assert isinstance(errors[1], SinkError)
+        assert 'timed out' in str(errors[1])
+
+    def test_file_sink_zst_requires_zstandard(self, tmp_path):
+        """Test that .zst output fails clearly when zstandard is missing."""
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            with pytest.raises(SinkError, match='zstandard'):
+                FileSink(tmp_path / 'prompt.md.zst')
+        else:
+            pytest.skip('zstandard is installed')
+
+
+class TestCLIOptionOutputSinks:
+    """Test compressed output files and --clipboard-timeout."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_stream_passthrough_to_gzip(self):
+        """Test that pass-through file bodies are compressed rather than copied raw."""
+        with self.runner.isolated_filesystem():
+            line = 'INSERT INTO t VALUES (1);\n'
+            with open('dump.sql', 'w') as f:
+                f.write(line * (LARGE_FILE_BYTES // len(line) + 10))
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--no-ignore', '--stream', '-O', 'out.md.gz', '--no-clipboard', 'Test']
+            )
+            assert result.exit_code == 0
+            with gzip.open('out.md.gz', 'rt', encoding='utf-8') as f:
+                prompt = f.read()
+            assert prompt.count(line) == LARGE_FILE_BYTES // len(line) + 10
+            assert prompt.endswith('please ask the user.')
+
+    def test_cli_clipboard_timeout(self, monkeypatch):
+        """Test that a hanging clipboard copy becomes a warning after the timeout."""
+        monkeypatch.setattr(pyperclip, 'copy', lambda text: time.sleep(5))
+        with self.runner.isolated_filesystem():
+            with open('test.py', 'w') as f:
+                f.write('x = 1\n')
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--no-ignore', '--clipboard-timeout', '0.1', '-O', 'out.md', 'Test']
+            )
+            assert result.exit_code == 0
+            assert 'Prompt written to: out.md' in result.output
+            assert 'Warning: Could not copy to clipboard: clipboard copy timed out after 0.1 s' in result.output
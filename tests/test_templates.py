@@ -0,0 +1,122 @@
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import generate_prompt, iter_prompt
+from code2prompt_cli.templates import TemplateError, load_template, translate_handlebars
+
+
+CODEBASE = {
+    'a.py': 'a = 1\n',
+    'b.md': '# B\n',
+}
+
+
+class TestHandlebarsTranslation:
+    """Test translation of code2prompt's Handlebars subset to Jinja2."""
+
+    def test_variables_blocks_and_comments(self):
+        """Test each/if/unless/else, item paths, @index, ../ and comments."""
+        source = (
+            "{{!-- header --}}{{absolute_code_path}}\n"
+            "{{#each files}}{{@index}}:{{path}}:{{{code}}}:{{../source_tree}}{{else}}none{{/each}}\n"
+            "{{#unless user_request}}no request{{/unless}}"
+        )
+        assert translate_handlebars(source) == (
+            "{{ absolute_code_path }}\n"
+            "{% for _item1 in files %}{{ loop.index0 }}:{{ _item1.path }}:{{ _item1.code }}:"
+            "{{ source_tree }}{% else %}none{% endfor %}\n"
+            "{% if not user_request %}no request{% endif %}"
+        )
+
+    def test_standalone_block_lines_are_removed(self):
+        """Test that block tags alone on a line leave no blank line behind."""
+        template = translate_handlebars("A\n{{#each files}}\n  - {{path}}\n{{/each}}\nB {{#if x}}y{{/if}}\n")
+        assert template == "A\n{% for _item1 in files %}  - {{ _item1.path }}\n{% endfor %}B {% if x %}y{% endif %}\n"
+
+    def test_unsupported_syntax(self):
+        """Test that helpers and unbalanced blocks are rejected."""
+        with pytest.raises(TemplateError):
+            translate_handlebars("{{#with files}}{{/with}}")
+        with pytest.raises(TemplateError):
+            translate_handlebars("{{#if a}}")
+        with pytest.raises(TemplateError):
+            translate_handlebars("{{lookup files 0}}")
+
+
+class TestTemplates:
+    """Test compiling, caching and rendering custom templates."""
+
+    def test_compiled_once_and_cached_on_disk(self, tmp_path):
+        """Test that an unchanged template is compiled once and its bytecode stored by hash."""
+        template_path = tmp_path / 'prompt.hbs'
+        template_path.write_text('{{source_tree}}\n')
+        cache_dir = tmp_path / 'cache'
+        first = load_template(str(template_path), cache_dir)
+        assert load_template(str(template_path), cache_dir) is first
+        assert len(list(cache_dir.glob('*.cache'))) == 1
+
+        template_path.write_text('changed {{source_tree}}\n')
+        assert load_template(str(template_path), cache_dir) is not first
+        assert len(list(cache_dir.glob('*.cache'))) == 2
+
+    def test_render_streams_files(self, monkeypatch, tmp_path, make_codebase):
+        """Test that file blocks reach the template in order, one chunk at a time."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        make_codebase(tmp_path / 'src', CODEBASE)
+        template_path = tmp_path / 'prompt.hbs'
+        template_path.write_text('{{#each files}}[{{path}}]\n{{code}}\n{{/each}}')
+        options = {'template_path': str(template_path)}
+        chunks = list(iter_prompt(tmp_path / 'src', 'Explain', options))
+        prompt = ''.join(chunks)
+        assert prompt.startswith('[a.py]\n```py\na = 1\n\n```\n[b.md]\n')
+        assert '[b.md]\n```md\n# B\n\n```\n\n\n## User Request\nExplain' in prompt
+        assert len(list((tmp_path / 'cache' / 'code2prompt-cli' / 'templates').glob('*.cache'))) == 1
+        assert len(chunks) > 3
+
+    def test_user_request_placed_by_template(self, monkeypatch, tmp_path, make_codebase):
+        """Test that a template using user_request replaces the default footer."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        make_codebase(tmp_path / 'src', CODEBASE)
+        template_path = tmp_path / 'prompt.j2'
+        template_path.write_text('{{ files|length }} files. Task: {{ user_request }}')
+        options = {'template_path': str(template_path)}
+        assert generate_prompt(tmp_path / 'src', 'Explain', options) == '2 files. Task: Explain'
+
+    def test_files_looped_twice(self, monkeypatch, tmp_path, make_codebase):
+        """Test that a second loop over files replays them, and the count leaves out binary files."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+        make_codebase(tmp_path / 'src', {**CODEBASE, 'image.png': b'\x89PNG\r\n\x1a\n\x00\x00'})
+        template_path = tmp_path / 'prompt.j2'
+        loop = '{% for f in files %} {{ f.path }}{% endfor %}'
+        template_path.write_text('{{ files|length }}:' + loop + '|' + loop)
+        options = {'template_path': str(template_path)}
+        assert generate_prompt(tmp_path / 'src', None, options) == '2: a.py b.md| a.py b.md'
+
+
+class TestCLIOptionTemplateEngine:
+    """Test --template with the built-in template engine."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_handlebars_template(self, monkeypatch, tmp_path):
+        """Test that a Handlebars template renders and reports compile errors."""
+        monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+        with self.runner.isolated_filesystem():
+            with open('test.py', 'w') as f:
+                f.write('# Test file\n')
+            with open('custom.hbs', 'w') as f:
+                f.write('Files:{{#each files}} {{path}}{{/each}}\nRequest: {{user_request}}\n')
+            with open('broken.hbs', 'w') as f:
+                f.write('{{#each files}}')
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--template', 'custom.hbs', '--no-clipboard', 'Test custom template']
+            )
+            assert result.exit_code == 0
+            assert 'Files: broken.hbs custom.hbs test.py\nRequest: Test custom template' in result.output
+            assert '## User Request' not in result.output
+
+            result = self.runner.invoke(main, ['--path', '.', '--template', 'broken.hbs', '--no-clipboard', 'Test'])
+            assert result.exit_code == 1
+            assert 'unclosed' in result.output
@@ -0,0 +1,80 @@
+import json
+import os
+from click.testing import CliRunner
+from code2prompt_cli.main import main
+from code2prompt_cli.timings import Timings
+
+
+class TestTimings:
+    """Test the timing recorder."""
+
+    def test_report_and_trace(self):
+        """Test that phases, files and counters appear in the report and the trace."""
+        timings = Timings()
+        with timings.phase('walk'):
+            pass
+        timings.add_file('big.sql', 1000, 0.0, 0.5)
+        timings.add_file('small.py', 10, 0.0, 0.1)
+        timings.count('cache_hits', 3)
+        timings.count('cache_misses', 1)
+
+        report = timings.report(limit=1)
+        assert report['phases']['walk']['calls'] == 1
+        assert report['counters']['files'] == 2 and report['counters']['bytes'] == 1010
+        assert report['hit_rates'] == {'cache': 0.75}
+        assert report['slowest_files'] == [{'path': 'big.sql', 'seconds': 0.5, 'bytes': 1000}]
+
+        events = timings.chrome_trace()['traceEvents']
+        assert {event['name'] for event in events} >= {'walk', 'big.sql', 'small.py', 'counters'}
+        assert all(event['ph'] in ('X', 'C') for event in events)
+
+    def test_disabled_records_nothing(self):
+        """Test that a disabled recorder ignores everything."""
+        timings = Timings(enabled=False)
+        with timings.phase('walk'):
+            pass
+        timings.add_file('a.py', 1, 0.0, 1.0)
+        timings.count('cache_hits')
+        assert timings.totals == {} and timings.files == [] and timings.counters == {}
+
+
+class TestCLIOptionTimings:
+    """Test --timings and --profile options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_timings_report(self):
+        """Test that --timings prints phases and the slowest files."""
+        with self.runner.isolated_filesystem():
+            with open('app.py', 'w') as f:
+                f.write('# App file\n')
+
+            result = self.runner.invoke(main, [
+                '--path', '.', '--no-ignore', '--no-clipboard', '--timings', 'Test timings'
+            ])
+            assert result.exit_code == 0
+            assert 'Timings:' in result.output
+            assert 'walk' in result.output and 'render' in result.output
+            assert 'slowest files:' in result.output and 'app.py' in result.output
+
+    def test_cli_profile_json_with_cache(self):
+        """Test that a --profile JSON report includes cache hit rates of a warm run."""
+        with self.runner.isolated_filesystem():
+            os.makedirs('src')
+            with open('src/app.py', 'w') as f:
+                f.write('# App file\n')
+            stat = os.stat('src/app.py')
+            os.utime('src/app.py', ns=(stat.st_atime_ns, stat.st_mtime_ns - 10_000_000_000))
+
+            args = ['--path', 'src', '--cache-dir', 'cache', '--no-clipboard', '--profile', 'profile.json', 'Test']
+            assert self.runner.invoke(main, args).exit_code == 0
+            result = self.runner.invoke(main, args)
+            assert result.exit_code == 0
+            assert 'Profile written to: profile.json' in result.output
+
+            with open('profile.json') as f:
+                report = json.load(f)
+            assert report['hit_rates']['cache'] == 1.0
+            assert 'cache' in report['phases']
+            assert report['slowest_files'][0]['path'] == 'app.py'
@@ -0,0 +1,111 @@
+import sys
+import warnings
+import pytest
+from click.testing import CliRunner
+from code2prompt_cli import tokens
+from code2prompt_cli.main import main
+from code2prompt_cli.pipeline import PipelineState, RunSummary, generate_prompt
+from code2prompt_cli.cache import MemoryCache
+from code2prompt_cli.tokens import TokenCounter, estimate_tokens
+
+
+CODEBASE = {
+    'a.py': 'a = 1\n',
+    'b.py': 'def b():\n    return "ünïcode"\n' * 50,
+}
+
+
+class TestTokenCounting:
+    """Test per-file and total token counts in the built-in pipeline."""
+
+    def test_approximate_counter(self):
+        """Test that the approximate counter estimates from the UTF-8 byte length."""
+        counter = TokenCounter(approximate=True)
+        assert not counter.exact
+        assert counter.name == 'approx'
+        assert counter.count('abcdefgh') == 2
+        assert estimate_tokens('ü' * 4) == 2
+
+    def test_missing_tiktoken_warns_once(self, monkeypatch):
+        """Test that falling back to estimates without approximate=True warns once per process."""
+        monkeypatch.setitem(sys.modules, 'tiktoken', None)
+        monkeypatch.setattr(tokens, '_warned_missing', False)
+        with pytest.warns(RuntimeWarning, match='tiktoken is not installed'):
+            assert not TokenCounter().exact
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            TokenCounter()
+            TokenCounter(approximate=True)
+
+    def test_counts_cover_the_whole_prompt(self, tmp_path, make_codebase):
+        """Test that per-file counts are reported and the total includes header and footer."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        options = {'token_count_format': 'raw', 'approx_tokens': True, 'jobs': 4}
+        prompt = generate_prompt(tmp_path, 'Explain', options, summary)
+        assert [rel_path for rel_path, _ in summary.file_tokens] == ['a.py', 'b.py']
+        assert summary.approximate_tokens
+        file_total = sum(tokens for _, tokens in summary.file_tokens)
+        assert file_total < summary.prompt_tokens
+        assert abs(summary.prompt_tokens - estimate_tokens(prompt)) <= 4
+
+    def test_counts_are_cached_by_content(self, tmp_path, make_codebase):
+        """Test that a shared cache counts each unchanged file only once."""
+        make_codebase(tmp_path, CODEBASE)
+        state = PipelineState(cache=MemoryCache())
+        options = {'token_count_format': 'raw', 'approx_tokens': True}
+        first, second = RunSummary(), RunSummary()
+        generate_prompt(tmp_path, None, options, first, state)
+        counter = state.counter(None, True)
+        calls = []
+        original = counter.count
+        counter.count = lambda text: calls.append(text) or original(text)
+        generate_prompt(tmp_path, None, options, second, state)
+        assert first.file_tokens == second.file_tokens
+        assert 'def b()' not in ''.join(calls)
+
+    def test_no_counts_without_option(self, tmp_path, make_codebase):
+        """Test that nothing is counted unless token counts are requested."""
+        make_codebase(tmp_path, CODEBASE)
+        summary = RunSummary()
+        generate_prompt(tmp_path, None, {}, summary)
+        assert summary.prompt_tokens is None
+        assert summary.file_tokens == []
+
+
+class TestCLIOptionTokens:
+    """Test --tokens and --approx-tokens options."""
+
+    def setup_method(self):
+        self.runner = CliRunner()
+
+    def test_cli_tokens_format(self):
+        """Test that the total and per-file counts are printed, largest first."""
+        with self.runner.isolated_filesystem():
+            with open('small.py', 'w') as f:
+                f.write('x = 1\n')
+            with open('large.py', 'w') as f:
+                f.write('y = 2\n' * 2000)
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--tokens', 'format', '--approx-tokens', '--no-clipboard', 'Test']
+            )
+            assert result.exit_code == 0
+            assert 'Token count: ' in result.output
+            assert '(approximate)' in result.output
+            assert '3,0' in result.output
+            assert result.output.index('large.py', result.output.index('Token count')) < \
+                result.output.index('small.py', result.output.index('Token count'))
+
+    def test_cli_tokens_raw_stream(self):
+        """Test that streamed prompts are counted as they are written."""
+        with self.runner.isolated_filesystem():
+            with open('small.py', 'w') as f:
+                f.write('x = 1\n')
+
+            result = self.runner.invoke(
+                main, ['--path', '.', '--tokens', 'raw', '--stream', '-O', 'out.md', 'Test']
+            )
+            assert result.exit_code == 0
+            assert 'Token count: ' in result.output
+            assert 'small.py' in result.output
@@ -0,0 +1,124 @@
+import os
+from code2prompt_cli.dirindex import DirectoryIndex
+from code2prompt_cli.gitignore import GitIgnore
+from code2prompt_cli.walker import stat_entries, walk_files, walk_order_key
+
+
+def _write(path, content=''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def _backdate(root):
+    """Move every mtime out of the racy window so directory listings get indexed."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames + ['.']:
+            path = os.path.join(dirpath, name)
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10_000_000_000))
+
+
+def _make_tree(root):
+    _write(root / '.gitignore', 'node_modules/\n*.log\n!keep.log\n/build\n')
+    _write(root / 'src' / 'a.py', 'a')
+    _write(root / 'src' / 'debug.log', 'log')
+    _write(root / 'src' / 'keep.log', 'keep')
+    _write(root / 'src' / 'build' / 'nested.py', 'nested build dirs are not anchored')
+    _write(root / 'src' / 'gen' / '.gitignore', '*\n!.gitignore\n')
+    _write(root / 'src' / 'gen' / 'client.py', 'generated')
+    _write(root / 'node_modules' / 'pkg' / 'index.js', 'vendored')
+    _write(root / 'build' / 'out.txt', 'output')
+    _write(root / '.hidden' / 'secret.txt', 'hidden')
+    _write(root / 'z.py', 'z')
+
+
+class TestGitIgnore:
+    """Test compiled gitignore rules."""
+
+    def test_wildmatch_semantics(self):
+        """Test slashes, double stars, anchoring and directory-only patterns."""
+        rules = GitIgnore(['*.pyc', '/top.txt', 'docs/**/*.md', 'cache/', '# comment', ''])
+        assert rules.match('pkg/mod.pyc', False)
+        assert rules.match('top.txt', False)
+        assert rules.match('sub/top.txt', False) is None
+        assert rules.match('docs/a/b/readme.md', False)
+        assert rules.match('docs/readme.md', False)
+        assert rules.match('cache', True)
+        assert rules.match('cache', False) is None
+
+    def test_negation_last_rule_wins(self):
+        """Test that a later negated pattern re-includes a path."""
+        rules = GitIgnore(['*.log', '!keep.log'])
+        assert rules.match('debug.log', False) is True
+        assert rules.match('keep.log', False) is False
+        assert rules.match('a.py', False) is None
+
+
+class TestWalker:
+    """Test directory traversal."""
+
+    def test_walk_applies_nested_ignore_files(self, tmp_path):
+        """Test that root and nested .gitignore files and hidden rules are applied."""
+        _make_tree(tmp_path)
+        paths = [entry.rel_path for entry in walk_files(tmp_path)]
+        assert paths == ['z.py', 'src/a.py', 'src/keep.log', 'src/build/nested.py']
+        assert paths == sorted(paths, key=walk_order_key)
+
+        hidden = [entry.rel_path for entry in walk_files(tmp_path, hidden=True)]
+        assert '.hidden/secret.txt' in hidden and 'src/gen/.gitignore' in hidden
+
+        everything = [entry.rel_path for entry in walk_files(tmp_path, no_ignore=True)]
+        assert 'node_modules/pkg/index.js' in everything and 'src/gen/client.py' in everything
+
+    def test_stat_entries_matches_walk(self, tmp_path):
+        """Test that single-path checks agree with a full walk."""
+        _make_tree(tmp_path)
+        candidates = [
+            'z.py', 'src/a.py', 'src/debug.log', 'src/keep.log', 'src/gen/client.py',
+            'node_modules/pkg/index.js', 'build/out.txt', '.hidden/secret.txt', 'missing.py',
+        ]
+        walked = {entry.rel_path for entry in walk_files(tmp_path)}
+        assert {entry.rel_path for entry in stat_entries(tmp_path, candidates)} == walked & set(candidates)
+
+    def test_rules_above_the_root_apply_inside_a_repository(self, tmp_path, git_repo):
+        """Test that a subdirectory walk honours the repository's parent .gitignore files and info/exclude."""
+        repo = git_repo(tmp_path / 'repo')
+        _write(repo.root / '.gitignore', '*.log\n/sub/gen/\n')
+        _write(repo.root / '.git' / 'info' / 'exclude', 'secret.txt\n')
+        _write(repo.root / 'sub' / '.gitignore', '!keep.log\n')
+        for name in ('a.py', 'debug.log', 'keep.log', 'secret.txt', 'gen/client.py', 'deep/gen/kept.py'):
+            _write(repo.root / 'sub' / name, name)
+        paths = [entry.rel_path for entry in walk_files(repo.root / 'sub')]
+        assert paths == ['a.py', 'keep.log', 'deep/gen/kept.py']
+        candidates = ['a.py', 'debug.log', 'keep.log', 'secret.txt', 'gen/client.py', 'deep/gen/kept.py']
+        assert [entry.rel_path for entry in stat_entries(repo.root / 'sub', candidates)] == [
+            'a.py', 'keep.log', 'deep/gen/kept.py'
+        ]
+        # Outside a repository, only the ignore files at or below the root apply.
+        _write(tmp_path / 'plain' / '.gitignore', '*.py\n')
+        _write(tmp_path / 'plain' / 'sub' / 'a.py', 'a')
+        assert [entry.rel_path for entry in walk_files(tmp_path / 'plain' / 'sub')] == ['a.py']
+
+    def test_directory_index_skips_unchanged_directories(self, tmp_path):
+        """Test that a second walk is served from the index and notices changes."""
+        codebase = tmp_path / 'codebase'
+        _make_tree(codebase)
+        _backdate(codebase)
+        first_index = DirectoryIndex(tmp_path / 'cache')
+        first = [entry.rel_path for entry in walk_files(codebase, index=first_index)]
+        first_index.close()
+
+        second_index = DirectoryIndex(tmp_path / 'cache')
+        second = [entry.rel_path for entry in walk_files(codebase, index=second_index)]
+        second_index.close()
+        assert second == first
+        assert second_index.misses == 0 and second_index.hits > 0
+
+        # Rewriting an ignore file in place does not change its directory's mtime.
+        stat = os.stat(codebase / 'src')
+        _write(codebase / '.gitignore', 'node_modules/\n/build\n')
+        os.utime(codebase / 'src', ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        third_index = DirectoryIndex(tmp_path / 'cache')
+        third = [entry.rel_path for entry in walk_files(codebase, index=third_index)]
+        third_index.close()
+        assert 'src/debug.log' in third